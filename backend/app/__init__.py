@@ -1,9 +1,12 @@
 from flask import Flask
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import scoped_session, sessionmaker
 from config import Config
 
 db = SQLAlchemy()
+# 报表等只读接口使用的会话（绑定只读引擎，见 app.models.engine）
+read_session = scoped_session(sessionmaker())
 
 def create_app():
     app = Flask(__name__)
@@ -17,8 +20,21 @@ def create_app():
     from app.routes import api
     app.register_blueprint(api.bp)
     
-    # 创建数据库表
+    # 创建数据库表，并给已有数据库补齐新增的列
     with app.app_context():
+        from app.models.engine import apply_sqlite_profile, create_read_engine
+        apply_sqlite_profile(db.engine, Config.SQLITE_PRAGMAS)
         db.create_all()
+        from app.models.migrations import upgrade
+        upgrade(db.engine)
+        
+        read_session.configure(bind=create_read_engine(
+            db.engine, Config.SQLALCHEMY_READ_DATABASE_URI, Config.SQLITE_PRAGMAS,
+            engine_options=Config.SQLALCHEMY_ENGINE_OPTIONS
+        ))
+    
+    @app.teardown_appcontext
+    def _remove_read_session(exc):
+        read_session.remove()
     
     return app
\ No newline at end of file
@@ -1,3 +1,6 @@
-from .database import Video, Comment, Topic
+from .database import (Video, Comment, CommentLabel, CommentTopic, TextAnalysis, Topic, VideoStats, VideoStatBucket,
+                       ScrapeCheckpoint, TrackedVideo)
+from .records import CommentRecord
 
-__all__ = ['Video', 'Comment', 'Topic']
\ No newline at end of file
+__all__ = ['Video', 'Comment', 'CommentLabel', 'CommentTopic', 'TextAnalysis', 'Topic', 'VideoStats',
+           'VideoStatBucket', 'ScrapeCheckpoint', 'TrackedVideo', 'CommentRecord']
\ No newline at end of file
@@ -20,6 +20,11 @@ class Video(db.Model):
     vibe_score = db.Column(db.Float)
     topics_json = db.Column(db.Text)
     analysis_complete = db.Column(db.Boolean, default=False)
+    analysis_partial = db.Column(db.Boolean, default=False)  # 上次分析被取消或超时，只处理了部分评论
+    
+    # 增量爬取水位线：比它更新的主评论都已入库
+    newest_comment_id = db.Column(db.String(100))
+    newest_comment_published_at = db.Column(db.DateTime)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -41,11 +46,18 @@ class Video(db.Model):
             'vibe_score': self.vibe_score,
             'topics': (json.loads(self.topics_json) if self.topics_json else []),
             'analysis_complete': self.analysis_complete,
+            'analysis_partial': bool(self.analysis_partial),
             'created_at': self.created_at.isoformat()
         }
 
 class Comment(db.Model):
     __tablename__ = 'comments'
+    __table_args__ = (
+        # 按视频过滤后再按回复数/时间/情感筛选、排序（争议度、趋势、增量爬取）
+        db.Index('ix_comments_video_reply_count', 'video_id', 'reply_count'),
+        db.Index('ix_comments_video_published_at', 'video_id', 'published_at'),
+        db.Index('ix_comments_video_sentiment', 'video_id', 'sentiment'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     video_id = db.Column(db.Integer, db.ForeignKey('videos.id'), nullable=False, index=True)
@@ -54,6 +66,7 @@ class Comment(db.Model):
     
     author = db.Column(db.String(200))
     text = db.Column(db.Text)
+    text_hash = db.Column(db.String(32), index=True)  # 规范化文本的哈希，对应 text_analysis
     like_count = db.Column(db.Integer, default=0)
     reply_count = db.Column(db.Integer, default=0)
     published_at = db.Column(db.DateTime, index=True)
@@ -100,6 +113,49 @@ class Comment(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+class CommentLabel(db.Model):
+    """评论的通用标签（每条评论每个标签一行），替代按评论解析 labels_json"""
+    __tablename__ = 'comment_labels'
+    __table_args__ = (
+        db.UniqueConstraint('comment_id', 'label', name='uq_comment_label'),
+        db.Index('ix_comment_labels_video_label', 'video_id', 'label'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.Integer, db.ForeignKey('videos.id'), nullable=False)
+    comment_id = db.Column(db.String(100), nullable=False)
+    label = db.Column(db.String(100), nullable=False)
+
+class CommentTopic(db.Model):
+    """评论涉及的具体话题（每条评论每个话题一行），替代按评论解析 topics_json"""
+    __tablename__ = 'comment_topics'
+    __table_args__ = (
+        db.UniqueConstraint('comment_id', 'topic', name='uq_comment_topic'),
+        db.Index('ix_comment_topics_video_topic', 'video_id', 'topic'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.Integer, db.ForeignKey('videos.id'), nullable=False)
+    comment_id = db.Column(db.String(100), nullable=False)
+    topic = db.Column(db.String(100), nullable=False)
+
+class TextAnalysis(db.Model):
+    """
+    按规范化文本去重的分析结果，所有视频共享
+    相同文本（如 "first"、"❤️❤️"）只做一次情感分析和标签；话题依赖每个视频的已知话题，按 topics_signature 区分
+    """
+    __tablename__ = 'text_analysis'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    text_hash = db.Column(db.String(32), unique=True, nullable=False)
+    sentiment = db.Column(db.String(20))
+    sentiment_score = db.Column(db.Float)
+    labels_json = db.Column(db.Text)
+    topics_json = db.Column(db.Text)
+    topics_signature = db.Column(db.String(32))  # 计算 topics_json 时使用的已知话题列表的哈希
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Topic(db.Model):
     __tablename__ = 'topics'
     
@@ -127,4 +183,100 @@ class Topic(db.Model):
             'negative_percentage': round(self.negative_count / total * 100, 2) if total > 0 else 0,
             'neutral_percentage': round(self.neutral_count / total * 100, 2) if total > 0 else 0,
             'controversy_rate': round(self.controversy_rate, 2) if self.controversy_rate else 0
-        }
\ No newline at end of file
+        }
+
+class VideoStats(db.Model):
+    """每个视频的汇总统计，入库时按新增评论增量更新，报表不再扫描全部评论"""
+    __tablename__ = 'video_stats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.Integer, db.ForeignKey('videos.id'), nullable=False, unique=True)
+    total_comments = db.Column(db.Integer, nullable=False, default=0)
+    positive_count = db.Column(db.Integer, nullable=False, default=0)
+    negative_count = db.Column(db.Integer, nullable=False, default=0)
+    neutral_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)
+    high_reply_count = db.Column(db.Integer, nullable=False, default=0)  # 回复数 >= CONTROVERSY_REPLY_THRESHOLD
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class VideoStatBucket(db.Model):
+    """视频的分桶计数：kind 为 year / month / label，key 为 '2024' / '2024-05' / '#people'"""
+    __tablename__ = 'video_stat_buckets'
+    __table_args__ = (
+        db.UniqueConstraint('video_id', 'kind', 'key', name='uq_video_stat_bucket'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.Integer, db.ForeignKey('videos.id'), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)
+    key = db.Column(db.String(100), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class ScrapeCheckpoint(db.Model):
+    """爬取断点：记录每个视频（按排序方式）最后处理完的pageToken，用于断点续爬"""
+    __tablename__ = 'scrape_checkpoints'
+    __table_args__ = (
+        db.UniqueConstraint('video_id', 'order', name='uq_scrape_checkpoint_video_order'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.String(50), nullable=False)
+    order = db.Column(db.String(20), nullable=False, default='relevance')
+    page_token = db.Column(db.String(500))
+    fetched_count = db.Column(db.Integer, default=0)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'video_id': self.video_id,
+            'order': self.order,
+            'page_token': self.page_token,
+            'fetched_count': self.fetched_count,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class TrackedVideo(db.Model):
+    """关注列表中定时重新分析的视频：到期（next_run_at）后由调度器按优先级提交 delta 分析任务"""
+    __tablename__ = 'tracked_videos'
+    __table_args__ = (
+        # 调度器按 enabled + next_run_at 查到期的视频
+        db.Index('ix_tracked_videos_due', 'enabled', 'next_run_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.String(50), unique=True, nullable=False)
+    interval_seconds = db.Column(db.Integer, nullable=False)
+    priority = db.Column(db.Integer, nullable=False, default=0)  # 越大越先执行（配额不够时低优先级的往后排）
+    max_comments = db.Column(db.Integer, nullable=False)
+    enabled = db.Column(db.Boolean, nullable=False, default=True)
+    next_run_at = db.Column(db.DateTime, nullable=False)
+    
+    # 最近一次提交的任务
+    last_enqueued_at = db.Column(db.DateTime)
+    last_job_id = db.Column(db.String(32))
+    last_status = db.Column(db.String(20))
+    last_error = db.Column(db.Text)
+    last_finished_at = db.Column(db.DateTime)
+    last_cost_units = db.Column(db.Integer)  # 上次消耗的API配额单位（估算），用于调度时的配额预算
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'video_id': self.video_id,
+            'interval_seconds': self.interval_seconds,
+            'priority': self.priority,
+            'max_comments': self.max_comments,
+            'enabled': self.enabled,
+            'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None,
+            'last_enqueued_at': self.last_enqueued_at.isoformat() if self.last_enqueued_at else None,
+            'last_job_id': self.last_job_id,
+            'last_status': self.last_status,
+            'last_error': self.last_error,
+            'last_finished_at': self.last_finished_at.isoformat() if self.last_finished_at else None,
+            'last_cost_units': self.last_cost_units
+        }
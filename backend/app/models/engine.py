@@ -0,0 +1,52 @@
+"""
+数据库连接配置
+- SQLite 性能参数（WAL、synchronous=NORMAL、mmap 等）在每个新连接上执行
+- 报表接口使用单独的只读引擎：SQLite 下以 mode=ro 打开同一个文件，WAL 模式下读不会被写入阻塞
+"""
+import logging
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+
+def apply_sqlite_profile(engine, pragmas):
+    """给 SQLite 引擎注册 connect 事件，每个新连接执行 pragmas（值为空的项跳过）"""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = [(name, value) for name, value in pragmas.items() if value not in (None, '')]
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+
+def create_read_engine(engine, url=None, pragmas=None, engine_options=None):
+    """
+    创建报表用的只读引擎
+    url: 只读库（如PostgreSQL只读副本）地址；为空时 SQLite 文件库以只读模式打开，其余情况复用主引擎
+    engine_options: 只读库的连接池参数（与主库相同）
+    """
+    if url:
+        read_engine = create_engine(url, **(engine_options or {}))
+    elif engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+        # 内存库无法从另一个连接打开，只有文件库才能单独建只读引擎
+        read_url = make_url(f'sqlite:///file:{engine.url.database}').update_query_dict({'mode': 'ro', 'uri': 'true'})
+        read_engine = create_engine(read_url)
+    else:
+        return engine
+
+    if read_engine.dialect.name == 'sqlite':
+        # journal_mode 由写连接设置并持久化在文件中，只读连接不能修改
+        read_pragmas = {k: v for k, v in (pragmas or {}).items() if k not in ('journal_mode', 'synchronous')}
+        apply_sqlite_profile(read_engine, {**read_pragmas, 'query_only': 'ON'})
+    logger.info('Report queries use read-only engine %s', read_engine.url.render_as_string(hide_password=True))
+    return read_engine
@@ -0,0 +1,169 @@
+"""
+轻量级数据库迁移
+db.create_all() 只会创建缺失的表，不会给已有的表加列/索引；
+这里按版本号依次执行升级步骤，每个步骤都是幂等的（新建的数据库上执行也不会出错）
+"""
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy import bindparam, inspect, text
+
+logger = logging.getLogger(__name__)
+
+
+def _add_columns(conn, table, columns):
+    """给已有的表补齐缺失的列，columns: [(列名, 列定义)]"""
+    existing = {c['name'] for c in inspect(conn).get_columns(table)}
+    for name, ddl in columns:
+        if name not in existing:
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+
+
+def _create_indexes(conn, table, indexes):
+    """给已有的表补齐缺失的索引，indexes: [(索引名, [列名])]"""
+    existing = {i['name'] for i in inspect(conn).get_indexes(table)}
+    for name, columns in indexes:
+        if name not in existing:
+            conn.execute(text(f'CREATE INDEX {name} ON {table} ({", ".join(columns)})'))
+
+
+def _video_watermark(conn):
+    _add_columns(conn, 'videos', [
+        ('newest_comment_id', 'VARCHAR(100)'),
+        ('newest_comment_published_at', 'DATETIME' if conn.dialect.name == 'sqlite' else 'TIMESTAMP'),
+    ])
+
+
+def _backfill_comment_labels_topics(conn, chunk_size=1000):
+    """把已有评论的 labels_json / topics_json 拆分写入 comment_labels / comment_topics（表由 db.create_all() 创建）"""
+    for table, column, field in (('comment_labels', 'labels_json', 'label'), ('comment_topics', 'topics_json', 'topic')):
+        if conn.execute(text(f'SELECT 1 FROM {table} LIMIT 1')).first():
+            continue  # 已经有数据，不重复回填
+        
+        insert = text(f'INSERT INTO {table} (video_id, comment_id, {field}) VALUES (:video_id, :comment_id, :value)')
+        last_id = 0
+        total = 0
+        while True:
+            # 按主键分块读取，避免一次加载所有评论
+            rows = conn.execute(text(
+                f'SELECT id, video_id, comment_id, {column} FROM comments '
+                f'WHERE id > :last_id ORDER BY id LIMIT :limit'
+            ), {'last_id': last_id, 'limit': chunk_size}).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            
+            values = []
+            for _, video_pk, comment_id, raw in rows:
+                try:
+                    items = json.loads(raw) if raw else []
+                except ValueError:
+                    items = []
+                values.extend(
+                    {'video_id': video_pk, 'comment_id': comment_id, 'value': item}
+                    for item in dict.fromkeys(items) if item
+                )
+            if values:
+                conn.execute(insert, values)
+                total += len(values)
+        logger.info('Backfilled %d rows into %s', total, table)
+
+
+def _backfill_video_stats(conn, chunk_size=1000):
+    """根据已有评论计算 video_stats / video_stat_buckets（标签来自上一步回填的 comment_labels）"""
+    from app.services.video_stats import VideoStatsDelta
+    
+    if conn.execute(text('SELECT 1 FROM video_stats LIMIT 1')).first():
+        return
+    
+    deltas = {}
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            'SELECT id, video_id, comment_id, published_at, sentiment, sentiment_score, reply_count '
+            'FROM comments WHERE id > :last_id ORDER BY id LIMIT :limit'
+        ), {'last_id': last_id, 'limit': chunk_size}).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        
+        labels = {}
+        label_rows = conn.execute(
+            text('SELECT comment_id, label FROM comment_labels WHERE comment_id IN :ids')
+            .bindparams(bindparam('ids', expanding=True)),
+            {'ids': [row[2] for row in rows]}
+        )
+        for comment_id, label in label_rows:
+            labels.setdefault(comment_id, []).append(label)
+        
+        for _, video_pk, comment_id, published_at, sentiment, score, reply_count in rows:
+            delta = deltas.setdefault(video_pk, VideoStatsDelta())
+            delta.add(published_at, sentiment, score, reply_count, labels.get(comment_id, ()))
+    
+    for video_pk, delta in deltas.items():
+        delta.apply(conn, video_pk)
+    logger.info('Backfilled video_stats for %d videos', len(deltas))
+
+
+def _comment_composite_indexes(conn):
+    _create_indexes(conn, 'comments', [
+        ('ix_comments_video_reply_count', ['video_id', 'reply_count']),
+        ('ix_comments_video_published_at', ['video_id', 'published_at']),
+        ('ix_comments_video_sentiment', ['video_id', 'sentiment']),
+    ])
+
+
+def _comment_text_hash(conn, chunk_size=1000):
+    """comments.text_hash 列和索引，并为已有评论计算哈希"""
+    from app.services.text_dedup import text_hash
+    
+    _add_columns(conn, 'comments', [('text_hash', 'VARCHAR(32)')])
+    _create_indexes(conn, 'comments', [('ix_comments_text_hash', ['text_hash'])])
+    
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            'SELECT id, text FROM comments WHERE id > :last_id AND text_hash IS NULL ORDER BY id LIMIT :limit'
+        ), {'last_id': last_id, 'limit': chunk_size}).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        conn.execute(text('UPDATE comments SET text_hash = :hash WHERE id = :id'),
+                     [{'id': row_id, 'hash': text_hash(value)} for row_id, value in rows])
+
+
+def _video_analysis_partial(conn):
+    _add_columns(conn, 'videos', [('analysis_partial', 'BOOLEAN DEFAULT FALSE')])
+
+
+# (版本号, 说明, 升级函数)，只能追加，不要修改已发布的步骤
+MIGRATIONS = [
+    (1, 'add incremental crawl watermark to videos', _video_watermark),
+    (2, 'backfill comment_labels and comment_topics from json columns', _backfill_comment_labels_topics),
+    (3, 'backfill video_stats and video_stat_buckets', _backfill_video_stats),
+    (4, 'add composite indexes on comments', _comment_composite_indexes),
+    (5, 'add normalized text hash to comments', _comment_text_hash),
+    (6, 'add analysis_partial flag to videos', _video_analysis_partial),
+]
+
+
+def upgrade(engine):
+    """执行所有尚未执行的迁移"""
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_migrations ('
+            'version INTEGER PRIMARY KEY, description VARCHAR(200), applied_at TIMESTAMP)'
+        ))
+        applied = {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+    for version, description, step in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            logger.info('Applying migration %d: %s', version, description)
+            step(conn)
+            conn.execute(
+                text('INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)'),
+                {'v': version, 'd': description, 't': datetime.utcnow()}
+            )
@@ -0,0 +1,29 @@
+class CommentRecord:
+    """
+    一条评论在整个流水线（爬取 → 情感分析 → 标签 → 入库）中的紧凑表示
+    使用 __slots__ 代替字典，每条评论只分配一个小对象，分析结果直接写回同一对象
+    """
+    __slots__ = ('comment_id', 'parent_id', 'author', 'text', 'like_count', 'reply_count', 'published_at',
+                 'text_hash', 'sentiment', 'sentiment_score', 'labels', 'topics')
+
+    def __init__(self, comment_id, parent_id, author, text, like_count=0, reply_count=0, published_at=None):
+        self.comment_id = comment_id
+        self.parent_id = parent_id
+        self.author = author
+        self.text = text
+        self.like_count = like_count
+        self.reply_count = reply_count
+        self.published_at = published_at
+
+        # 分析结果
+        self.text_hash = None
+        self.sentiment = None
+        self.sentiment_score = None
+        self.labels = ()
+        self.topics = ()
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f'<CommentRecord {self.comment_id}>'
@@ -1,10 +1,18 @@
-from flask import Blueprint, request, jsonify
-from app import db
-from app.models import Video, Comment, Topic
-from app.services import YouTubeScraper, SentimentAnalyzer, AIAnalyzer, TrendAnalyzer
+from flask import Blueprint, Response, request, jsonify, current_app, send_file, url_for
+from sqlalchemy import func, select
+from app import db, read_session
+from app.models import Video, Comment, Topic, TrackedVideo
+from app.services import (TrendAnalyzer, YouTubeScraper, QuotaExceededError,
+                          get_video_info_cache, load_video_stats, open_snapshot, write_video_snapshot,
+                          SnapshotUnavailableError, get_job_queue, track_videos, update_tracking)
+from app.services.job_queue import FINISHED_STATES, JOB_CANCELLED, JOB_RUNNING, JOB_SUCCEEDED, JobClaimError
+from app.services.snapshot import SNAPSHOT_COLUMNS
 from app.utils.helpers import extract_video_id
+import csv
+import io
 import json
 from collections import Counter
+from datetime import datetime
 from config import Config
 
 bp = Blueprint('api', __name__, url_prefix='/api')
@@ -16,6 +24,11 @@ def health_check():
         'message': 'YouTube Comment Analyzer API is running'
     })
 
+@bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """视频元数据缓存命中统计"""
+    return jsonify(get_video_info_cache().stats())
+
 @bp.route('/analyze', methods=['POST'])
 def analyze_video():
     """
@@ -26,15 +39,21 @@ def analyze_video():
     4. 标签分类
     5. 时间趋势
     6. 争议度计算
+    默认放入后台任务队列，立即返回 202 和任务ID（用 GET /api/jobs/<job_id> 查询进度和结果）
+    同一视频已有进行中的任务时不重复分析，返回该任务（attached 为 true）
+    请求中 "wait": true 时等任务结束后直接返回分析结果（旧接口行为）
+    "timeout_seconds": 任务期限（从提交时算起，默认 Config.JOB_DEFAULT_TIMEOUT），超时后停止并保留已处理的评论
     """
     data = request.get_json()
     
     if not data:
         return jsonify({'error': 'No data provided'}), 400
     
-    video_url = data.get('video_url')
-    max_comments = min(data.get('max_comments', 1000), Config.MAX_COMMENTS_PER_REQUEST)
+    options, error = _parse_analysis_options(data)
+    if error:
+        return jsonify({'error': error}), 400
     
+    video_url = data.get('video_url')
     if not video_url:
         return jsonify({'error': 'video_url is required'}), 400
     
@@ -42,116 +61,219 @@ def analyze_video():
     if not video_id:
         return jsonify({'error': 'Invalid YouTube URL'}), 400
     
+    timeout, error = _parse_timeout(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    job_queue = get_job_queue()
+    if job_queue.in_process:
+        job_queue.start_workers(current_app._get_current_object())
     try:
-        scraper = YouTubeScraper()
-        sentiment_analyzer = SentimentAnalyzer()
-        ai_analyzer = AIAnalyzer()
-        
-        # 1. 获取视频信息
-        video_info = scraper.get_video_info(video_id)
-        if not video_info:
-            return jsonify({'error': 'Video not found'}), 404
-        
-        # 2. 保存/更新视频
-        video = Video.query.filter_by(video_id=video_id).first()
-        if not video:
-            video = Video(**video_info)
-            db.session.add(video)
-        else:
-            for key, value in video_info.items():
-                setattr(video, key, value)
-        db.session.commit()
-        
-        # 3. 爬取评论（大规模）
-        comments_data = scraper.get_comments_batch(video_id, max_comments, include_replies=True)
-        
-        if not comments_data:
-            return jsonify({
-                'status': 'success',
-                'message': 'No comments found',
-                'video_id': video_id
-            })
-        
-        # 4. AI提取话题（使用前100条评论样本）
-        sample_texts = [c['text'] for c in comments_data[:100]]
-        ai_result = ai_analyzer.extract_topics_and_labels(sample_texts)
-        known_topics = ai_result.get('specific_topics', [])
-        
-        # 5. 分析并保存每条评论
-        new_comments = 0
-        for comment_data in comments_data:
-            existing = Comment.query.filter_by(comment_id=comment_data['comment_id']).first()
-            if existing:
-                continue
-            
-            # 情感分析
-            sentiment_result = sentiment_analyzer.analyze_sentiment(comment_data['text'])
-            
-            # 标签和话题
-            label_result = ai_analyzer.label_single_comment(comment_data['text'], known_topics)
-            
-            # 保存评论
-            comment = Comment(
-                video_id=video.id,
-                comment_id=comment_data['comment_id'],
-                parent_id=comment_data.get('parent_id'),
-                author=comment_data['author'],
-                text=comment_data['text'],
-                like_count=comment_data['like_count'],
-                reply_count=comment_data.get('reply_count', 0),
-                published_at=comment_data['published_at'],
-                sentiment=sentiment_result['sentiment'],
-                sentiment_score=sentiment_result['score'],
-                labels_json=json.dumps(label_result['labels']),
-                topics_json=json.dumps(label_result['topics'])
-            )
-            db.session.add(comment)
-            new_comments += 1
-        
-        db.session.commit()
-        
-        # 6. 统计话题和生成Topic记录
-        all_comments = Comment.query.filter_by(video_id=video.id).all()
-        _generate_topic_statistics(video, all_comments)
-        
-        # 7. 计算整体氛围
-        _calculate_main_vibe(video, all_comments)
-        
-        db.session.commit()
-        
+        job, created = job_queue.enqueue(video_id, options, timeout=timeout)
+    except JobClaimError as e:
+        return jsonify({'error': str(e)}), 503
+    
+    if not data.get('wait', False):
         return jsonify({
-            'status': 'success',
-            'message': f'Analyzed {new_comments} new comments',
+            'status': job['state'],
+            'job_id': job['job_id'],
             'video_id': video_id,
-            'total_comments': len(all_comments)
-        })
+            'attached': not created,
+            'status_url': url_for('api.get_job', job_id=job['job_id'])
+        }), 202
+    
+    job = job_queue.wait(job['job_id'])
+    if job is None:
+        return jsonify({'error': 'Job expired'}), 500
+    if job['state'] == JOB_SUCCEEDED or job['result']:
+        # 取消/超时的任务返回部分结果（partial 为 true）
+        return jsonify(job['result'])
+    if job['state'] == JOB_CANCELLED:
+        return jsonify({'error': 'Job cancelled'}), 409
+    if job['error_type'] == 'deadline_exceeded':
+        return jsonify({'error': job['error']}), 504
+    if job['error_type'] == 'not_found':
+        return jsonify({'error': 'Video not found'}), 404
+    if job['error_type'] == 'quota_exceeded':
+        return jsonify({'error': job['error']}), 429
+    return jsonify({'error': job['error']}), 500
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    查询分析任务：state（queued/running/succeeded/failed/cancelled/timed_out）、stage、counts，
+    成功时 result 为分析结果，失败时 error/error_type（not_found / quota_exceeded / deadline_exceeded / error），
+    取消或超时的任务 result 为部分分析的结果
+    """
+    job = get_job_queue().get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """
+    取消分析任务：排队中的任务立即结束（200）；运行中的任务在下一次检查时停止（202），
+    已写库的评论保留，视频标记为部分分析（analysis_partial），可用 mode=resume 继续。已结束的任务返回 409
+    """
+    job = get_job_queue().cancel(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if not job['cancel_requested']:
+        return jsonify({'error': f"Job already {job['state']}", 'job': job}), 409
+    return jsonify(job), 202 if job['state'] == JOB_RUNNING else 200
+
+@bp.route('/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """
+    以 Server-Sent Events 推送任务进度，事件数据为完整的任务记录（同 GET /api/jobs/<job_id>）：
+    - stage：阶段变化（fetching_video / scraping / aggregating / writing_snapshot ...）
+    - progress：计数更新（pages_fetched / comments_scored / rows_persisted）和 eta_seconds
+    - end：任务结束（succeeded / failed / cancelled / timed_out），之后关闭连接
+    订阅进程内的事件 hub，不查询数据库
+    """
+    job_queue = get_job_queue()
+    subscription = job_queue.subscribe(job_id)
+    # 先订阅再读取当前状态，两者之间的更新不会丢失
+    job = job_queue.get(job_id)
+    if not job:
+        subscription.close()
+        return jsonify({'error': 'Job not found'}), 404
+    
+    def _events():
+        last_stage = None
+        pending = [job]
+        with subscription:
+            yield 'retry: 3000\n\n'
+            while True:
+                for event in pending:
+                    event_type = 'progress'
+                    if event['state'] in FINISHED_STATES:
+                        event_type = 'end'
+                    elif event['stage'] != last_stage:
+                        event_type = 'stage'
+                    last_stage = event['stage']
+                    yield f'event: {event_type}\ndata: {json.dumps(event)}\n\n'
+                    if event_type == 'end':
+                        return
+                pending = subscription.wait(Config.JOB_EVENT_KEEPALIVE)
+                if not pending:
+                    yield ': keepalive\n\n'
+    
+    return Response(_events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """
+    批量提交分析任务：每个视频一个后台任务，立即返回 202（用 GET /api/jobs/<job_id> 查询各个任务）
+    请求：{"video_urls": [URL或video_id, ...], 其余参数同 /analyze（不支持 wait）}
+    视频信息先按每50个一次 videos.list 批量获取（写入视频信息缓存，任务执行时直接命中），不存在的视频不提交；
+    同一视频已有进行中的任务时挂到该任务上（attached 为 true）
+    返回每个视频的状态：queued / running / not_found / quota_exceeded / invalid / error
+    """
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    options, error = _parse_analysis_options(data)
+    if error:
+        return jsonify({'error': error}), 400
+    timeout, error = _parse_timeout(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    video_urls = data.get('video_urls')
+    if not isinstance(video_urls, list) or not video_urls:
+        return jsonify({'error': 'video_urls must be a non-empty list'}), 400
+    if len(video_urls) > Config.MAX_VIDEOS_PER_BATCH:
+        return jsonify({'error': f'At most {Config.MAX_VIDEOS_PER_BATCH} videos per batch'}), 400
+    
+    video_ids = [extract_video_id(url) if isinstance(url, str) else None for url in video_urls]
+    try:
+        infos = YouTubeScraper().get_videos_info([v for v in video_ids if v])
+    except QuotaExceededError as e:
+        infos, quota_error = None, str(e)
+    
+    job_queue = get_job_queue()
+    if job_queue.in_process:
+        job_queue.start_workers(current_app._get_current_object())
+    
+    jobs = {}
+    results = []
+    for url, video_id in zip(video_urls, video_ids):
+        if not video_id:
+            results.append({'video_url': url, 'status': 'invalid', 'error': 'Invalid YouTube URL'})
+        elif infos is None:
+            results.append({'video_url': url, 'video_id': video_id, 'status': 'quota_exceeded', 'error': quota_error})
+        elif video_id not in infos:
+            results.append({'video_url': url, 'video_id': video_id, 'status': 'not_found', 'error': 'Video not found'})
+        else:
+            if video_id not in jobs:
+                try:
+                    jobs[video_id] = job_queue.enqueue(video_id, options, timeout=timeout)
+                except JobClaimError as e:
+                    results.append({'video_url': url, 'video_id': video_id, 'status': 'error', 'error': str(e)})
+                    continue
+            job, created = jobs[video_id]
+            results.append({
+                'video_url': url,
+                'video_id': video_id,
+                'status': job['state'],
+                'job_id': job['job_id'],
+                'attached': not created,
+                'status_url': url_for('api.get_job', job_id=job['job_id'])
+            })
     
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'total': len(results),
+        'status_counts': dict(Counter(r['status'] for r in results)),
+        'results': results
+    }), 202
 
 @bp.route('/video/<video_id>/report', methods=['GET'])
 def get_video_report(video_id):
     """
     获取完整分析报告
     包含：基本信息、整体氛围、话题分析、时间趋势、可视化数据
+    ?source=snapshot 时汇总和样本来自 Parquet 快照，不访问评论表
     """
-    video = Video.query.filter_by(video_id=video_id).first()
+    source = request.args.get('source', 'db')
+    if source not in ('db', 'snapshot'):
+        return jsonify({'error': "source must be 'db' or 'snapshot'"}), 400
+    
+    video = read_session.query(Video).filter_by(video_id=video_id).first()
     if not video:
         return jsonify({'error': 'Video not found'}), 404
     
-    comments = Comment.query.filter_by(video_id=video.id).all()
-    topics = Topic.query.filter_by(video_id=video.id).all()
+    topics = read_session.query(Topic).filter_by(video_id=video.id).all()
+    if source == 'snapshot':
+        try:
+            snapshot = open_snapshot(video_id)
+        except SnapshotUnavailableError as e:
+            return jsonify({'error': str(e)}), 501
+        if snapshot is None:
+            return jsonify({'error': 'Snapshot not found'}), 404
+        stats = snapshot.summary()
+        comments_sample = snapshot.sample(50)
+    else:
+        # 汇总统计由入库时增量维护，这里只读取分桶计数，不扫描评论
+        stats = load_video_stats(read_session, video.id)
+        comments_sample = [
+            c.to_dict() for c in
+            read_session.query(Comment).filter_by(video_id=video.id).order_by(Comment.id).limit(50)
+        ]
     
     # 时间趋势
     trend_analyzer = TrendAnalyzer()
-    trends = trend_analyzer.analyze_time_trends(comments)
+    trends = trend_analyzer.build_time_trends(stats['year'], stats['month'])
     
     # 情感分布
-    sentiment_dist = _calculate_sentiment_distribution(comments)
+    sentiment_dist = _calculate_sentiment_distribution(stats)
     
     # 标签分布（通用分类）
-    label_dist = _calculate_label_distribution(comments)
+    label_dist = _calculate_label_distribution(stats)
     
     return jsonify({
         'video': {
@@ -166,149 +288,254 @@ def get_video_report(video_id):
             'vibe_score': video.vibe_score
         },
         'summary': {
-            'total_comments_analyzed': len(comments),
+            'total_comments_analyzed': stats['total'],
             'main_vibe': video.main_vibe,
             'sentiment_distribution': sentiment_dist,
             'label_distribution': label_dist
         },
         'topics': [t.to_dict() for t in topics],
         'time_trends': trends,
-        'comments_sample': [c.to_dict() for c in comments[:50]]
+        'comments_sample': comments_sample
     })
 
+@bp.route('/video/<video_id>/export', methods=['GET'])
+def export_video_comments(video_id):
+    """
+    导出视频的全部评论（来自 Parquet 快照，快照不存在时先从数据库生成）
+    ?format=parquet（默认，直接返回快照文件）| csv（按批流式生成，labels/topics 以 | 分隔）
+    """
+    export_format = request.args.get('format', 'parquet')
+    if export_format not in ('parquet', 'csv'):
+        return jsonify({'error': "format must be 'parquet' or 'csv'"}), 400
+    
+    video = read_session.query(Video).filter_by(video_id=video_id).first()
+    if not video:
+        return jsonify({'error': 'Video not found'}), 404
+    
+    try:
+        snapshot = open_snapshot(video_id)
+        if snapshot is None:
+            write_video_snapshot(db.session.get(Video, video.id))
+            snapshot = open_snapshot(video_id)
+    except SnapshotUnavailableError as e:
+        return jsonify({'error': str(e)}), 501
+    
+    if export_format == 'parquet':
+        return send_file(snapshot.path, mimetype='application/vnd.apache.parquet',
+                         as_attachment=True, download_name=f'{video_id}.parquet')
+    
+    def _csv_rows():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(SNAPSHOT_COLUMNS)
+        for batch in snapshot.iter_batches():
+            for row in batch.to_pylist():
+                row['labels'] = '|'.join(row['labels'] or [])
+                row['topics'] = '|'.join(row['topics'] or [])
+                if row['published_at']:
+                    row['published_at'] = row['published_at'].isoformat()
+                writer.writerow([row[name] for name in SNAPSHOT_COLUMNS])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    return Response(_csv_rows(), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={video_id}.csv'})
+
 @bp.route('/videos', methods=['GET'])
 def get_all_videos():
     """获取所有已分析视频"""
-    videos = Video.query.order_by(Video.created_at.desc()).all()
+    videos = read_session.query(Video).order_by(Video.created_at.desc()).all()
     return jsonify({
         'total': len(videos),
         'videos': [v.to_dict() for v in videos]
     })
 
+@bp.route('/tracked', methods=['GET'])
+def get_tracked_videos():
+    """
+    关注列表（按优先级、下次执行时间排序），?due=true 只返回已到期的
+    分页：?limit=（默认100，最多1000）&offset=
+    """
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    offset = request.args.get('offset', 0, type=int)
+    now = datetime.utcnow()
+    
+    query = read_session.query(TrackedVideo)
+    due_filter = (TrackedVideo.enabled.is_(True), TrackedVideo.next_run_at <= now)
+    if request.args.get('due', '').lower() == 'true':
+        query = query.filter(*due_filter)
+    tracked = (query.order_by(TrackedVideo.priority.desc(), TrackedVideo.next_run_at)
+               .offset(offset).limit(limit).all())
+    return jsonify({
+        'total': query.count(),
+        'due': read_session.scalar(select(func.count()).select_from(TrackedVideo).where(*due_filter)),
+        'tracked': [t.to_dict() for t in tracked]
+    })
+
+@bp.route('/tracked', methods=['POST'])
+def add_tracked_videos():
+    """
+    加入关注列表，到期后由调度器（python worker.py --scheduler）提交 delta 分析
+    请求：{"video_url": ...} 或 {"video_urls": [...]}，可选 interval_seconds / priority / max_comments / enabled /
+    run_now（立即到期）。已在列表中的视频只更新给出的字段
+    """
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    fields, error = _parse_tracking_options(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    video_urls = data.get('video_urls', [data['video_url']] if data.get('video_url') else None)
+    if not isinstance(video_urls, list) or not video_urls:
+        return jsonify({'error': 'video_url or video_urls is required'}), 400
+    if len(video_urls) > Config.MAX_TRACKED_PER_REQUEST:
+        return jsonify({'error': f'At most {Config.MAX_TRACKED_PER_REQUEST} videos per request'}), 400
+    
+    video_ids = [extract_video_id(url) if isinstance(url, str) else None for url in video_urls]
+    invalid = [url for url, video_id in zip(video_urls, video_ids) if not video_id]
+    tracked, created = track_videos([v for v in video_ids if v], fields)
+    
+    return jsonify({
+        'created': created,
+        'updated': len(tracked) - created,
+        'invalid': invalid,
+        'tracked': [t.to_dict() for t in tracked]
+    }), 201 if created else 200
+
+@bp.route('/tracked/<video_id>', methods=['PATCH'])
+def update_tracked_video(video_id):
+    """修改关注设置：interval_seconds / priority / max_comments / enabled / run_now"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    fields, error = _parse_tracking_options(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    tracked = TrackedVideo.query.filter_by(video_id=video_id).first()
+    if not tracked:
+        return jsonify({'error': 'Video is not tracked'}), 404
+    update_tracking(tracked, fields)
+    db.session.commit()
+    return jsonify(tracked.to_dict())
+
+@bp.route('/tracked/<video_id>', methods=['DELETE'])
+def delete_tracked_video(video_id):
+    """移出关注列表（已分析的数据保留）"""
+    tracked = TrackedVideo.query.filter_by(video_id=video_id).first()
+    if not tracked:
+        return jsonify({'error': 'Video is not tracked'}), 404
+    db.session.delete(tracked)
+    db.session.commit()
+    return jsonify({'status': 'deleted', 'video_id': video_id})
+
 @bp.route('/video/<video_id>/controversy', methods=['GET'])
 def get_controversy_stats(video_id):
     """
     新增：获取争议度统计
     返回超过100回复的评论信息
     """
-    video = Video.query.filter_by(video_id=video_id).first()
+    video = read_session.query(Video).filter_by(video_id=video_id).first()
     if not video:
         return jsonify({'error': 'Video not found'}), 404
     
-    comments = Comment.query.filter_by(video_id=video.id).all()
-    
-    # 找出高回复评论（超过100回复）
-    high_reply_comments = [
-        c for c in comments 
-        if c.reply_count >= Config.CONTROVERSY_REPLY_THRESHOLD
-    ]
+    # 计数、过滤、排序和截取都在数据库中完成（走 (video_id, reply_count) 索引），延迟不随评论数增长
+    threshold = Config.CONTROVERSY_REPLY_THRESHOLD
+    total_comments = read_session.scalar(
+        select(func.count()).select_from(Comment).where(Comment.video_id == video.id)
+    )
+    high_reply_filter = (Comment.video_id == video.id, Comment.reply_count >= threshold)
+    high_reply_count = read_session.scalar(
+        select(func.count()).select_from(Comment).where(*high_reply_filter)
+    )
+    high_reply_comments = read_session.execute(
+        select(Comment.text, Comment.author, Comment.reply_count, Comment.like_count, Comment.sentiment)
+        .where(*high_reply_filter)
+        .order_by(Comment.reply_count.desc())
+        .limit(20)
+    ).all()
     
-    total_comments = len(comments)
-    controversy_rate = (len(high_reply_comments) / total_comments * 100) if total_comments > 0 else 0
+    controversy_rate = (high_reply_count / total_comments * 100) if total_comments > 0 else 0
     
     return jsonify({
         'video_id': video_id,
         'total_comments': total_comments,
-        'high_reply_comments_count': len(high_reply_comments),
+        'high_reply_comments_count': high_reply_count,
         'controversy_rate': round(controversy_rate, 2),
-        'threshold': Config.CONTROVERSY_REPLY_THRESHOLD,
+        'threshold': threshold,
         'high_reply_comments': [
             {
-                'text': c.text[:200],
+                'text': (c.text or '')[:200],
                 'author': c.author,
                 'reply_count': c.reply_count,
                 'like_count': c.like_count,
                 'sentiment': c.sentiment
             }
-            for c in sorted(high_reply_comments, key=lambda x: x.reply_count, reverse=True)[:20]
+            for c in high_reply_comments
         ]
     })
 
 # ========== 辅助函数 ==========
 
-def _generate_topic_statistics(video, comments):
-    """生成话题统计"""
-    # 删除旧的topic记录
-    Topic.query.filter_by(video_id=video.id).delete()
-    
-    # 统计所有话题
-    topic_counter = Counter()
-    topic_sentiments = {}
-    
-    for comment in comments:
-        if comment.topics_json:
-            try:
-                topics = json.loads(comment.topics_json)
-            except Exception:
-                topics = []
-
-            for topic in topics:
-                topic_counter[topic] += 1
-                
-                if topic not in topic_sentiments:
-                    topic_sentiments[topic] = {'positive': 0, 'negative': 0, 'neutral': 0}
-                
-                topic_sentiments[topic][comment.sentiment] += 1
-    
-    total_comments = len(comments)
-    min_threshold = Config.MIN_TOPIC_THRESHOLD
-    
-    # 保存符合阈值的话题（35%以上）
-    for topic_name, count in topic_counter.items():
-        percentage = count / total_comments * 100
-        
-        if percentage >= min_threshold * 100:  # 超过35%
-            sentiments = topic_sentiments[topic_name]
-            
-            # 修正：计算争议度（传入所有评论）
-            trend_analyzer = TrendAnalyzer()
-            controversy = trend_analyzer.calculate_controversy_rate(
-                all_comments=comments,
-                controversy_threshold=Config.CONTROVERSY_REPLY_THRESHOLD
-            )
-            
-            topic = Topic(
-                video_id=video.id,
-                name=topic_name,
-                count=count,
-                percentage=percentage,
-                positive_count=sentiments['positive'],
-                negative_count=sentiments['negative'],
-                neutral_count=sentiments['neutral'],
-                controversy_rate=controversy
-            )
-            db.session.add(topic)
-
-def _calculate_main_vibe(video, comments):
-    """计算整体氛围"""
-    if not comments:
-        return
-    
-    sentiment_counts = Counter(c.sentiment for c in comments)
-    total = len(comments)
+def _parse_analysis_options(data):
+    """解析 /analyze 和 /analyze/batch 共用的参数，返回 (options, error)"""
+    max_comments = data.get('max_comments', 1000)
+    if not isinstance(max_comments, int) or max_comments <= 0:
+        return None, 'max_comments must be a positive integer'
     
-    positive_ratio = sentiment_counts.get('positive', 0) / total
-    negative_ratio = sentiment_counts.get('negative', 0) / total
-    
-    if positive_ratio > 0.5:
-        video.main_vibe = 'positive'
-    elif negative_ratio > 0.5:
-        video.main_vibe = 'negative'
-    else:
-        video.main_vibe = 'neutral'
+    # full: 从第一页开始 / resume: 从上次的断点继续 / delta: 按时间倒序只爬水位线之后的新评论
+    mode = data.get('mode', 'full')
+    if mode not in ('full', 'resume', 'delta'):
+        return None, "mode must be 'full', 'resume' or 'delta'"
     
-    # 计算氛围分数
-    avg_score = sum(c.sentiment_score for c in comments) / total
-    video.vibe_score = round(avg_score, 3)
-    video.analysis_complete = True
+    return {
+        'max_comments': min(max_comments, Config.MAX_COMMENTS_PER_REQUEST),
+        'expand_replies': bool(data.get('expand_replies', False)),
+        'mode': mode
+    }, None
+
+def _parse_timeout(data):
+    """任务期限 timeout_seconds（默认 Config.JOB_DEFAULT_TIMEOUT，不超过 JOB_MAX_TIMEOUT），返回 (timeout, error)"""
+    timeout = data.get('timeout_seconds', Config.JOB_DEFAULT_TIMEOUT)
+    if not isinstance(timeout, int) or isinstance(timeout, bool) or timeout < 0:
+        return None, 'timeout_seconds must be a non-negative integer'
+    if Config.JOB_MAX_TIMEOUT:
+        timeout = min(timeout or Config.JOB_MAX_TIMEOUT, Config.JOB_MAX_TIMEOUT)
+    return timeout, None
+
+def _parse_tracking_options(data):
+    """解析关注设置，只返回请求中给出的字段，返回 (fields, error)"""
+    fields = {}
+    for name, minimum in (('interval_seconds', Config.SCHEDULER_MIN_INTERVAL), ('priority', None),
+                          ('max_comments', 1)):
+        if name not in data:
+            continue
+        value = data[name]
+        if not isinstance(value, int) or isinstance(value, bool) or (minimum is not None and value < minimum):
+            if minimum is None:
+                return None, f'{name} must be an integer'
+            return None, f'{name} must be an integer of at least {minimum}'
+        fields[name] = value
+    if 'max_comments' in fields:
+        fields['max_comments'] = min(fields['max_comments'], Config.MAX_COMMENTS_PER_REQUEST)
+    for name in ('enabled', 'run_now'):
+        if name in data:
+            fields[name] = bool(data[name])
+    return fields, None
 
-def _calculate_sentiment_distribution(comments):
+def _calculate_sentiment_distribution(stats):
     """计算情感分布"""
-    if not comments:
+    total = stats['total']
+    if not total:
         return {'positive': 0, 'negative': 0, 'neutral': 0}
     
-    total = len(comments)
-    sentiment_counts = Counter(c.sentiment for c in comments)
+    sentiment_counts = stats['sentiments']
     
     return {
         'positive': round(sentiment_counts.get('positive', 0) / total * 100, 2),
@@ -316,19 +543,9 @@ def _calculate_sentiment_distribution(comments):
         'neutral': round(sentiment_counts.get('neutral', 0) / total * 100, 2)
     }
 
-def _calculate_label_distribution(comments):
+def _calculate_label_distribution(stats):
     """计算标签分布（通用分类）"""
-    label_counter = Counter()
-    
-    for comment in comments:
-        if comment.labels_json:
-            try:
-                labels = json.loads(comment.labels_json)
-            except Exception:
-                labels = []
-
-            for label in labels:
-                label_counter[label] += 1
+    label_counter = Counter(stats['label'])
     
     total_labels = sum(label_counter.values())
     
@@ -338,4 +555,4 @@ def _calculate_label_distribution(comments):
             'percentage': round(count / total_labels * 100, 2) if total_labels > 0 else 0
         }
         for label, count in label_counter.most_common()
-    }
\ No newline at end of file
+    }
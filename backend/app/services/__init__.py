@@ -1,6 +1,26 @@
-from .youtube_scraper import YouTubeScraper
+from .youtube_scraper import YouTubeScraper, CommentPage
 from .sentiment_analyzer import SentimentAnalyzer
 from .ai_analyzer import AIAnalyzer
 from .trend_analyzer import TrendAnalyzer
+from .rate_limiter import QuotaRateLimiter, QuotaExceededError, get_rate_limiter
+from .youtube_client import YouTubeClientPool, get_client_pool
+from .video_cache import VideoInfoCache, get_video_info_cache
+from .video_stats import VideoStatsDelta, load_video_stats
+from .text_dedup import TextAnalysisCache, normalize_text, text_hash
+from .comment_ingestor import CommentIngestor
+from .snapshot import (VideoSnapshot, SnapshotUnavailableError, open_snapshot, snapshots_available,
+                       write_video_snapshot)
+from .video_analysis import VideoAnalysisService, VideoNotFoundError
+from .job_events import JobEventHub, get_job_event_hub
+from .job_queue import JobClaimError, JobQueue, get_job_queue, run_worker
+from .refresh_scheduler import RefreshScheduler, track_videos, update_tracking
 
-__all__ = ['YouTubeScraper', 'SentimentAnalyzer', 'AIAnalyzer', 'TrendAnalyzer']
\ No newline at end of file
+__all__ = ['YouTubeScraper', 'CommentPage', 'SentimentAnalyzer', 'AIAnalyzer', 'TrendAnalyzer',
+           'QuotaRateLimiter', 'QuotaExceededError', 'get_rate_limiter',
+           'YouTubeClientPool', 'get_client_pool', 'VideoInfoCache', 'get_video_info_cache',
+           'VideoStatsDelta', 'load_video_stats', 'TextAnalysisCache', 'normalize_text', 'text_hash',
+           'CommentIngestor',
+           'VideoSnapshot', 'SnapshotUnavailableError', 'open_snapshot', 'snapshots_available', 'write_video_snapshot',
+           'VideoAnalysisService', 'VideoNotFoundError',
+           'JobEventHub', 'get_job_event_hub', 'JobClaimError', 'JobQueue', 'get_job_queue', 'run_worker',
+           'RefreshScheduler', 'track_videos', 'update_tracking']
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+视频分析流水线：fetch → normalize → sentiment → label → persist
+- fetch：逐页调用 YouTube API（I/O）
+- normalize：过滤已入库的评论，计算规范化文本哈希并加载以前的分析结果（只读数据库）
+- sentiment：TextBlob 情感分析（CPU密集，可配置为进程池）
+- label：AI提取话题（第一页）、标签和话题匹配
+- persist：写库、推进断点、分块提交（在调用方线程中，使用调用方的数据库会话）
+阶段之间为有界队列，各阶段并行度见 Config.ANALYSIS_*；页按顺序写库，断点语义不变
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from app.utils.pipeline import Pipeline, Stage
+from config import Config
+from .sentiment_analyzer import SentimentAnalyzer
+
+logger = logging.getLogger(__name__)
+
+
+class PageWork:
+    """在各阶段之间传递的一页评论及中间结果（进程池执行时会被 pickle）"""
+
+    __slots__ = ('page', 'records', 'pending', 'scores', 'new_rows')
+
+    def __init__(self, page):
+        self.page = page
+        self.records = []  # 新评论（CommentRecord）
+        self.pending = {}  # 需要情感分析的新文本 {text_hash: text}
+        self.scores = {}  # {text_hash: {'sentiment', 'score'}}
+        self.new_rows = []  # 需要写入 text_analysis 的行
+
+
+def score_page(work):
+    """sentiment 阶段：对本页的新文本做情感分析（模块级函数，可在子进程中执行）"""
+    work.scores = {h: SentimentAnalyzer.analyze_sentiment(text) for h, text in work.pending.items()}
+    return work
+
+
+class KnownTopics:
+    """用第一页非空评论的前100条提取视频的已知话题，只提取一次（label 阶段多线程时加锁）"""
+
+    def __init__(self, ai_analyzer):
+        self.ai_analyzer = ai_analyzer
+        self.topics = None
+        self._lock = threading.Lock()
+
+    def get(self, items):
+        if self.topics is None and items:
+            with self._lock:
+                if self.topics is None:
+                    ai_result = self.ai_analyzer.extract_topics_and_labels([c.text for c in items[:100]])
+                    self.topics = ai_result.get('specific_topics', [])
+        return self.topics
+
+
+def build_analysis_pipeline(normalize, label, persist):
+    """按配置组装分析流水线；normalize / label / persist 为处理 PageWork 的函数"""
+    sentiment_workers = Config.ANALYSIS_SENTIMENT_WORKERS
+    sentiment_executor = None
+    if Config.ANALYSIS_SENTIMENT_EXECUTOR == 'process':
+        sentiment_executor = get_sentiment_process_pool()
+    elif Config.ANALYSIS_SENTIMENT_EXECUTOR != 'thread':
+        raise ValueError(f'Unknown sentiment executor: {Config.ANALYSIS_SENTIMENT_EXECUTOR}')
+
+    # size 统计的是各阶段输入的评论数
+    def page_size(page):
+        return len(page.items)
+
+    return Pipeline([
+        Stage('normalize', lambda page: normalize(PageWork(page)), size=page_size),
+        Stage('sentiment', score_page, workers=sentiment_workers, executor=sentiment_executor,
+              size=lambda work: len(work.pending)),
+        Stage('label', label, workers=Config.ANALYSIS_LABEL_WORKERS, size=lambda work: len(work.records)),
+        Stage('persist', persist, inline=True, size=lambda work: len(work.records)),
+    ], queue_size=Config.ANALYSIS_PIPELINE_QUEUE_SIZE, source_name='fetch', source_size=page_size)
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_sentiment_process_pool():
+    """进程内共享的情感分析进程池（spawn 启动，不从多线程的父进程 fork）"""
+    global _process_pool
+    if _process_pool is None:
+        with _process_pool_lock:
+            if _process_pool is None:
+                _process_pool = ProcessPoolExecutor(Config.ANALYSIS_SENTIMENT_WORKERS,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+                logger.info('Started sentiment process pool with %d workers', Config.ANALYSIS_SENTIMENT_WORKERS)
+    return _process_pool
@@ -0,0 +1,203 @@
+import io
+import json
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from app.models import Comment, CommentLabel, CommentTopic
+from config import Config
+from .video_stats import VideoStatsDelta
+
+logger = logging.getLogger(__name__)
+
+
+class CommentIngestor:
+    """
+    评论批量入库
+    - 每批评论只用一次 IN 查询找出已存在的 comment_id（不再逐条 filter_by().first()）
+    - 新评论缓存为普通字典行，按 Config.INGEST_INSERT_BATCH_SIZE 用 executemany 批量插入
+    - SQLite/PostgreSQL 使用 INSERT ... ON CONFLICT DO NOTHING，并发写入同一视频时不会因唯一约束失败
+    - PostgreSQL（psycopg2）默认 COPY 到临时表再 INSERT ... SELECT（Config.POSTGRES_BULK_LOAD）
+    - 标签/话题同时写入 comment_labels / comment_topics，分布统计可直接 GROUP BY
+    - 真正插入的评论（RETURNING）增量累加到 video_stats / video_stat_buckets
+    - 行直接以Core语句插入，session中不会堆积Comment对象；commit() 分块提交，内存不随评论总数增长
+    """
+
+    IN_CLAUSE_SIZE = 500  # 单条 IN 查询的参数个数上限（SQLite 默认最多999个绑定参数）
+
+    def __init__(self, video_pk, batch_size=None):
+        self.video_pk = video_pk
+        self.batch_size = batch_size or Config.INGEST_INSERT_BATCH_SIZE
+        self.inserted = 0
+        self.uncommitted = 0  # 上次提交后新接收的评论数
+        self._rows = []
+        self._label_rows = []
+        self._topic_rows = []
+        self._labels = {}  # comment_id -> labels，用于统计增量
+        # 已接收但尚未提交的 comment_id（提交后由数据库去重）；filter_new 在规范化线程、flush/commit 在写库线程，
+        # 读写都要持有 _seen_lock
+        self._seen = set()
+        self._seen_lock = threading.Lock()
+        self._flushed_ids = []  # 已插入但尚未提交的 comment_id，其他会话还看不到，提交后才从 _seen 中移除
+
+    def filter_new(self, records):
+        """返回数据库和本次批次中都还不存在的评论（保持原顺序）"""
+        with self._seen_lock:
+            candidates = [r for r in records if r.comment_id not in self._seen]
+        if not candidates:
+            return []
+
+        existing = self.existing_ids([r.comment_id for r in candidates])
+        new_records = []
+        with self._seen_lock:
+            for record in candidates:
+                if record.comment_id in existing or record.comment_id in self._seen:
+                    continue
+                self._seen.add(record.comment_id)
+                new_records.append(record)
+        return new_records
+
+    def existing_ids(self, comment_ids):
+        existing = set()
+        for start in range(0, len(comment_ids), self.IN_CLAUSE_SIZE):
+            chunk = comment_ids[start:start + self.IN_CLAUSE_SIZE]
+            existing.update(db.session.scalars(
+                select(Comment.comment_id).where(Comment.comment_id.in_(chunk))
+            ))
+        return existing
+
+    def add(self, records):
+        """缓存已分析的评论，攒够一批后插入"""
+        for record in records:
+            self._rows.append(self._row(record))
+            labels = self._labels[record.comment_id] = tuple(dict.fromkeys(record.labels))
+            self._label_rows.extend(
+                {'video_id': self.video_pk, 'comment_id': record.comment_id, 'label': label}
+                for label in labels
+            )
+            self._topic_rows.extend(
+                {'video_id': self.video_pk, 'comment_id': record.comment_id, 'topic': topic}
+                for topic in dict.fromkeys(record.topics)
+            )
+        self.uncommitted += len(records)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """插入所有缓存的评论（在当前事务中，不提交）"""
+        delta = VideoStatsDelta()
+        for start in range(0, len(self._rows), self.batch_size):
+            chunk = self._rows[start:start + self.batch_size]
+            inserted = self._insert_comments(chunk)
+            self._flushed_ids.extend(row['comment_id'] for row in chunk)
+            for row in chunk:
+                if row['comment_id'] in inserted:
+                    delta.add(row['published_at'], row['sentiment'], row['sentiment_score'],
+                              row['reply_count'], self._labels[row['comment_id']])
+            self.inserted += len(inserted)
+        self._execute_many(self._insert_statement(CommentLabel, ['comment_id', 'label']), self._label_rows)
+        self._execute_many(self._insert_statement(CommentTopic, ['comment_id', 'topic']), self._topic_rows)
+        delta.apply(db.session, self.video_pk)
+        self._rows = []
+        self._labels = {}
+        self._label_rows = []
+        self._topic_rows = []
+
+    def commit(self):
+        """插入缓存的评论并提交当前事务（调用方应先更新好同一事务中的断点）"""
+        self.flush()
+        db.session.commit()
+        self.uncommitted = 0
+        # 已提交的评论之后由 existing_ids 查到，不必再留在 _seen 中
+        with self._seen_lock:
+            self._seen.difference_update(self._flushed_ids)
+        self._flushed_ids = []
+
+    def _row(self, record):
+        return {
+            'video_id': self.video_pk,
+            'comment_id': record.comment_id,
+            'parent_id': record.parent_id,
+            'author': record.author,
+            'text': record.text,
+            'text_hash': record.text_hash,
+            'like_count': record.like_count,
+            'reply_count': record.reply_count,
+            'published_at': record.published_at,
+            'sentiment': record.sentiment,
+            'sentiment_score': record.sentiment_score,
+            'labels_json': json.dumps(list(record.labels)),
+            'topics_json': json.dumps(list(record.topics))
+        }
+
+    def _insert_comments(self, rows):
+        """插入一批评论，返回真正插入的 comment_id（ON CONFLICT 跳过的不算，统计增量不会重复计算）"""
+        dialect = db.session.get_bind().dialect
+        if dialect.name == 'postgresql' and dialect.driver == 'psycopg2' and Config.POSTGRES_BULK_LOAD == 'copy':
+            return self._copy_comments(rows)
+
+        statement = self._insert_statement(Comment, ['comment_id'])
+        if not dialect.insert_executemany_returning:
+            # 不支持 RETURNING：先在本事务中查出已存在的评论，只插入其余的（调用方持有视频锁，同一视频不会并发写入）
+            existing = self.existing_ids([row['comment_id'] for row in rows])
+            rows = [row for row in rows if row['comment_id'] not in existing]
+            if rows:
+                db.session.execute(statement, rows)
+            return {row['comment_id'] for row in rows}
+        statement = statement.returning(Comment.comment_id, sort_by_parameter_order=False)
+        return set(db.session.execute(statement, rows).scalars())
+
+    @staticmethod
+    def _copy_comments(rows):
+        """PostgreSQL：COPY 到事务内的临时表，再一条 INSERT ... SELECT ... ON CONFLICT DO NOTHING 写入"""
+        now = datetime.utcnow()
+        columns = list(rows[0]) + ['created_at']
+        column_list = ', '.join(columns)
+
+        connection = db.session.connection()
+        connection.exec_driver_sql(
+            f'CREATE TEMP TABLE IF NOT EXISTS comment_stage ON COMMIT DROP AS '
+            f'SELECT {column_list} FROM comments WITH NO DATA'
+        )
+
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(_copy_value(row[c] if c != 'created_at' else now) for c in columns))
+            buffer.write('\n')
+        buffer.seek(0)
+        with connection.connection.driver_connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY comment_stage ({column_list}) FROM STDIN', buffer)
+
+        inserted = connection.exec_driver_sql(
+            f'INSERT INTO comments ({column_list}) SELECT {column_list} FROM comment_stage '
+            f'ON CONFLICT (comment_id) DO NOTHING RETURNING comment_id'
+        ).scalars().all()
+        connection.exec_driver_sql('TRUNCATE comment_stage')
+        return set(inserted)
+
+    def _execute_many(self, statement, rows):
+        for start in range(0, len(rows), self.batch_size):
+            db.session.execute(statement, rows[start:start + self.batch_size])
+
+    @staticmethod
+    def _insert_statement(model, index_elements):
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            return sqlite.insert(model).on_conflict_do_nothing(index_elements=index_elements)
+        if dialect == 'postgresql':
+            return postgresql.insert(model).on_conflict_do_nothing(index_elements=index_elements)
+        return insert(model)
+
+
+def _copy_value(value):
+    """COPY 文本格式的字段：NULL 为 \\N，反斜杠/制表符/换行需要转义"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        value = value.isoformat(sep=' ')
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
@@ -0,0 +1,134 @@
+"""
+分析任务的进度事件（供 /api/jobs/<id>/events 的 SSE 流使用）
+- 每个进程一个 JobEventHub：按任务分频道，订阅者阻塞在频道的 Condition 上，不轮询、不占用数据库连接
+- 每个频道只保留最近 Config.JOB_EVENT_BUFFER 条事件，慢订阅者跳过中间的计数更新（事件都带完整状态）
+- redis 后端时 worker 在其他进程，事件经 Redis PUBLISH 发出，每个 API 进程只用一个订阅线程转发到本进程的 hub
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class _Channel:
+    __slots__ = ('events', 'seq', 'condition', 'subscribers')
+
+    def __init__(self, buffer_size):
+        self.events = deque(maxlen=buffer_size)  # (seq, job)
+        self.seq = 0
+        self.condition = threading.Condition()
+        self.subscribers = 0
+
+
+class JobSubscription:
+    """一个订阅者在某个任务频道上的读取位置"""
+
+    def __init__(self, hub, job_id, channel):
+        self.hub = hub
+        self.job_id = job_id
+        self._channel = channel
+        self._last_seq = channel.seq
+
+    def wait(self, timeout):
+        """返回上次读取之后的新事件（任务记录列表）；timeout 秒内没有新事件时返回空列表"""
+        channel = self._channel
+        with channel.condition:
+            channel.condition.wait_for(lambda: channel.seq > self._last_seq, timeout=timeout)
+            events = [job for seq, job in channel.events if seq > self._last_seq]
+            self._last_seq = channel.seq
+        return events
+
+    def close(self):
+        self.hub._unsubscribe(self.job_id, self._channel)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JobEventHub:
+    """进程内的任务事件分发；没有订阅者的任务不保留事件（新订阅者先读取任务的当前状态）"""
+
+    def __init__(self, buffer_size=None):
+        self.buffer_size = buffer_size or Config.JOB_EVENT_BUFFER
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def publish(self, job):
+        with self._lock:
+            channel = self._channels.get(job['job_id'])
+        if channel is None:
+            return
+        with channel.condition:
+            channel.seq += 1
+            channel.events.append((channel.seq, job))
+            channel.condition.notify_all()
+
+    def subscribe(self, job_id):
+        with self._lock:
+            channel = self._channels.get(job_id)
+            if channel is None:
+                channel = self._channels[job_id] = _Channel(self.buffer_size)
+            channel.subscribers += 1
+        return JobSubscription(self, job_id, channel)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(channel.subscribers for channel in self._channels.values())
+
+    def _unsubscribe(self, job_id, channel):
+        with self._lock:
+            channel.subscribers -= 1
+            if channel.subscribers <= 0 and self._channels.get(job_id) is channel:
+                del self._channels[job_id]
+
+
+class RedisEventRelay:
+    """在后台线程订阅 Redis 频道，把其他进程发布的任务事件转发到本进程的 hub（整个进程一个连接）"""
+
+    def __init__(self, client, channel, hub):
+        self._redis = client
+        self.channel = channel
+        self.hub = hub
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='job-event-relay', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message['type'] == 'message':
+                        self.hub.publish(json.loads(message['data']))
+            except Exception:
+                logger.exception('Job event relay lost its Redis subscription, reconnecting')
+                time.sleep(1)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_job_event_hub():
+    """进程内共享的任务事件 hub"""
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = JobEventHub()
+    return _hub
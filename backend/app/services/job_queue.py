@@ -0,0 +1,502 @@
+"""
+后台分析任务队列
+- /api/analyze 只负责入队并立即返回任务ID，爬取、分析和写库由 worker 执行，HTTP worker 不再被长任务占用
+- memory 后端：进程内队列 + worker 线程，无需外部服务（单进程部署/开发用）
+- redis 后端：任务记录存为 Redis 字符串，待执行队列为 Redis 列表，由独立的 worker 进程（python worker.py）消费
+- fakeredis 后端：与 redis 相同的代码路径，数据保存在进程内，由进程内 worker 线程消费
+- 每次更新任务都会发布进度事件（见 job_events），SSE 订阅者不需要轮询
+- 同一视频同时只有一个进行中的任务：后来的请求直接挂到进行中的任务上，共享它的结果
+- 任务可以带期限（从提交时算起）并可取消：运行中的任务在下一次检查时停止，已处理的评论保留，
+  排队中的任务不再执行，不会为已放弃的请求占用 worker
+"""
+import copy
+import json
+import logging
+import math
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from app import db
+from config import Config
+from .job_events import RedisEventRelay, get_job_event_hub
+from .rate_limiter import QuotaExceededError
+from .video_analysis import VideoAnalysisService, VideoNotFoundError
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+JOB_TIMED_OUT = 'timed_out'
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED, JOB_TIMED_OUT)
+
+
+class JobClaimError(Exception):
+    """多次尝试后仍无法把任务登记为视频的进行中任务（登记一直被其他请求抢占）"""
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+class _MemoryJobBackend:
+    """进程内任务存储；只保留最近 max_jobs 个已结束的任务"""
+
+    def __init__(self, max_jobs):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._active = {}  # video_id -> 进行中的 job_id
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+
+    def save(self, job):
+        with self._lock:
+            self._jobs[job['job_id']] = copy.deepcopy(job)
+            self._evict()
+
+    def load(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job is not None else None
+
+    def update(self, job_id, apply):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            apply(job)
+            return copy.deepcopy(job)
+
+    def delete(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def claim(self, video_id, job_id):
+        """登记视频的进行中任务；已有登记时不覆盖，返回已登记的 job_id（成功时返回 None）"""
+        with self._lock:
+            current = self._active.get(video_id)
+            if current is None:
+                self._active[video_id] = job_id
+            return current
+
+    def release(self, video_id, job_id):
+        """只有登记的仍是 job_id 时才删除"""
+        with self._lock:
+            if self._active.get(video_id) == job_id:
+                del self._active[video_id]
+
+    def push(self, job_id):
+        self._pending.put(job_id)
+
+    def pop(self, timeout):
+        try:
+            return self._pending.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def publish(self, job):
+        get_job_event_hub().publish(job)
+
+    def start_relay(self):
+        pass
+
+    def _evict(self):
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [k for k, job in self._jobs.items() if job['state'] in FINISHED_STATES][:excess]:
+            del self._jobs[job_id]
+
+
+class _RedisJobBackend:
+    """
+    Redis 任务存储：jobs:<id> 为任务JSON（带过期时间），jobs:pending 为待执行列表（LPUSH/BRPOP），
+    任务更新发布到 jobs:events 频道
+    """
+
+    def __init__(self, client, ttl, prefix='jobs'):
+        self._redis = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._pending_key = f'{prefix}:pending'
+        self._relay = RedisEventRelay(client, f'{prefix}:events', get_job_event_hub())
+
+    def _key(self, job_id):
+        return f'{self.prefix}:{job_id}'
+
+    def _active_key(self, video_id):
+        return f'{self.prefix}:active:{video_id}'
+
+    def save(self, job):
+        self._redis.set(self._key(job['job_id']), json.dumps(job), ex=self.ttl)
+
+    def load(self, job_id):
+        raw = self._redis.get(self._key(job_id))
+        return json.loads(raw) if raw else None
+
+    def update(self, job_id, apply):
+        key = self._key(job_id)
+        result = {}
+
+        # WATCH/MULTI：与其他进程（如取消请求）同时修改同一任务时重试，不会互相覆盖
+        def _transaction(pipe):
+            raw = pipe.get(key)
+            if not raw:
+                result['job'] = None
+                return
+            job = json.loads(raw)
+            apply(job)
+            pipe.multi()
+            pipe.set(key, json.dumps(job), ex=self.ttl)
+            result['job'] = job
+
+        self._redis.transaction(_transaction, key)
+        return result['job']
+
+    def delete(self, job_id):
+        self._redis.delete(self._key(job_id))
+
+    def claim(self, video_id, job_id):
+        # SET NX：多个进程同时提交同一视频时只有一个能登记成功
+        key = self._active_key(video_id)
+        if self._redis.set(key, job_id, nx=True, ex=self.ttl):
+            return None
+        current = self._redis.get(key)
+        return current.decode() if current else ''
+
+    def release(self, video_id, job_id):
+        key = self._active_key(video_id)
+
+        def _transaction(pipe):
+            current = pipe.get(key)
+            if current and current.decode() == job_id:
+                pipe.multi()
+                pipe.delete(key)
+
+        self._redis.transaction(_transaction, key)
+
+    def push(self, job_id):
+        self._redis.lpush(self._pending_key, job_id)
+
+    def pop(self, timeout):
+        item = self._redis.brpop(self._pending_key, timeout=max(1, math.ceil(timeout)))
+        if item is None:
+            return None
+        job_id = item[1]
+        return job_id.decode() if isinstance(job_id, bytes) else job_id
+
+    def publish(self, job):
+        self._redis.publish(self._relay.channel, json.dumps(job))
+
+    def start_relay(self):
+        self._relay.start()
+
+
+class JobQueue:
+    """
+    分析任务队列
+    任务记录：job_id / video_id / options / state / stage / counts / eta_seconds / result / error / error_type /
+    deadline / cancel_requested / 时间戳
+    state: queued -> running -> succeeded | failed | cancelled | timed_out；stage 和 counts 由分析流程的 progress 回调更新
+    cancelled / timed_out 的任务 result 为部分分析的结果（排队期间就被取消/超时的任务没有 result）
+    """
+
+    def __init__(self, backend=None):
+        backend = backend or Config.JOB_QUEUE_BACKEND
+        if backend == 'memory':
+            self._backend = _MemoryJobBackend(Config.JOB_HISTORY_SIZE)
+        elif backend == 'redis':
+            import redis
+            self._backend = _RedisJobBackend(redis.Redis.from_url(Config.REDIS_URL), Config.JOB_TTL)
+        elif backend == 'fakeredis':
+            import fakeredis
+            self._backend = _RedisJobBackend(fakeredis.FakeRedis(), Config.JOB_TTL)
+        else:
+            raise ValueError(f'Unknown job queue backend: {backend}')
+        self.backend = backend
+        self._workers = []
+        self._workers_lock = threading.Lock()
+
+    @property
+    def in_process(self):
+        """任务是否只能由本进程的 worker 线程执行（memory/fakeredis 的数据不跨进程）"""
+        return self.backend != 'redis'
+
+    def enqueue(self, video_id, options, timeout=None):
+        """
+        提交分析任务，返回 (job, created)
+        timeout: 从提交时算起的期限（秒），为空或0时不限
+        该视频已有进行中（排队或运行）的任务时不新建，返回该任务和 created=False，调用方共享它的结果（和期限）
+        登记反复失败时抛出 JobClaimError（不会提交一个未登记的任务，否则同一视频会有两个任务）
+        """
+        created_at = datetime.utcnow()
+        now = created_at.isoformat()
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'video_id': video_id,
+            'options': options,
+            'state': JOB_QUEUED,
+            'stage': JOB_QUEUED,
+            'counts': {},
+            'eta_seconds': None,
+            'result': None,
+            'error': None,
+            'error_type': None,
+            'deadline': (created_at + timedelta(seconds=timeout)).isoformat() if timeout else None,
+            'cancel_requested': False,
+            'created_at': now,
+            'started_at': None,
+            'finished_at': None,
+            'updated_at': now
+        }
+        # 先保存再登记：其他请求读到登记的 job_id 时任务记录一定已存在
+        self._backend.save(job)
+        for _ in range(3):
+            current_id = self._backend.claim(video_id, job['job_id'])
+            if current_id is None:
+                break
+            current = self.get(current_id) if current_id else None
+            if current is not None and not _is_stale(current):
+                self._backend.delete(job['job_id'])
+                logger.info('Video %s already has job %s in flight, attaching', video_id, current_id)
+                return current, False
+            # 登记的任务已结束/过期/worker已退出：清掉登记后重试
+            self._backend.release(video_id, current_id)
+        else:
+            self._backend.delete(job['job_id'])
+            raise JobClaimError(f'Could not register a job for video {video_id}')
+        
+        self._backend.push(job['job_id'])
+        logger.info('Queued job %s for video %s', job['job_id'], video_id)
+        return job, True
+
+    def get(self, job_id):
+        return self._backend.load(job_id)
+
+    def update(self, job_id, counts=None, **fields):
+        """更新任务字段并发布进度事件；counts 与已有计数合并。任务不存在（已过期）时返回 None"""
+        def _apply(job):
+            job.update(fields)
+            if counts:
+                job['counts'].update(counts)
+
+        return self._modify(job_id, _apply)
+
+    def start(self, job_id):
+        """
+        worker 领取任务：queued -> running，与取消请求在同一事务中判断，不会覆盖已取消的状态
+        排队期间已过期限的任务直接结束为 timed_out。返回更新后的任务记录（不存在时返回 None），
+        state 不是 running 时调用方不应执行
+        """
+        def _apply(job):
+            if job['state'] != JOB_QUEUED:
+                return
+            if _deadline_passed(job):
+                job.update(state=JOB_TIMED_OUT, stage=JOB_TIMED_OUT, error='Deadline exceeded before the job started',
+                           error_type='deadline_exceeded', finished_at=_now())
+            else:
+                job.update(state=JOB_RUNNING, stage='starting', started_at=_now())
+
+        return self._modify(job_id, _apply)
+
+    def cancel(self, job_id):
+        """
+        请求取消任务：排队中的任务直接结束为 cancelled；运行中的任务标记 cancel_requested，
+        由 worker 在下一次检查时停止（已处理的评论保留）。已结束的任务不变。任务不存在时返回 None
+        """
+        def _apply(job):
+            if job['state'] in FINISHED_STATES:
+                return
+            job['cancel_requested'] = True
+            if job['state'] == JOB_QUEUED:
+                job.update(state=JOB_CANCELLED, stage=JOB_CANCELLED, finished_at=_now())
+
+        job = self._modify(job_id, _apply)
+        if job is not None and job['state'] == JOB_CANCELLED:
+            self.release(job)
+        return job
+
+    def _modify(self, job_id, apply):
+        """在后端的事务中修改任务记录，刷新 eta/updated_at 并发布事件"""
+        def _apply(job):
+            apply(job)
+            job['eta_seconds'] = _estimate_eta(job)
+            job['updated_at'] = _now()
+
+        job = self._backend.update(job_id, _apply)
+        if job is not None:
+            try:
+                self._backend.publish(job)
+            except Exception:
+                logger.exception('Failed to publish event for job %s', job_id)
+        return job
+
+    def release(self, job):
+        """任务结束后取消视频的进行中登记"""
+        self._backend.release(job['video_id'], job['job_id'])
+
+    def wait(self, job_id):
+        """阻塞直到任务结束，返回最终的任务记录（任务不存在时返回 None）"""
+        with self.subscribe(job_id) as subscription:
+            job = self.get(job_id)
+            while job is not None and job['state'] not in FINISHED_STATES:
+                events = subscription.wait(Config.JOB_EVENT_KEEPALIVE)
+                # 没有事件时重新读取，防止错过 Redis 频道上的消息
+                job = events[-1] if events else self.get(job_id)
+            return job
+
+    def subscribe(self, job_id):
+        """订阅任务的进度事件（返回 JobSubscription，用完需 close）"""
+        self._backend.start_relay()
+        return get_job_event_hub().subscribe(job_id)
+
+    def next_job(self, timeout=1.0):
+        """阻塞至多 timeout 秒取下一个待执行的任务ID，没有时返回 None"""
+        return self._backend.pop(timeout)
+
+    def start_workers(self, app, count=None, stop_event=None):
+        """启动 count 个 worker 线程（重复调用不会多启动），返回线程列表"""
+        count = count or Config.JOB_WORKER_THREADS
+        with self._workers_lock:
+            if not self._workers:
+                for i in range(count):
+                    thread = threading.Thread(target=run_worker, args=(app, self, stop_event),
+                                              name=f'analysis-worker-{i}', daemon=True)
+                    thread.start()
+                    self._workers.append(thread)
+                logger.info('Started %d analysis workers (%s backend)', count, self.backend)
+            return list(self._workers)
+
+
+def run_worker(app, job_queue, stop_event=None, poll_timeout=1.0):
+    """worker 主循环：逐个取出任务执行，直到 stop_event 被设置"""
+    while stop_event is None or not stop_event.is_set():
+        try:
+            job_id = job_queue.next_job(poll_timeout)
+        except Exception:
+            logger.exception('Failed to fetch next job')
+            if stop_event is not None and stop_event.wait(poll_timeout):
+                break
+            continue
+        if job_id:
+            execute_job(app, job_queue, job_id)
+
+
+def execute_job(app, job_queue, job_id):
+    """执行一个任务，结果和错误写回任务记录"""
+    job = job_queue.start(job_id)
+    if job is None or job['state'] != JOB_RUNNING:
+        if job is not None and job['state'] == JOB_TIMED_OUT:
+            job_queue.release(job)
+        logger.warning('Skipping job %s (%s)', job_id, job['state'] if job else 'expired')
+        return
+
+    def _progress(stage, **counts):
+        job_queue.update(job_id, stage=stage, counts=counts)
+
+    with app.app_context():
+        try:
+            result = VideoAnalysisService().analyze(job['video_id'], progress=_progress,
+                                                    should_stop=_stop_checker(job_queue, job), **job['options'])
+        except VideoNotFoundError:
+            _fail(job_queue, job_id, 'not_found', 'Video not found')
+        except QuotaExceededError as e:
+            _fail(job_queue, job_id, 'quota_exceeded', str(e))
+        except Exception as e:
+            logger.exception('Job %s failed', job_id)
+            _fail(job_queue, job_id, 'error', str(e))
+        else:
+            if result.get('stopped') == 'cancelled':
+                job_queue.update(job_id, state=JOB_CANCELLED, stage=JOB_CANCELLED, result=result, finished_at=_now())
+            elif result.get('stopped') == 'deadline':
+                job_queue.update(job_id, state=JOB_TIMED_OUT, stage=JOB_TIMED_OUT, result=result,
+                                 error='Deadline exceeded, partial results kept', error_type='deadline_exceeded',
+                                 finished_at=_now())
+            else:
+                job_queue.update(job_id, state=JOB_SUCCEEDED, stage='done', result=result, finished_at=_now())
+        finally:
+            db.session.remove()
+            job_queue.release(job)
+
+
+def _stop_checker(job_queue, job):
+    """
+    分析流程的 should_stop 回调：期限在本地判断；取消标记最多每 JOB_CANCEL_CHECK_INTERVAL 秒读一次任务记录
+    （流水线等待期间每 50ms 调用一次）。任务记录已不存在时同样停止，没有人能再拿到结果
+    """
+    last_check = time.monotonic()
+
+    def _should_stop():
+        nonlocal last_check
+        if _deadline_passed(job):
+            return 'deadline'
+        now = time.monotonic()
+        if now - last_check >= Config.JOB_CANCEL_CHECK_INTERVAL:
+            last_check = now
+            current = job_queue.get(job['job_id'])
+            if current is None or current['cancel_requested']:
+                return 'cancelled'
+        return None
+
+    return _should_stop
+
+
+def _deadline_passed(job):
+    return bool(job['deadline']) and datetime.utcnow() >= datetime.fromisoformat(job['deadline'])
+
+
+def _is_stale(job):
+    """
+    已结束；运行中但超过 JOB_STALE_AFTER 秒没有更新（worker 可能已退出）；
+    或排队中但已过期限、排队超过 JOB_QUEUED_STALE_AFTER 秒（worker 取出后崩溃时任务丢失，永远不会执行）
+    """
+    if job['state'] in FINISHED_STATES:
+        return True
+    if job['state'] == JOB_RUNNING:
+        idle = (datetime.utcnow() - datetime.fromisoformat(job['updated_at'])).total_seconds()
+        return idle > Config.JOB_STALE_AFTER
+    if job['state'] == JOB_QUEUED:
+        if _deadline_passed(job):
+            return True
+        queued = (datetime.utcnow() - datetime.fromisoformat(job['created_at'])).total_seconds()
+        return queued > Config.JOB_QUEUED_STALE_AFTER
+    return False
+
+
+def _estimate_eta(job):
+    """按已爬取评论数占预期总数的比例和已用时间估算剩余秒数；无法估算时返回 None"""
+    if job['state'] in FINISHED_STATES:
+        return 0
+    counts = job['counts']
+    done, expected = counts.get('comments_fetched'), counts.get('expected_comments')
+    if not done or not expected or done >= expected or not job['started_at']:
+        # 视频的评论数统计可能小于实际能爬到的数量，超过预期后无法估算
+        return None
+    elapsed = (datetime.utcnow() - datetime.fromisoformat(job['started_at'])).total_seconds()
+    fraction = done / expected
+    return round(elapsed * (1 - fraction) / fraction, 1)
+
+
+def _fail(job_queue, job_id, error_type, message):
+    job_queue.update(job_id, state=JOB_FAILED, stage='failed', error=message, error_type=error_type,
+                     finished_at=_now())
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """进程内共享的任务队列（后端由 Config.JOB_QUEUE_BACKEND 决定）"""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue()
+    return _job_queue
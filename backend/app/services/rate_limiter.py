@@ -0,0 +1,272 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from googleapiclient.errors import HttpError
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+try:
+    from zoneinfo import ZoneInfo
+    _QUOTA_TZ = ZoneInfo('America/Los_Angeles')  # YouTube配额在太平洋时间午夜重置
+except Exception:
+    _QUOTA_TZ = timezone.utc
+
+# 可重试的限流原因；quotaExceeded 表示当日配额用尽，重试没有意义
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+QUOTA_EXCEEDED_REASONS = {'quotaExceeded', 'dailyLimitExceeded'}
+
+
+class QuotaExceededError(Exception):
+    """当日YouTube API配额已用尽"""
+
+
+def _quota_day():
+    return datetime.now(_QUOTA_TZ).strftime('%Y-%m-%d')
+
+
+def _take(state, cost, now, day, daily_units, rate, capacity):
+    """
+    令牌桶扣减（纯函数，memory/file 后端共用；redis 后端用同样逻辑的Lua脚本）
+    返回 (是否成功, 需等待秒数)；等待秒数为 None 表示当日配额已用尽
+    """
+    used = state.get('used', 0) if state.get('day') == day else 0
+    tokens = state.get('tokens', capacity)
+    last = state.get('ts', now)
+    tokens = min(capacity, tokens + max(0.0, now - last) * rate)
+
+    state.update(day=day, ts=now, used=used, tokens=tokens)
+    if used + cost > daily_units:
+        return False, None
+    if tokens >= cost:
+        state.update(tokens=tokens - cost, used=used + cost)
+        return True, 0.0
+    return False, (cost - tokens) / rate
+
+
+class _MemoryState:
+    """进程内共享状态"""
+
+    def __init__(self):
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def update(self, fn):
+        with self._lock:
+            return fn(self._state)
+
+
+class _FileState:
+    """通过文件锁在同一台机器的多个worker进程间共享状态"""
+
+    def __init__(self, path):
+        import fcntl
+        self._fcntl = fcntl
+        self._path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def update(self, fn):
+        with self._lock, open(self._path, 'a+') as f:
+            self._fcntl.flock(f, self._fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                try:
+                    state = json.loads(raw) if raw else {}
+                except ValueError:
+                    logger.warning('Corrupt quota state file %s, resetting', self._path)
+                    state = {}
+                result = fn(state)
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+                f.flush()
+                return result
+            finally:
+                self._fcntl.flock(f, self._fcntl.LOCK_UN)
+
+
+_REDIS_TAKE = """
+local cost = tonumber(ARGV[1])
+local now = tonumber(ARGV[2])
+local day = ARGV[3]
+local daily = tonumber(ARGV[4])
+local rate = tonumber(ARGV[5])
+local capacity = tonumber(ARGV[6])
+local s = redis.call('HMGET', KEYS[1], 'day', 'used', 'tokens', 'ts')
+local used = 0
+if s[1] == day then used = tonumber(s[2]) or 0 end
+local tokens = tonumber(s[3]) or capacity
+local last = tonumber(s[4]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+local ok, wait = 0, '0'
+if used + cost > daily then
+    wait = '-1'
+elseif tokens >= cost then
+    tokens = tokens - cost
+    used = used + cost
+    ok = 1
+else
+    wait = tostring((cost - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'day', day, 'used', used, 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], 172800)
+return {ok, wait}
+"""
+
+
+class _RedisState:
+    """通过Redis在多台机器的worker间共享状态（Lua脚本保证原子性）"""
+
+    def __init__(self, url, key):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._key = key
+        self._take = self._redis.register_script(_REDIS_TAKE)
+
+    def take(self, cost, now, day, daily_units, rate, capacity):
+        ok, wait = self._take(keys=[self._key], args=[cost, now, day, daily_units, rate, capacity])
+        wait = float(wait)
+        return bool(ok), (None if wait < 0 else wait)
+
+    def exhaust(self, day, daily_units):
+        self._redis.hset(self._key, mapping={'day': day, 'used': daily_units})
+
+    def used(self, day):
+        stored_day, used = self._redis.hmget(self._key, 'day', 'used')
+        return int(float(used)) if stored_day and stored_day.decode() == day and used else 0
+
+
+class QuotaRateLimiter:
+    """
+    YouTube Data API 配额感知的限流器
+    - 按调用类型计算配额单位（Config.YOUTUBE_API_UNIT_COSTS）
+    - 令牌桶控制每秒速率，同时限制每日总配额
+    - 429/403限流错误使用带抖动的指数退避重试
+    - 状态可通过文件或Redis在多个worker进程间共享
+    """
+
+    def __init__(self, daily_units=None, per_second=None, backend=None, unit_costs=None):
+        self.daily_units = daily_units if daily_units is not None else Config.YOUTUBE_QUOTA_DAILY_UNITS
+        self.rate = float(per_second if per_second is not None else Config.YOUTUBE_QUOTA_PER_SECOND)
+        self.unit_costs = unit_costs or Config.YOUTUBE_API_UNIT_COSTS
+        self.capacity = max(self.rate, max(self.unit_costs.values()))
+
+        backend = backend or Config.YOUTUBE_QUOTA_BACKEND
+        if backend == 'redis':
+            self._state = _RedisState(Config.REDIS_URL, 'youtube:quota')
+        elif backend == 'file':
+            self._state = _FileState(Config.YOUTUBE_QUOTA_STATE_FILE)
+        elif backend == 'memory':
+            self._state = _MemoryState()
+        else:
+            raise ValueError(f'Unknown quota backend: {backend}')
+
+    def cost(self, call_type):
+        return self.unit_costs.get(call_type, 1)
+
+    def acquire(self, call_type):
+        """阻塞直到可以发起一次 call_type 调用；当日配额用尽时抛出 QuotaExceededError"""
+        cost = self.cost(call_type)
+        while True:
+            ok, wait = self._try_take(cost)
+            if ok:
+                return
+            if wait is None:
+                raise QuotaExceededError(f'YouTube API daily quota of {self.daily_units} units exhausted')
+            # 抖动避免多个worker同时醒来争抢令牌
+            time.sleep(wait + random.uniform(0, 0.05))
+
+    def execute(self, request, call_type):
+        """按配额执行一个 googleapiclient 请求，遇到限流时指数退避重试"""
+        attempt = 0
+        while True:
+            self.acquire(call_type)
+            try:
+                return request.execute()
+            except HttpError as e:
+                status = getattr(e.resp, 'status', None)
+                reason = _error_reason(e)
+
+                if reason in QUOTA_EXCEEDED_REASONS:
+                    # 通知其他worker：当日配额已用尽
+                    self.exhaust()
+                    raise QuotaExceededError(f'YouTube API quota exceeded ({reason})') from e
+                if status != 429 and not (status == 403 and reason in RATE_LIMIT_REASONS):
+                    raise
+                if attempt >= Config.YOUTUBE_API_MAX_RETRIES:
+                    raise
+
+                delay = min(Config.YOUTUBE_API_BACKOFF_MAX, Config.YOUTUBE_API_BACKOFF_BASE * (2 ** attempt))
+                delay = random.uniform(delay / 2, delay)  # 抖动
+                logger.warning('%s rate limited (%s %s), retrying in %.2fs', call_type, status, reason, delay)
+                time.sleep(delay)
+                attempt += 1
+
+    def exhaust(self):
+        """将当日配额标记为已用尽"""
+        day = _quota_day()
+        if isinstance(self._state, _RedisState):
+            self._state.exhaust(day, self.daily_units)
+        else:
+            self._state.update(lambda state: state.update(day=day, used=self.daily_units))
+
+    def remaining(self):
+        """当日剩余配额单位"""
+        day = _quota_day()
+        if isinstance(self._state, _RedisState):
+            used = self._state.used(day)
+        else:
+            used = self._state.update(lambda state: state.get('used', 0) if state.get('day') == day else 0)
+        return max(0, self.daily_units - used)
+
+    def seconds_until_reset(self):
+        """距当日配额重置（太平洋时间午夜）的秒数"""
+        now = datetime.now(_QUOTA_TZ)
+        midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return max(1.0, (midnight - now).total_seconds())
+
+    def _try_take(self, cost):
+        now = time.time()
+        day = _quota_day()
+        if isinstance(self._state, _RedisState):
+            return self._state.take(cost, now, day, self.daily_units, self.rate, self.capacity)
+        return self._state.update(
+            lambda state: _take(state, cost, now, day, self.daily_units, self.rate, self.capacity)
+        )
+
+
+def _error_reason(error):
+    """从HttpError中提取错误原因（如 quotaExceeded / rateLimitExceeded）"""
+    try:
+        details = error.error_details
+        if isinstance(details, list) and details:
+            return details[0].get('reason')
+    except Exception:
+        pass
+    try:
+        content = json.loads(error.content.decode('utf-8'))
+        return content['error']['errors'][0]['reason']
+    except Exception:
+        return None
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """进程内共享的限流器（状态后端由 Config.YOUTUBE_QUOTA_BACKEND 决定）"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = QuotaRateLimiter()
+    return _limiter
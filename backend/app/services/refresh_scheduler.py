@@ -0,0 +1,196 @@
+"""
+关注列表的定时重新分析（python worker.py --scheduler）
+- tracked_videos 中每个视频有自己的间隔、优先级和评论数上限；到期后提交 delta 模式的分析任务，只爬水位线之后的新评论。
+  该视频已有进行中的任务时挂到该任务上，不重复爬取
+- 配额预算：每轮可用「当日剩余配额 × SCHEDULER_QUOTA_SHARE × 本轮时长 / 距配额重置的时间」个单位，
+  把刷新均匀摊到整个配额窗口，其余配额留给交互式请求。到期的视频超出预算时按优先级先后执行，其余顺延到下一轮
+- 下次执行时间 = 提交时间 + 间隔 × (1 ± SCHEDULER_JITTER)；新加入的视频随机分布在一个间隔内，
+  批量导入的关注列表不会在同一时刻集中到期
+- 用条件更新（next_run_at 未变）认领到期的视频，多个调度器同时运行也不会重复提交；但预算按进程计算，只应运行一个
+"""
+import logging
+import math
+import random
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app import db
+from app.models import TrackedVideo
+from config import Config
+from .job_queue import FINISHED_STATES, JOB_QUEUED, JOB_RUNNING, get_job_queue
+from .rate_limiter import get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+def next_run_time(interval_seconds, start, jitter=None):
+    """start + 间隔 × (1 ± jitter)"""
+    jitter = Config.SCHEDULER_JITTER if jitter is None else jitter
+    return start + timedelta(seconds=interval_seconds * random.uniform(1 - jitter, 1 + jitter))
+
+
+def initial_run_time(interval_seconds, now):
+    """新加入的视频在一个间隔内均匀随机到期"""
+    return now + timedelta(seconds=random.uniform(0, interval_seconds))
+
+
+def track_videos(video_ids, fields):
+    """
+    加入/更新关注列表（需要在应用上下文中调用），返回 (TrackedVideo 列表, 新加入的数量)
+    fields: interval_seconds / priority / max_comments / enabled / run_now，已在列表中的视频只更新给出的字段
+    """
+    now = datetime.utcnow()
+    video_ids = list(dict.fromkeys(video_ids))
+    existing = {t.video_id: t for t in TrackedVideo.query.filter(TrackedVideo.video_id.in_(video_ids))}
+
+    tracked_videos = []
+    created = 0
+    for video_id in video_ids:
+        tracked = existing.get(video_id)
+        if tracked is None:
+            tracked = TrackedVideo(
+                video_id=video_id,
+                interval_seconds=fields.get('interval_seconds', Config.SCHEDULER_DEFAULT_INTERVAL),
+                priority=fields.get('priority', 0),
+                max_comments=fields.get('max_comments', Config.SCHEDULER_DEFAULT_MAX_COMMENTS),
+                enabled=fields.get('enabled', True)
+            )
+            tracked.next_run_at = now if fields.get('run_now') else initial_run_time(tracked.interval_seconds, now)
+            db.session.add(tracked)
+            created += 1
+        else:
+            update_tracking(tracked, fields, now)
+        tracked_videos.append(tracked)
+
+    db.session.commit()
+    return tracked_videos, created
+
+
+def update_tracking(tracked, fields, now=None):
+    """修改关注设置（不提交）；间隔变化时按新间隔从上次提交时间重新计算下次执行时间"""
+    now = now or datetime.utcnow()
+    interval = fields.get('interval_seconds')
+    if interval and interval != tracked.interval_seconds:
+        tracked.interval_seconds = interval
+        tracked.next_run_at = next_run_time(interval, tracked.last_enqueued_at or now)
+    for name in ('priority', 'max_comments', 'enabled'):
+        if name in fields:
+            setattr(tracked, name, fields[name])
+    if fields.get('run_now'):
+        tracked.next_run_at = now
+
+
+def _estimated_cost(tracked):
+    """一次刷新预计消耗的配额单位：上次实际用的页数 + videos.list；没有运行过时按 max_comments 估算"""
+    if tracked.last_cost_units:
+        return tracked.last_cost_units
+    return 1 + math.ceil(tracked.max_comments / 100)
+
+
+class RefreshScheduler:
+    """关注列表调度器：run() 每 SCHEDULER_TICK_SECONDS 秒执行一轮 tick()"""
+
+    def __init__(self, app, job_queue=None, limiter=None):
+        self.app = app
+        self.job_queue = job_queue or get_job_queue()
+        self.limiter = limiter or get_rate_limiter()
+        # 可用的配额单位；提交时按预估扣减，可以为负（预估超支，之后几轮补回）
+        self.credit = 0.0
+
+    def budget(self):
+        """本轮新增的配额单位：剩余配额按比例均匀分到配额重置前的每一轮"""
+        share = self.limiter.remaining() * Config.SCHEDULER_QUOTA_SHARE
+        return share * Config.SCHEDULER_TICK_SECONDS / self.limiter.seconds_until_reset()
+
+    def tick(self):
+        """执行一轮调度（需要在应用上下文中调用），返回本轮提交的 video_id 列表"""
+        now = datetime.utcnow()
+        self._collect_results()
+
+        # 空闲时攒下的额度有上限，不会在一轮里集中用掉
+        budget = self.budget()
+        self.credit = min(self.credit + budget, budget * Config.SCHEDULER_BURST_TICKS)
+        if self.credit <= 0:
+            return []
+
+        due = (TrackedVideo.query
+               .filter(TrackedVideo.enabled.is_(True), TrackedVideo.next_run_at <= now)
+               .order_by(TrackedVideo.priority.desc(), TrackedVideo.next_run_at)
+               .limit(Config.SCHEDULER_MAX_PER_TICK)
+               .all())
+        enqueued = []
+        for tracked in due:
+            if self.credit <= 0:
+                break
+            if not self._claim(tracked, now):
+                continue
+            options = {'max_comments': tracked.max_comments, 'expand_replies': False, 'mode': 'delta'}
+            try:
+                job, _ = self.job_queue.enqueue(tracked.video_id, options, timeout=Config.JOB_DEFAULT_TIMEOUT)
+            except Exception as e:
+                logger.exception('Failed to enqueue refresh of %s', tracked.video_id)
+                tracked.last_status, tracked.last_error = 'error', str(e)
+                db.session.commit()
+                continue
+            tracked.last_job_id = job['job_id']
+            tracked.last_status = job['state']
+            tracked.last_error = None
+            db.session.commit()
+            self.credit -= _estimated_cost(tracked)
+            enqueued.append(tracked.video_id)
+
+        if enqueued or due:
+            logger.info('Scheduler enqueued %d of %d due videos (credit %.1f units)',
+                        len(enqueued), len(due), self.credit)
+        return enqueued
+
+    def run(self, stop_event=None):
+        """调度主循环，直到 stop_event 被设置"""
+        stop_event = stop_event or threading.Event()
+        logger.info('Refresh scheduler started (tick %ss, quota share %.0f%%)',
+                    Config.SCHEDULER_TICK_SECONDS, Config.SCHEDULER_QUOTA_SHARE * 100)
+        while True:
+            with self.app.app_context():
+                try:
+                    self.tick()
+                except Exception:
+                    logger.exception('Scheduler tick failed')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            if stop_event.wait(Config.SCHEDULER_TICK_SECONDS):
+                return
+
+    def _claim(self, tracked, now):
+        """把 next_run_at 推到下一次（条件更新，其他调度器已认领时返回 False）"""
+        claimed = db.session.execute(
+            update(TrackedVideo)
+            .where(TrackedVideo.id == tracked.id, TrackedVideo.next_run_at == tracked.next_run_at)
+            .values(next_run_at=next_run_time(tracked.interval_seconds, now), last_enqueued_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+        db.session.commit()
+        return claimed
+
+    def _collect_results(self):
+        """把上一轮提交的任务的结果写回关注列表（状态、错误、实际消耗的配额）"""
+        in_flight = TrackedVideo.query.filter(TrackedVideo.last_status.in_((JOB_QUEUED, JOB_RUNNING))).all()
+        for tracked in in_flight:
+            job = self.job_queue.get(tracked.last_job_id)
+            if job is None:
+                tracked.last_status = 'expired'
+                continue
+            tracked.last_status = job['state']
+            if job['state'] not in FINISHED_STATES:
+                continue
+            tracked.last_error = job['error']
+            tracked.last_finished_at = datetime.fromisoformat(job['finished_at'])
+            if job['started_at']:
+                tracked.last_cost_units = 1 + job['counts'].get('pages_fetched', 0)
+            if job['error_type'] == 'not_found':
+                # 视频已删除或设为私享，不再刷新
+                tracked.enabled = False
+                logger.warning('Tracked video %s not found, disabling', tracked.video_id)
+        db.session.commit()
@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import re
+import tempfile
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app import db
+from app.models import Comment
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_VIDEO_ID_RE = re.compile(r'^[0-9A-Za-z_-]{1,50}$')
+
+# 快照中的列（与 Comment 字段对应，labels/topics 为列表列）
+SNAPSHOT_COLUMNS = ['comment_id', 'parent_id', 'author', 'text', 'like_count', 'reply_count', 'published_at',
+                    'sentiment', 'sentiment_score', 'labels', 'topics']
+
+
+class SnapshotUnavailableError(Exception):
+    """未安装 pyarrow，无法读写 Parquet 快照"""
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError as e:
+        raise SnapshotUnavailableError('pyarrow is not installed') from e
+    return pyarrow
+
+
+def snapshots_available():
+    try:
+        _pyarrow()
+    except SnapshotUnavailableError:
+        return False
+    return Config.SNAPSHOTS_ENABLED
+
+
+def snapshot_path(video_id):
+    if not _VIDEO_ID_RE.match(video_id or ''):
+        raise ValueError(f'Invalid video id: {video_id!r}')
+    return os.path.join(Config.SNAPSHOT_DIR, f'{video_id}.parquet')
+
+
+def _schema(pa):
+    return pa.schema([
+        ('comment_id', pa.string()),
+        ('parent_id', pa.string()),
+        ('author', pa.string()),
+        ('text', pa.string()),
+        ('like_count', pa.int64()),
+        ('reply_count', pa.int64()),
+        ('published_at', pa.timestamp('us')),
+        ('sentiment', pa.string()),
+        ('sentiment_score', pa.float64()),
+        ('labels', pa.list_(pa.string())),
+        ('topics', pa.list_(pa.string())),
+    ])
+
+
+def write_video_snapshot(video, chunk_size=None):
+    """
+    把视频的全部评论写成一个 Parquet 文件（按块从数据库流式读取，内存不随评论数增长）
+    先写临时文件再原子替换，正在读取旧快照的请求不受影响；返回文件路径
+    """
+    pa = _pyarrow()
+    chunk_size = chunk_size or Config.INGEST_COMMIT_CHUNK
+    path = snapshot_path(video.video_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    schema = _schema(pa).with_metadata({
+        'video_id': video.video_id,
+        'generated_at': datetime.utcnow().isoformat()
+    })
+    rows = db.session.execute(
+        select(Comment.comment_id, Comment.parent_id, Comment.author, Comment.text, Comment.like_count,
+               Comment.reply_count, Comment.published_at, Comment.sentiment, Comment.sentiment_score,
+               Comment.labels_json, Comment.topics_json)
+        .where(Comment.video_id == video.id)
+        .order_by(Comment.id)
+        .execution_options(yield_per=chunk_size)
+    )
+
+    fd, tmp_path = tempfile.mkstemp(suffix='.parquet.tmp', dir=os.path.dirname(path))
+    os.close(fd)
+    total = 0
+    try:
+        with pa.parquet.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+            for partition in rows.partitions():
+                columns = {name: [] for name in SNAPSHOT_COLUMNS}
+                for row in partition:
+                    for name in SNAPSHOT_COLUMNS[:9]:
+                        columns[name].append(getattr(row, name))
+                    columns['labels'].append(_json_list(row.labels_json))
+                    columns['topics'].append(_json_list(row.topics_json))
+                writer.write_batch(pa.record_batch([columns[name] for name in SNAPSHOT_COLUMNS], schema=schema))
+                total += len(partition)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    logger.info('Wrote snapshot of %d comments for %s', total, video.video_id)
+    return path
+
+
+def open_snapshot(video_id):
+    """打开视频的快照，不存在时返回 None"""
+    path = snapshot_path(video_id)
+    if not os.path.exists(path):
+        return None
+    return VideoSnapshot(path)
+
+
+class VideoSnapshot:
+    """
+    内存映射方式读取的 Parquet 快照
+    聚合使用 pyarrow.compute 在列上计算，不访问数据库
+    """
+
+    def __init__(self, path):
+        pa = _pyarrow()
+        self.path = path
+        self._pa = pa
+        self.table = pa.parquet.read_table(path, memory_map=True)
+
+    @property
+    def num_rows(self):
+        return self.table.num_rows
+
+    @property
+    def generated_at(self):
+        metadata = self.table.schema.metadata or {}
+        return metadata.get(b'generated_at', b'').decode() or None
+
+    def summary(self):
+        """与 load_video_stats 返回相同结构的汇总"""
+        pc = self._pa.compute
+        table = self.table
+
+        sentiments = {'positive': 0, 'negative': 0, 'neutral': 0}
+        sentiments.update((k, v) for k, v in _value_counts(pc, table['sentiment']).items() if k in sentiments)
+        published = table['published_at']
+
+        return {
+            'total': table.num_rows,
+            'sentiments': sentiments,
+            'score_sum': pc.sum(table['sentiment_score']).as_py() or 0.0,
+            'high_reply': pc.sum(pc.greater_equal(table['reply_count'], Config.CONTROVERSY_REPLY_THRESHOLD)).as_py() or 0,
+            'year': _value_counts(pc, pc.strftime(published, format='%Y')),
+            'month': _value_counts(pc, pc.strftime(published, format='%Y-%m')),
+            'label': _value_counts(pc, pc.list_flatten(table['labels']))
+        }
+
+    def sample(self, limit=50):
+        """前 limit 条评论（与 Comment.to_dict 字段一致）"""
+        comments = self.table.slice(0, limit).to_pylist()
+        for comment in comments:
+            if comment['published_at']:
+                comment['published_at'] = comment['published_at'].isoformat()
+        return comments
+
+    def iter_batches(self, batch_size=None):
+        return self.table.to_batches(max_chunksize=batch_size or Config.INGEST_COMMIT_CHUNK)
+
+
+def _value_counts(pc, array):
+    counts = Counter()
+    for item in pc.value_counts(array).to_pylist():
+        if item['values'] is not None:
+            counts[item['values']] += item['counts']
+    return dict(counts)
+
+
+def _json_list(raw):
+    try:
+        return [str(item) for item in json.loads(raw)] if raw else []
+    except ValueError:
+        return []
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from app.models import TextAnalysis
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """去重用的规范化：NFKC、大小写折叠、合并空白"""
+    return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFKC', text or '')).strip().casefold()
+
+
+def text_hash(text):
+    return hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def topics_signature(known_topics):
+    return hashlib.blake2b(json.dumps(sorted(known_topics or [])).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class TextAnalysisCache:
+    """
+    按规范化文本去重的评论分析
+    - 同一次运行中相同文本只分析一次（进程内 LRU）
+    - 以前分析过的文本（任何视频）从 text_analysis 表读取，只在已知话题不同时重新匹配话题
+    - counters 记录本次运行的去重效果
+    - analyze() 顺序执行；流水线中按 prepare（查已有结果）→ 情感分析 → complete（标签/话题）→ save 分阶段调用，可在不同线程中进行
+    """
+
+    IN_CLAUSE_SIZE = 500
+
+    def __init__(self, sentiment_analyzer, ai_analyzer, max_entries=None):
+        self.sentiment_analyzer = sentiment_analyzer
+        self.ai_analyzer = ai_analyzer
+        self.max_entries = max_entries or Config.TEXT_ANALYSIS_CACHE_SIZE
+        self._entries = OrderedDict()  # text_hash -> (sentiment, score, labels, topics, signature)
+        self.counters = {'comments': 0, 'analyzed': 0, 'reused': 0}
+        self._lock = threading.Lock()
+
+    def analyze(self, records, known_topics):
+        """给 records 写入 text_hash 和分析结果；新文本的结果写入 text_analysis（在当前事务中）"""
+        pending = self.prepare(records)
+        scores = {h: self.sentiment_analyzer.analyze_sentiment(text) for h, text in pending.items()}
+        self.save(self.complete(records, scores, known_topics))
+        return records
+
+    def prepare(self, records):
+        """计算 text_hash 并加载以前的分析结果，返回需要做情感分析的新文本 {text_hash: text}"""
+        for record in records:
+            record.text_hash = text_hash(record.text)
+        with self._lock:
+            missing = [h for h in dict.fromkeys(r.text_hash for r in records) if h not in self._entries]
+        self._load(missing)
+        with self._lock:
+            return {r.text_hash: r.text for r in records if r.text_hash not in self._entries}
+
+    def complete(self, records, scores, known_topics):
+        """
+        用情感分析结果 scores {text_hash: {'sentiment', 'score'}} 补全标签和话题，结果写回 records
+        返回需要写入 text_analysis 的新行
+        """
+        known_topics = known_topics or []
+        signature = topics_signature(known_topics)
+
+        new_rows = []
+        for record in records:
+            with self._lock:
+                entry = self._entries.get(record.text_hash)
+            if entry is None:
+                # prepare 之后被 LRU 淘汰的文本没有预先计算的情感结果，在这里补算
+                sentiment_result = scores.get(record.text_hash) or \
+                    self.sentiment_analyzer.analyze_sentiment(record.text)
+                label_result = self.ai_analyzer.label_single_comment(record.text, known_topics)
+                entry = (sentiment_result['sentiment'], sentiment_result['score'],
+                         tuple(label_result['labels']), tuple(label_result['topics']), signature)
+                with self._lock:
+                    self._remember(record.text_hash, entry)
+                    self.counters['analyzed'] += 1
+                new_rows.append({
+                    'text_hash': record.text_hash,
+                    'sentiment': entry[0],
+                    'sentiment_score': entry[1],
+                    'labels_json': json.dumps(list(entry[2])),
+                    'topics_json': json.dumps(list(entry[3])),
+                    'topics_signature': signature
+                })
+            else:
+                if entry[4] != signature:
+                    # 话题依赖视频的已知话题：情感和标签复用，话题重新匹配（只是子串判断）
+                    topics = self.ai_analyzer.label_single_comment(record.text, known_topics)['topics']
+                    entry = entry[:3] + (tuple(topics), signature)
+                    with self._lock:
+                        self._remember(record.text_hash, entry)
+                with self._lock:
+                    self.counters['reused'] += 1
+
+            record.sentiment, record.sentiment_score, record.labels, record.topics = entry[:4]
+            with self._lock:
+                self.counters['comments'] += 1
+        return new_rows
+
+    def save(self, new_rows):
+        """把新文本的分析结果写入 text_analysis（在当前事务中，已存在的跳过）"""
+        if new_rows:
+            db.session.execute(self._insert_statement(), new_rows)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        comments = counters['comments']
+        return {
+            **counters,
+            'dedup_ratio': round(counters['reused'] / comments, 4) if comments else 0.0
+        }
+
+    def _load(self, hashes):
+        for start in range(0, len(hashes), self.IN_CLAUSE_SIZE):
+            rows = db.session.execute(
+                select(TextAnalysis.text_hash, TextAnalysis.sentiment, TextAnalysis.sentiment_score,
+                       TextAnalysis.labels_json, TextAnalysis.topics_json, TextAnalysis.topics_signature)
+                .where(TextAnalysis.text_hash.in_(hashes[start:start + self.IN_CLAUSE_SIZE]))
+            )
+            for row in rows:
+                entry = (row.sentiment, row.sentiment_score, tuple(_json_list(row.labels_json)),
+                         tuple(_json_list(row.topics_json)), row.topics_signature)
+                with self._lock:
+                    self._remember(row.text_hash, entry)
+
+    def _remember(self, key, entry):
+        # 调用方持有 self._lock
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _insert_statement():
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            return sqlite.insert(TextAnalysis).on_conflict_do_nothing(index_elements=['text_hash'])
+        if dialect == 'postgresql':
+            return postgresql.insert(TextAnalysis).on_conflict_do_nothing(index_elements=['text_hash'])
+        return insert(TextAnalysis)
+
+
+def _json_list(raw):
+    try:
+        return json.loads(raw) if raw else []
+    except ValueError:
+        return []
@@ -50,6 +50,43 @@ class TrendAnalyzer:
             'cumulative_counts': cumulative_counts
         }
     
+    @staticmethod
+    def build_time_trends(yearly_data, monthly_data=None):
+        """
+        由已统计好的计数生成趋势数据（报表直接使用 video_stat_buckets 中的计数）
+        yearly_data: {年份: 数量}，年份可以是整数或字符串；monthly_data: {'YYYY-MM': 数量}
+        """
+        yearly_data = {int(year): count for year, count in yearly_data.items()}
+        
+        # 排序
+        sorted_years = sorted(yearly_data.keys())
+        
+        # 年度统计（折线图数据）
+        yearly_counts = [
+            {'year': year, 'count': yearly_data[year]}
+            for year in sorted_years
+        ]
+        
+        # 累计统计（柱状图数据）
+        cumulative = 0
+        cumulative_counts = []
+        for year in sorted_years:
+            cumulative += yearly_data[year]
+            cumulative_counts.append({
+                'year': year,
+                'cumulative': cumulative,
+                'new': yearly_data[year]
+            })
+        
+        return {
+            'yearly_counts': yearly_counts,
+            'cumulative_counts': cumulative_counts,
+            'monthly_counts': [
+                {'month': month, 'count': count}
+                for month, count in sorted((monthly_data or {}).items())
+            ]
+        }
+    
     @staticmethod
     def calculate_controversy_rate(all_comments, controversy_threshold=100):
         """
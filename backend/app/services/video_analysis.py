@@ -0,0 +1,353 @@
+import logging
+import threading
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from app import db
+from app.models import Video, Comment, CommentTopic, Topic, ScrapeCheckpoint
+from config import Config
+from .youtube_scraper import YouTubeScraper
+from .sentiment_analyzer import SentimentAnalyzer
+from .ai_analyzer import AIAnalyzer
+from .rate_limiter import QuotaExceededError
+from .comment_ingestor import CommentIngestor
+from .video_stats import load_video_stats
+from .text_dedup import TextAnalysisCache
+from .snapshot import snapshots_available, write_video_snapshot
+from .analysis_pipeline import KnownTopics, build_analysis_pipeline
+from .video_lock import get_video_locks
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# 进程内所有分析任务共享的并发上限
+_analysis_slots = threading.BoundedSemaphore(Config.ANALYSIS_MAX_CONCURRENCY)
+
+
+class VideoNotFoundError(Exception):
+    """YouTube上不存在该视频（或无法获取视频信息）"""
+
+
+class VideoAnalysisService:
+    """
+    视频分析流程：
+    1. 爬取视频信息和评论
+    2. 情感分析
+    3. AI话题提取
+    4. 标签分类
+    5. 时间趋势
+    6. 争议度计算
+    """
+
+    def __init__(self):
+        self.scraper = YouTubeScraper()
+        self.sentiment_analyzer = SentimentAnalyzer()
+        self.ai_analyzer = AIAnalyzer()
+
+    def analyze(self, video_id, max_comments=1000, expand_replies=False, mode='full', video_info=None,
+                progress=None, should_stop=None):
+        """
+        分析单个视频（需要在应用上下文中调用）
+        mode: full 从第一页开始 / resume 从上次的断点继续 / delta 按时间倒序只爬水位线之后的新评论
+        video_info: 预先获取的视频信息，为None时自动获取
+        progress: 进度回调 progress(stage, **counts)，后台任务用它更新阶段和计数
+        should_stop: 返回停止原因（如 'cancelled' / 'deadline'）或 None，爬取期间定期检查；
+            停止时已写库的评论保留并提交（断点保留，可用 resume 继续），视频标记为部分分析，
+            结果中 partial 为 true、stopped 为停止原因
+        视频不存在时抛出 VideoNotFoundError；爬取中途配额用尽时同样保留已处理的评论并标记为部分分析，
+        然后抛出 QuotaExceededError
+        同一视频的分析（跨线程/进程）按视频锁串行执行，不会同时爬取和写入同一视频
+        """
+        # 先拿视频锁再占并发名额，等锁期间不占用名额
+        with get_video_locks().hold(video_id), _analysis_slots:
+            try:
+                return self._analyze(video_id, max_comments, expand_replies, mode, video_info,
+                                     progress or _no_progress, should_stop)
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _analyze(self, video_id, max_comments, expand_replies, mode, video_info, progress, should_stop):
+        # 1. 获取视频信息（批量分析时由调用方预先批量获取）
+        progress('fetching_video')
+        if video_info is None:
+            video_info = self.scraper.get_video_info(video_id)
+        if not video_info:
+            raise VideoNotFoundError(video_id)
+        
+        # 2. 保存/更新视频
+        video = Video.query.filter_by(video_id=video_id).first()
+        if not video:
+            video = Video(**video_info)
+            db.session.add(video)
+        else:
+            for key, value in video_info.items():
+                setattr(video, key, value)
+        db.session.commit()
+        
+        # 3. 逐页爬取评论（大规模），爬取/过滤/情感分析/标签/写库分阶段流水线执行，互相重叠
+        order = 'time' if mode == 'delta' else 'relevance'
+        checkpoint = ScrapeCheckpoint.query.filter_by(video_id=video_id, order=order).first()
+        if not checkpoint:
+            checkpoint = ScrapeCheckpoint(video_id=video_id, order=order)
+            db.session.add(checkpoint)
+        if mode != 'resume' or checkpoint.fetched_count is None:
+            checkpoint.page_token = None
+            checkpoint.fetched_count = 0
+        
+        watermark = None
+        if mode == 'delta' and video.newest_comment_id:
+            watermark = (video.newest_comment_id, video.newest_comment_published_at)
+        from_first_page = checkpoint.page_token is None
+        
+        # 停止（取消/超时/出错）时通知爬取线程，正在展开的回复不必拉完
+        crawl_stop = threading.Event()
+        pages = self.scraper.iter_comment_pages(
+            video_id, max_comments, include_replies=True, expand_replies=expand_replies,
+            order=order, page_token=checkpoint.page_token, watermark=watermark, stop_event=crawl_stop
+        )
+        
+        app = current_app._get_current_object()
+        ingestor = CommentIngestor(video.id)
+        text_cache = TextAnalysisCache(self.sentiment_analyzer, self.ai_analyzer)
+        known_topics = KnownTopics(self.ai_analyzer)
+        fetched_comments = 0
+        fetched_pages = 0
+        expected_comments = max_comments
+        if video.comment_count:
+            expected_comments = min(max_comments, video.comment_count)
+        progress('scraping', expected_comments=expected_comments)
+        finished = False
+        newest = None  # 本次爬到的最新主评论
+        stopped = None  # 提前停止的原因
+        
+        def _normalize(work):
+            # 5a. 一次 IN 查询过滤掉已入库的评论，只分析新评论；按规范化文本加载以前的分析结果
+            #     在流水线线程中执行，使用单独的（只读）数据库会话
+            with app.app_context():
+                work.records = ingestor.filter_new(work.page.items)
+                work.pending = text_cache.prepare(work.records)
+            return work
+        
+        def _label(work):
+            # 4. AI提取话题（使用第一页前100条评论样本）
+            # 5c. 标签和话题，与 5b 的情感结果一起写回 CommentRecord；相同文本只分析一次
+            work.new_rows = text_cache.complete(work.records, work.scores, known_topics.get(work.page.items))
+            return work
+        
+        def _persist(work):
+            nonlocal fetched_comments, fetched_pages, finished, newest
+            page = work.page
+            fetched_comments += len(page.items)
+            fetched_pages += 1
+            
+            for record in page.items:
+                if record.parent_id is None and record.published_at and (
+                        newest is None or record.published_at > newest.published_at):
+                    newest = record
+            
+            # 攒够一批后 executemany 批量插入
+            text_cache.save(work.new_rows)
+            ingestor.add(work.records)
+            
+            # 断点与本页评论在同一事务中提交，保证续爬时不会漏掉评论（流水线按页的顺序写库）
+            checkpoint.page_token = page.next_page_token
+            checkpoint.fetched_count += len(page.items)
+            finished = page.reached_watermark or not page.next_page_token
+            
+            # 分块提交：评论与断点一起落盘，之后失败只回滚最后一块，可用 resume 模式继续
+            if ingestor.uncommitted >= Config.INGEST_COMMIT_CHUNK:
+                ingestor.commit()
+            
+            progress('scraping', pages_fetched=fetched_pages, comments_fetched=fetched_comments,
+                     comments_scored=text_cache.counters['comments'], rows_persisted=ingestor.inserted)
+            return work
+        
+        def _stop_when():
+            nonlocal stopped
+            stopped = should_stop()
+            if stopped is not None:
+                crawl_stop.set()
+            return stopped is not None
+        
+        pipeline = build_analysis_pipeline(_normalize, _label, _persist)
+        quota_error = None
+        try:
+            # 任一阶段出错时先通知爬取线程再等各阶段退出，不必等正在展开的回复拉完
+            for _ in pipeline.run(pages, stop_when=_stop_when if should_stop else None, on_stop=crawl_stop.set):
+                pass
+        except QuotaExceededError as e:
+            # 配额在爬取中途用尽：与取消/超时一样提交已写库的评论（断点一致），视频记为部分分析，最后再抛出
+            quota_error = e
+            stopped = 'quota_exceeded'
+        if finished and quota_error is None:
+            # 最后一页已写库后才检查到的停止请求不算中断
+            stopped = None
+        if stopped:
+            logger.info('Analysis of %s stopped (%s) after %d pages', video_id, stopped, fetched_pages)
+        
+        ingestor.flush()
+        new_comments = ingestor.inserted
+        progress('aggregating', rows_persisted=new_comments)
+        logger.info('Analyzed %s: %s, pipeline %s', video_id, text_cache.stats(), pipeline.stats())
+        
+        # 已爬到最后一页（或什么都没爬到），不再需要断点
+        resumable = not finished and bool(checkpoint.fetched_count)
+        if not resumable:
+            db.session.flush()
+            db.session.delete(checkpoint)
+        
+        # 推进水位线：从第一页开始，完整爬完，或按时间倒序连续爬到了旧水位线（首次按时间爬取时没有旧水位线）
+        # newest 只来自本次爬到的页：从断点续爬时只看到了后面的页，不能据此推进；中途停止时也不推进
+        if newest and not stopped and from_first_page and (finished or (order == 'time' and watermark is None)):
+            if (video.newest_comment_published_at is None
+                    or newest.published_at.replace(tzinfo=None) >= video.newest_comment_published_at):
+                video.newest_comment_id = newest.comment_id
+                video.newest_comment_published_at = newest.published_at
+        
+        video.analysis_partial = stopped is not None
+        if not fetched_comments:
+            if stopped:
+                video.analysis_complete = False
+            db.session.commit()
+            if quota_error is not None:
+                raise quota_error
+            return {
+                'status': 'success',
+                'message': 'No new comments found' if mode == 'delta' else 'No comments found',
+                'video_id': video_id,
+                'partial': stopped is not None,
+                'stopped': stopped
+            }
+        
+        db.session.commit()
+        
+        # 6. 统计话题和生成Topic记录（聚合查询，不把全部评论加载到内存）
+        summary = _summarize_comments(video)
+        _generate_topic_statistics(video, summary)
+        
+        # 7. 计算整体氛围
+        _calculate_main_vibe(video, summary)
+        if stopped:
+            video.analysis_complete = False
+        
+        db.session.commit()
+        if quota_error is not None:
+            raise quota_error
+        
+        # 8. 写入列式快照（导出/报表可直接读取），失败不影响分析结果
+        if snapshots_available():
+            progress('writing_snapshot')
+            try:
+                write_video_snapshot(video)
+            except Exception:
+                logger.exception('Failed to write snapshot for %s', video_id)
+        
+        message = f'Analyzed {new_comments} new comments'
+        if stopped:
+            message += f' (stopped: {stopped}, partial results kept)'
+        return {
+            'status': 'success',
+            'message': message,
+            'video_id': video_id,
+            'total_comments': summary['total'],
+            'resumable': resumable,
+            'partial': stopped is not None,
+            'stopped': stopped,
+            'dedup': text_cache.stats(),
+            'pipeline': pipeline.stats()
+        }
+
+
+# ========== 辅助函数 ==========
+
+def _no_progress(stage, **counts):
+    pass
+
+def _summarize_comments(video):
+    """
+    汇总视频的全部评论：情感数量/分数来自增量维护的 video_stats，话题分布在 comment_topics 上 GROUP BY
+    返回 {'total', 'sentiments', 'score_sum', 'high_reply', 'topics', 'topic_sentiments'}
+    """
+    stats = load_video_stats(db.session, video.id)
+    
+    topic_counter = Counter()
+    topic_sentiments = {}
+    rows = db.session.execute(
+        select(CommentTopic.topic, Comment.sentiment, func.count())
+        .join(Comment, Comment.comment_id == CommentTopic.comment_id)
+        .where(CommentTopic.video_id == video.id)
+        .group_by(CommentTopic.topic, Comment.sentiment)
+    )
+    for topic, sentiment, count in rows:
+        topic_counter[topic] += count
+        
+        if topic not in topic_sentiments:
+            topic_sentiments[topic] = {'positive': 0, 'negative': 0, 'neutral': 0}
+        
+        topic_sentiments[topic][sentiment] = topic_sentiments[topic].get(sentiment, 0) + count
+    
+    return {
+        'total': stats['total'],
+        'sentiments': stats['sentiments'],
+        'score_sum': stats['score_sum'],
+        'high_reply': stats['high_reply'],
+        'topics': topic_counter,
+        'topic_sentiments': topic_sentiments
+    }
+
+def _generate_topic_statistics(video, summary):
+    """生成话题统计"""
+    # 删除旧的topic记录
+    Topic.query.filter_by(video_id=video.id).delete()
+    
+    total_comments = summary['total']
+    if not total_comments:
+        return
+    min_threshold = Config.MIN_TOPIC_THRESHOLD
+    
+    # 争议度：回复数超过阈值的评论占比（对所有评论计算）
+    controversy = summary['high_reply'] / total_comments * 100
+    
+    # 保存符合阈值的话题（35%以上）
+    for topic_name, count in summary['topics'].items():
+        percentage = count / total_comments * 100
+        
+        if percentage >= min_threshold * 100:  # 超过35%
+            sentiments = summary['topic_sentiments'][topic_name]
+            
+            topic = Topic(
+                video_id=video.id,
+                name=topic_name,
+                count=count,
+                percentage=percentage,
+                positive_count=sentiments['positive'],
+                negative_count=sentiments['negative'],
+                neutral_count=sentiments['neutral'],
+                controversy_rate=controversy
+            )
+            db.session.add(topic)
+
+def _calculate_main_vibe(video, summary):
+    """计算整体氛围"""
+    total = summary['total']
+    if not total:
+        return
+    
+    sentiment_counts = summary['sentiments']
+    
+    positive_ratio = sentiment_counts.get('positive', 0) / total
+    negative_ratio = sentiment_counts.get('negative', 0) / total
+    
+    if positive_ratio > 0.5:
+        video.main_vibe = 'positive'
+    elif negative_ratio > 0.5:
+        video.main_vibe = 'negative'
+    else:
+        video.main_vibe = 'neutral'
+    
+    # 计算氛围分数
+    avg_score = summary['score_sum'] / total
+    video.vibe_score = round(avg_score, 3)
+    video.analysis_complete = True
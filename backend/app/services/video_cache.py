@@ -0,0 +1,145 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class VideoInfoCache:
+    """
+    视频元数据缓存
+    - 进程内 LRU + TTL
+    - 可选 Redis 持久层（Config.VIDEO_INFO_CACHE_BACKEND = 'redis'），多个worker/重启后共享
+    - 命中/未命中计数通过 stats() 暴露
+    """
+
+    def __init__(self, max_entries=None, ttl=None, backend=None):
+        self.max_entries = max_entries or Config.VIDEO_INFO_CACHE_SIZE
+        self.ttl = ttl if ttl is not None else Config.VIDEO_INFO_CACHE_TTL
+        self._entries = OrderedDict()  # video_id -> (过期时间, info)
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'persistent_hits': 0, 'evictions': 0}
+
+        backend = backend or Config.VIDEO_INFO_CACHE_BACKEND
+        self._redis = None
+        if backend == 'redis':
+            import redis
+            self._redis = redis.Redis.from_url(Config.REDIS_URL)
+        elif backend != 'memory':
+            raise ValueError(f'Unknown video info cache backend: {backend}')
+
+    def get_many(self, video_ids):
+        """返回 {video_id: info}，只包含命中的视频"""
+        found = {}
+        missing = []
+        now = time.monotonic()
+
+        with self._lock:
+            for video_id in video_ids:
+                entry = self._entries.get(video_id)
+                if entry and entry[0] > now:
+                    self._entries.move_to_end(video_id)
+                    found[video_id] = entry[1]
+                else:
+                    if entry:
+                        del self._entries[video_id]
+                    missing.append(video_id)
+
+        if missing and self._redis is not None:
+            try:
+                values = self._redis.mget([self._key(v) for v in missing])
+            except Exception:
+                logger.exception('Video info cache: redis read failed')
+                values = [None] * len(missing)
+            restored = {}
+            for video_id, raw in zip(missing, values):
+                if raw:
+                    restored[video_id] = _loads(raw)
+            if restored:
+                self._store(restored)
+                found.update(restored)
+            with self._lock:
+                self._counters['persistent_hits'] += len(restored)
+
+        with self._lock:
+            self._counters['hits'] += len(found)
+            self._counters['misses'] += len(video_ids) - len(found)
+        return found
+
+    def set_many(self, infos):
+        """写入 {video_id: info}"""
+        if not infos:
+            return
+        self._store(infos)
+
+        if self._redis is not None:
+            try:
+                pipe = self._redis.pipeline()
+                for video_id, info in infos.items():
+                    pipe.setex(self._key(video_id), self.ttl, _dumps(info))
+                pipe.execute()
+            except Exception:
+                logger.exception('Video info cache: redis write failed')
+
+    def invalidate(self, video_id):
+        with self._lock:
+            self._entries.pop(video_id, None)
+        if self._redis is not None:
+            self._redis.delete(self._key(video_id))
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            return {
+                **self._counters,
+                'hit_rate': round(self._counters['hits'] / lookups * 100, 2) if lookups else 0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'backend': 'redis' if self._redis is not None else 'memory'
+            }
+
+    def _store(self, infos):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for video_id, info in infos.items():
+                self._entries[video_id] = (expires, info)
+                self._entries.move_to_end(video_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    @staticmethod
+    def _key(video_id):
+        return f'youtube:video_info:{video_id}'
+
+
+def _dumps(info):
+    published_at = info.get('published_at')
+    return json.dumps({**info, 'published_at': published_at.isoformat() if published_at else None})
+
+
+def _loads(raw):
+    info = json.loads(raw)
+    if info.get('published_at'):
+        info['published_at'] = datetime.fromisoformat(info['published_at'])
+    return info
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_video_info_cache():
+    """进程内共享的视频元数据缓存"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = VideoInfoCache()
+    return _cache
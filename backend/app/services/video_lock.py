@@ -0,0 +1,115 @@
+"""
+按视频加锁，保证同一视频同时只有一个分析在爬取和写库（跨线程、跨进程）
+- file 后端：instance/locks/<video_id>.lock 上的 flock，同一台机器上的所有 gunicorn worker 共享
+- redis 后端：redis-py 的 Lock（带过期时间，持有期间后台线程续期），多台机器共享
+不支持 fcntl 的平台（Windows）上 file 后端退化为进程内锁
+"""
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_VIDEO_ID_RE = re.compile(r'^[0-9A-Za-z_-]{1,50}$')
+
+
+class _FileLocks:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+            logger.warning('fcntl is not available, video locks only cover this process')
+        self._fcntl = fcntl
+        self._local = {}
+        self._local_lock = threading.Lock()
+
+    @contextmanager
+    def hold(self, video_id):
+        if self._fcntl is None:
+            with self._local_lock:
+                lock = self._local.setdefault(video_id, threading.Lock())
+            with lock:
+                yield
+            return
+
+        # 每次单独 open：flock 按打开的文件描述计，同一进程的不同线程之间也互斥
+        with open(os.path.join(self.directory, f'{video_id}.lock'), 'a') as f:
+            self._fcntl.flock(f.fileno(), self._fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                self._fcntl.flock(f.fileno(), self._fcntl.LOCK_UN)
+
+
+class _RedisLocks:
+    def __init__(self, client, ttl):
+        self._redis = client
+        self.ttl = ttl
+
+    @contextmanager
+    def hold(self, video_id):
+        # 续期在另一个线程中进行，token 不能存在线程本地变量里
+        lock = self._redis.lock(f'video-lock:{video_id}', timeout=self.ttl, thread_local=False)
+        lock.acquire()
+        stop = threading.Event()
+
+        def _renew():
+            # 持有者进程崩溃时锁在 ttl 后自动过期；正常持有期间每 ttl/3 续期一次
+            while not stop.wait(self.ttl / 3):
+                try:
+                    lock.reacquire()
+                except Exception:
+                    logger.exception('Failed to renew lock for video %s', video_id)
+
+        renewer = threading.Thread(target=_renew, name=f'video-lock-{video_id}', daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            renewer.join()
+            try:
+                lock.release()
+            except Exception:
+                logger.warning('Lock for video %s expired before release', video_id)
+
+
+class VideoLocks:
+    """按 video_id 的互斥锁；hold(video_id) 为阻塞的上下文管理器"""
+
+    def __init__(self, backend=None):
+        backend = backend or Config.VIDEO_LOCK_BACKEND
+        if backend == 'file':
+            self._locks = _FileLocks(Config.VIDEO_LOCK_DIR)
+        elif backend == 'redis':
+            import redis
+            self._locks = _RedisLocks(redis.Redis.from_url(Config.REDIS_URL), Config.VIDEO_LOCK_TTL)
+        else:
+            raise ValueError(f'Unknown video lock backend: {backend}')
+        self.backend = backend
+
+    def hold(self, video_id):
+        if not _VIDEO_ID_RE.match(video_id or ''):
+            raise ValueError(f'Invalid video id: {video_id!r}')
+        return self._locks.hold(video_id)
+
+
+_locks = None
+_locks_lock = threading.Lock()
+
+
+def get_video_locks():
+    """进程内共享的视频锁（后端由 Config.VIDEO_LOCK_BACKEND 决定）"""
+    global _locks
+    if _locks is None:
+        with _locks_lock:
+            if _locks is None:
+                _locks = VideoLocks()
+    return _locks
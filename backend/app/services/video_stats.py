@@ -0,0 +1,131 @@
+import logging
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models import VideoStats, VideoStatBucket
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_COLUMNS = {'positive': 'positive_count', 'negative': 'negative_count', 'neutral': 'neutral_count'}
+
+
+class VideoStatsDelta:
+    """
+    一批新增评论对 video_stats / video_stat_buckets 的增量
+    只累加真正插入的评论，apply() 用 SQL 自增（x = x + delta）写回，并发写入同一视频也不会丢失更新
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.sentiments = Counter()
+        self.score_sum = 0.0
+        self.high_reply = 0
+        self.buckets = Counter()  # (kind, key) -> count
+
+    def add(self, published_at, sentiment, sentiment_score, reply_count, labels):
+        self.total += 1
+        if sentiment in SENTIMENT_COLUMNS:
+            self.sentiments[sentiment] += 1
+        self.score_sum += sentiment_score or 0.0
+        if (reply_count or 0) >= Config.CONTROVERSY_REPLY_THRESHOLD:
+            self.high_reply += 1
+
+        published_at = _as_datetime(published_at)
+        if published_at:
+            self.buckets['year', published_at.strftime('%Y')] += 1
+            self.buckets['month', published_at.strftime('%Y-%m')] += 1
+        for label in labels:
+            self.buckets['label', label] += 1
+
+    def apply(self, executor, video_pk):
+        """写回增量；executor 可以是 Session 或 Connection"""
+        if not self.total:
+            return
+        dialect = _dialect_name(executor)
+
+        if dialect in ('sqlite', 'postgresql'):
+            module = sqlite if dialect == 'sqlite' else postgresql
+            executor.execute(
+                module.insert(VideoStats).on_conflict_do_nothing(index_elements=['video_id']),
+                {'video_id': video_pk}
+            )
+        elif executor.execute(select(VideoStats.id).where(VideoStats.video_id == video_pk)).first() is None:
+            executor.execute(insert(VideoStats), {'video_id': video_pk})
+
+        values = {
+            'total_comments': VideoStats.total_comments + self.total,
+            'score_sum': VideoStats.score_sum + self.score_sum,
+            'high_reply_count': VideoStats.high_reply_count + self.high_reply,
+            'updated_at': datetime.utcnow()
+        }
+        for sentiment, count in self.sentiments.items():
+            column = SENTIMENT_COLUMNS[sentiment]
+            values[column] = getattr(VideoStats, column) + count
+        executor.execute(update(VideoStats).where(VideoStats.video_id == video_pk).values(**values))
+
+        rows = [{'video_id': video_pk, 'kind': kind, 'key': key, 'count': count}
+                for (kind, key), count in self.buckets.items()]
+        if dialect in ('sqlite', 'postgresql'):
+            module = sqlite if dialect == 'sqlite' else postgresql
+            statement = module.insert(VideoStatBucket)
+            statement = statement.on_conflict_do_update(
+                index_elements=['video_id', 'kind', 'key'],
+                set_={'count': VideoStatBucket.count + statement.excluded.count}
+            )
+            executor.execute(statement, rows)
+        else:
+            for row in rows:
+                result = executor.execute(
+                    update(VideoStatBucket)
+                    .where(VideoStatBucket.video_id == video_pk, VideoStatBucket.kind == row['kind'],
+                           VideoStatBucket.key == row['key'])
+                    .values(count=VideoStatBucket.count + row['count'])
+                )
+                if not result.rowcount:
+                    executor.execute(insert(VideoStatBucket), row)
+
+
+def load_video_stats(session, video_pk):
+    """
+    读取视频的汇总统计
+    返回 {'total', 'sentiments', 'score_sum', 'high_reply', 'year', 'month', 'label'}，后三项为 {key: count}
+    """
+    stats = session.execute(select(VideoStats).where(VideoStats.video_id == video_pk)).scalar_one_or_none()
+    result = {
+        'total': stats.total_comments if stats else 0,
+        'sentiments': {s: getattr(stats, c) if stats else 0 for s, c in SENTIMENT_COLUMNS.items()},
+        'score_sum': stats.score_sum if stats else 0.0,
+        'high_reply': stats.high_reply_count if stats else 0,
+        'year': {},
+        'month': {},
+        'label': {}
+    }
+    rows = session.execute(
+        select(VideoStatBucket.kind, VideoStatBucket.key, VideoStatBucket.count)
+        .where(VideoStatBucket.video_id == video_pk)
+    )
+    for kind, key, count in rows:
+        if kind in result:
+            result[kind][key] = count
+    return result
+
+
+def _as_datetime(value):
+    # 迁移中用文本SQL读取时，SQLite 返回的是字符串
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _dialect_name(executor):
+    dialect = getattr(executor, 'dialect', None)
+    if dialect is None:
+        dialect = executor.get_bind().dialect
+    return dialect.name
@@ -0,0 +1,84 @@
+import json
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+
+import httplib2
+from googleapiclient.discovery import build_from_document, DISCOVERY_URI
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import set_user_agent
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Google建议在User-Agent中包含"gzip"以启用压缩响应
+USER_AGENT = 'comment-section-analyzer (gzip)'
+
+
+class YouTubeClientPool:
+    """
+    进程内共享的 YouTube API 客户端池
+    - discovery 文档只加载/解析一次（优先使用 google-api-python-client 自带的静态文档）
+    - 每个客户端独占一个 httplib2.Http（keep-alive 长连接，gzip），用完归还复用
+    - httplib2 不是线程安全的，同一时刻一个客户端只借给一个线程，因此可以安全地用于并发拉取
+    """
+
+    def __init__(self, max_idle=None):
+        self._max_idle = max_idle or Config.YOUTUBE_CLIENT_POOL_SIZE
+        self._idle = queue.LifoQueue()  # 后进先出：优先复用最近使用、连接仍然存活的客户端
+        self._discovery = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def client(self):
+        """借出一个客户端：with pool.client() as youtube: ..."""
+        try:
+            youtube = self._idle.get_nowait()
+        except queue.Empty:
+            youtube = self._build()
+
+        try:
+            yield youtube
+        finally:
+            if self._idle.qsize() < self._max_idle:
+                self._idle.put(youtube)
+
+    def _build(self):
+        http = set_user_agent(httplib2.Http(timeout=Config.YOUTUBE_API_TIMEOUT), USER_AGENT)
+        # YOUTUBE_API_BASE_URL 可指向本地替身服务器（tools/youtube_standin.py）
+        client_options = {'api_endpoint': Config.YOUTUBE_API_BASE_URL} if Config.YOUTUBE_API_BASE_URL else None
+        return build_from_document(
+            self._discovery_document(),
+            http=http,
+            developerKey=Config.YOUTUBE_API_KEY,
+            client_options=client_options
+        )
+
+    def _discovery_document(self):
+        if self._discovery is None:
+            with self._lock:
+                if self._discovery is None:
+                    doc = get_static_doc('youtube', 'v3')
+                    if doc is None:
+                        # 旧版本客户端库没有静态文档，从网络获取一次后缓存在进程内
+                        logger.info('No static discovery document, fetching it once')
+                        url = DISCOVERY_URI.format(api='youtube', apiVersion='v3')
+                        _, doc = httplib2.Http(timeout=Config.YOUTUBE_API_TIMEOUT).request(url)
+                    self._discovery = json.loads(doc)
+        return self._discovery
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool():
+    """进程内共享的客户端池"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = YouTubeClientPool()
+    return _pool
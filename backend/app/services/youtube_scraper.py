@@ -1,152 +1,319 @@
-from googleapiclient.discovery import build
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from datetime import datetime
 import isodate
 from config import Config
-from googleapiclient.discovery import build
-from datetime import datetime
-import isodate
-from config import Config
-import time
+from app.models.records import CommentRecord
+from .rate_limiter import get_rate_limiter, QuotaExceededError
+from .youtube_client import get_client_pool
+from .video_cache import get_video_info_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class CommentPage:
+    """
+    一页评论
+    items: CommentRecord 列表
+    page_token: 拉取本页使用的pageToken（第一页为None）
+    next_page_token: 下一页的pageToken（最后一页为None）
+    reached_watermark: 是否已遇到水位线（增量爬取到此为止）
+    页面不会被截断（最后一页可能使总数略超过 max_results），
+    因此 next_page_token 总是可以作为断点续爬的位置
+    """
+
+    def __init__(self, items, page_token=None, next_page_token=None):
+        self.items = items
+        self.page_token = page_token
+        self.next_page_token = next_page_token
+        self.reached_watermark = False
+
+
 class YouTubeScraper:
+    PAGE_LOOKAHEAD = 2  # 展开回复时最多提前拉取的页数
+    VIDEOS_PER_REQUEST = 50  # videos.list 每次最多查询的视频数
+
     def __init__(self):
-        self.youtube = build('youtube', 'v3', developerKey=Config.YOUTUBE_API_KEY)
+        self.clients = get_client_pool()
+        self.rate_limiter = get_rate_limiter()
+        self.video_cache = get_video_info_cache()
 
     def get_video_info(self, video_id):
         """获取视频基本信息"""
-        try:
-            request = self.youtube.videos().list(
-                part='snippet,contentDetails,statistics',
-                id=video_id
-            )
-            response = request.execute()
-
-            items = response.get('items', [])
-            if not items:
-                return None
-
-            video = items[0]
-            snippet = video.get('snippet', {})
-            stats = video.get('statistics', {})
-            content_details = video.get('contentDetails', {})
-            duration = content_details.get('duration')
-
-            # safe published_at
-            published_at = None
-            if 'publishedAt' in snippet and snippet['publishedAt']:
-                try:
-                    published_at = datetime.fromisoformat(snippet['publishedAt'].replace('Z', '+00:00'))
-                except Exception:
-                    logger.exception('Failed to parse publishedAt')
-
-            def _int_safe(value):
-                try:
-                    return int(value)
-                except Exception:
-                    return 0
-
-            duration_str = None
-            if duration:
-                try:
-                    duration_str = str(isodate.parse_duration(duration))
-                except Exception:
-                    logger.exception('Failed to parse duration')
-
-            return {
-                'video_id': video_id,
-                'title': snippet.get('title', ''),
-                'description': snippet.get('description', ''),
-                'duration': duration_str,
-                'published_at': published_at,
-                'comment_count': _int_safe(stats.get('commentCount', 0)),
-                'view_count': _int_safe(stats.get('viewCount', 0)),
-                'like_count': _int_safe(stats.get('likeCount', 0))
-            }
-        except Exception:
-            logger.exception("Error fetching video info")
-            return None
+        return self.get_videos_info([video_id]).get(video_id)
 
-    def get_comments_batch(self, video_id, max_results=10000, include_replies=True):
+    def get_videos_info(self, video_ids):
+        """
+        批量获取视频基本信息，返回 {video_id: info}（不存在的视频不在结果中）
+        先查缓存，未命中的按每批50个（videos.list 上限）合并请求
+        """
+        video_ids = list(dict.fromkeys(video_ids))
+        found = self.video_cache.get_many(video_ids)
+        missing = [v for v in video_ids if v not in found]
+
+        for start in range(0, len(missing), self.VIDEOS_PER_REQUEST):
+            chunk = missing[start:start + self.VIDEOS_PER_REQUEST]
+            try:
+                with self.clients.client() as youtube:
+                    request = youtube.videos().list(
+                        part='snippet,contentDetails,statistics',
+                        id=','.join(chunk)
+                    )
+                    response = self.rate_limiter.execute(request, 'videos.list')
+            except QuotaExceededError:
+                raise
+            except Exception:
+                logger.exception("Error fetching video info")
+                continue
+
+            fetched = {}
+            for item in response.get('items', []):
+                info = self._parse_video(item)
+                fetched[info['video_id']] = info
+            self.video_cache.set_many(fetched)
+            found.update(fetched)
+
+        return found
+
+    @staticmethod
+    def _parse_video(video):
+        """将 videos.list 返回的条目转换为视频信息字典"""
+        snippet = video.get('snippet', {})
+        stats = video.get('statistics', {})
+        content_details = video.get('contentDetails', {})
+        duration = content_details.get('duration')
+
+        # safe published_at
+        published_at = None
+        if 'publishedAt' in snippet and snippet['publishedAt']:
+            try:
+                published_at = datetime.fromisoformat(snippet['publishedAt'].replace('Z', '+00:00'))
+            except Exception:
+                logger.exception('Failed to parse publishedAt')
+
+        def _int_safe(value):
+            try:
+                return int(value)
+            except Exception:
+                return 0
+
+        duration_str = None
+        if duration:
+            try:
+                duration_str = str(isodate.parse_duration(duration))
+            except Exception:
+                logger.exception('Failed to parse duration')
+
+        return {
+            'video_id': video.get('id'),
+            'title': snippet.get('title', ''),
+            'description': snippet.get('description', ''),
+            'duration': duration_str,
+            'published_at': published_at,
+            'comment_count': _int_safe(stats.get('commentCount', 0)),
+            'view_count': _int_safe(stats.get('viewCount', 0)),
+            'like_count': _int_safe(stats.get('likeCount', 0))
+        }
+
+    def get_comments_batch(self, video_id, max_results=10000, include_replies=True, expand_replies=False):
         """
         批量获取评论 - 支持大规模爬取
         max_results: 最多获取多少条评论（支持10k+）
         include_replies: 是否包含回复
+        expand_replies: 是否拉取完整回复列表（commentThreads只内联少量回复，
+                        开启后对回复较多的评论并发调用 comments().list 补全）
         """
         comments = []
-        page_token = None
+        for page in self.iter_comment_pages(video_id, max_results, include_replies, expand_replies):
+            comments.extend(page.items)
+
+        logger.info("Successfully fetched %d comments", len(comments))
+        return comments
+
+    def iter_comment_pages(self, video_id, max_results=10000, include_replies=True, expand_replies=False,
+                           order='relevance', page_token=None, watermark=None, stop_event=None):
+        """
+        逐页产出评论（CommentPage），调用方可以边爬取边处理，内存占用与 max_results 无关
+        参数含义同 get_comments_batch；出错时停止迭代，已产出的页面不受影响；
+        配额用尽时抛出 QuotaExceededError（调用方据此把爬取记为不完整，而不是当作已爬到最后一页）
+        order: 排序方式（relevance / time）
+        page_token: 从指定pageToken开始（断点续爬）
+        watermark: (comment_id, published_at)，配合 order='time' 使用，
+                   遇到该评论或更早发布的主评论时停止（增量爬取）
+        stop_event: 被设置后不再翻页（包括正在拉取的完整回复），不再产出页面；
+                    调用方提前放弃时，不必等展开中的回复拉完
+        完整回复的拉取条数受剩余的 max_results 预算限制
+        """
+        expand = include_replies and expand_replies
+        executor = ThreadPoolExecutor(max_workers=Config.REPLY_FETCH_WORKERS) if expand else None
+        stop = stop_event or threading.Event()
+        seen_ids = set()
+        budget = 0  # 已产出 + 已排队的评论数（含预计的完整回复数）
+        ahead = deque()  # 已拉取、等待完整回复的页面 [(page, [(thread_id, future)])]
+        lookahead = self.PAGE_LOOKAHEAD if expand else 1
+        has_more = True
 
         try:
-            while len(comments) < max_results:
-                # 每次请求100条（YouTube API最大值）
-                request = self.youtube.commentThreads().list(
-                    part='snippet,replies',
-                    videoId=video_id,
-                    maxResults=min(100, max_results - len(comments)),
-                    pageToken=page_token,
-                    textFormat='plainText',
-                    order='relevance'
-                )
-
-                response = request.execute()
-
-                for item in response.get('items', []):
-                    snippet = item.get('snippet', {})
-                    top = snippet.get('topLevelComment', {})
-                    top_comment = top.get('snippet', {})
-
-                    # 主评论
+            while has_more or ahead:
+                # 提前拉取后续页面，让完整回复的拉取与分页并行
+                while has_more and budget < max_results and len(ahead) < lookahead and not stop.is_set():
                     try:
-                        published_at = None
-                        if top_comment.get('publishedAt'):
-                            published_at = datetime.fromisoformat(top_comment['publishedAt'].replace('Z', '+00:00'))
+                        with self.clients.client() as youtube:
+                            request = youtube.commentThreads().list(
+                                part='snippet,replies',
+                                videoId=video_id,
+                                maxResults=min(100, max_results - budget),
+                                pageToken=page_token,
+                                textFormat='plainText',
+                                order=order
+                            )
+                            response = self.rate_limiter.execute(request, 'commentThreads.list')
+                    except QuotaExceededError:
+                        raise
                     except Exception:
-                        published_at = None
-
-                    comments.append({
-                        'comment_id': item.get('id'),
-                        'parent_id': None,
-                        'author': top_comment.get('authorDisplayName'),
-                        'text': top_comment.get('textDisplay', ''),
-                        'like_count': int(top_comment.get('likeCount', 0)) if top_comment.get('likeCount') is not None else 0,
-                        'reply_count': int(snippet.get('totalReplyCount', 0)),
-                        'published_at': published_at
-                    })
-
-                    # 回复评论
-                    if include_replies and 'replies' in item:
-                        for reply in item.get('replies', {}).get('comments', []):
-                            reply_snippet = reply.get('snippet', {})
-                            try:
-                                reply_published = None
-                                if reply_snippet.get('publishedAt'):
-                                    reply_published = datetime.fromisoformat(reply_snippet['publishedAt'].replace('Z', '+00:00'))
-                            except Exception:
-                                reply_published = None
-
-                            comments.append({
-                                'comment_id': reply.get('id'),
-                                'parent_id': item.get('id'),
-                                'author': reply_snippet.get('authorDisplayName'),
-                                'text': reply_snippet.get('textDisplay', ''),
-                                'like_count': int(reply_snippet.get('likeCount', 0)) if reply_snippet.get('likeCount') is not None else 0,
-                                'reply_count': 0,
-                                'published_at': reply_published
-                            })
-
-                # 检查是否还有下一页
-                if 'nextPageToken' in response and len(comments) < max_results:
-                    page_token = response['nextPageToken']
-                    time.sleep(0.5)  # 避免API限流
-                else:
+                        logger.exception("Error fetching comments")
+                        has_more = False
+                        break
+
+                    page = CommentPage([], page_token, response.get('nextPageToken'))
+                    incomplete = []  # 内联回复不完整的主评论 [(thread_id, totalReplyCount, 内联回复数)]
+
+                    for item in response.get('items', []):
+                        snippet = item.get('snippet', {})
+                        top_comment = snippet.get('topLevelComment', {}).get('snippet', {})
+                        total_replies = int(snippet.get('totalReplyCount', 0))
+
+                        # 主评论
+                        parsed = self._parse_comment(item.get('id'), None, top_comment, total_replies)
+                        if watermark and self._reached_watermark(parsed, watermark):
+                            page.reached_watermark = True
+                            break
+                        page.items.append(parsed)
+                        seen_ids.add(item.get('id'))
+
+                        if not include_replies:
+                            continue
+
+                        # 回复评论（commentThreads内联返回的部分）
+                        inline = item.get('replies', {}).get('comments', [])
+                        for reply in inline:
+                            if reply.get('id') in seen_ids:
+                                continue
+                            page.items.append(self._parse_comment(reply.get('id'), item.get('id'), reply.get('snippet', {})))
+                            seen_ids.add(reply.get('id'))
+
+                        if expand and total_replies > len(inline):
+                            incomplete.append((item.get('id'), total_replies, len(inline)))
+
+                    # 整页（主评论和全部内联回复）解析完后，再按剩余预算由后台线程拉取完整回复列表
+                    # （回复极多的评论不会越过 max_results 一直翻页；预算用完后不再展开）
+                    budget += len(page.items)
+                    pending = []
+                    for thread_id, total_replies, inline_count in incomplete:
+                        remaining = max_results - budget
+                        if remaining <= 0:
+                            break
+                        limit = min(total_replies, inline_count + remaining)
+                        pending.append((thread_id, executor.submit(self._fetch_replies, thread_id, limit, stop)))
+                        budget += limit - inline_count
+
+                    ahead.append((page, pending))
+
+                    # 检查是否还有下一页
+                    page_token = page.next_page_token
+                    has_more = bool(page_token) and not page.reached_watermark
+
+                if not ahead:
                     break
 
-            logger.info("Successfully fetched %d comments", len(comments))
-            return comments
+                page, pending = ahead.popleft()
+                for thread_id, future in pending:
+                    for reply in future.result():
+                        if reply.comment_id in seen_ids:
+                            continue
+                        page.items.append(reply)
+                        seen_ids.add(reply.comment_id)
+                if stop.is_set():
+                    # 回复可能没拉全，不产出这一页（断点仍停在上一页）
+                    return
+
+                if page.items or page.reached_watermark:
+                    yield page
+        finally:
+            if executor:
+                if stop_event is None:
+                    # 调用方提前关闭生成器：正在拉取的回复在当前页之后停止
+                    stop.set()
+                for _, pending in ahead:
+                    for _, future in pending:
+                        future.cancel()
+                executor.shutdown(wait=True)
+
+    def _fetch_replies(self, parent_id, limit=None, stop_event=None):
+        """
+        通过 comments().list 拉取某条主评论的回复（在工作线程中运行；配额用尽时抛出 QuotaExceededError）
+        limit: 最多拉取的条数；stop_event 被设置后不再翻页，返回已拉到的部分
+        """
+        replies = []
+        page_token = None
 
+        try:
+            while limit is None or len(replies) < limit:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                with self.clients.client() as youtube:
+                    request = youtube.comments().list(
+                        part='snippet',
+                        parentId=parent_id,
+                        maxResults=100 if limit is None else min(100, limit - len(replies)),
+                        pageToken=page_token,
+                        textFormat='plainText'
+                    )
+                    response = self.rate_limiter.execute(request, 'comments.list')
+
+                for reply in response.get('items', []):
+                    replies.append(self._parse_comment(reply.get('id'), parent_id, reply.get('snippet', {})))
+
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+        except QuotaExceededError:
+            raise
         except Exception:
-            logger.exception("Error fetching comments")
-            return comments  # 返回已获取的评论
\ No newline at end of file
+            logger.exception("Error fetching replies for %s", parent_id)
+
+        return replies
+
+    @staticmethod
+    def _reached_watermark(comment, watermark):
+        """主评论是否已到达水位线（水位线评论本身，或发布时间更早）"""
+        watermark_id, watermark_published = watermark
+        if comment.comment_id == watermark_id:
+            return True
+        published_at = comment.published_at
+        if published_at is None or watermark_published is None:
+            return False
+        # 数据库中读出的时间不带时区，统一按UTC比较
+        return published_at.replace(tzinfo=None) < watermark_published.replace(tzinfo=None)
+
+    @staticmethod
+    def _parse_comment(comment_id, parent_id, snippet, reply_count=0):
+        """将API返回的评论snippet转换为 CommentRecord"""
+        try:
+            published_at = None
+            if snippet.get('publishedAt'):
+                published_at = datetime.fromisoformat(snippet['publishedAt'].replace('Z', '+00:00'))
+        except Exception:
+            published_at = None
+
+        return CommentRecord(
+            comment_id=comment_id,
+            parent_id=parent_id,
+            author=snippet.get('authorDisplayName'),
+            text=snippet.get('textDisplay', ''),
+            like_count=int(snippet.get('likeCount', 0)) if snippet.get('likeCount') is not None else 0,
+            reply_count=reply_count,
+            published_at=published_at
+        )
@@ -0,0 +1,266 @@
+"""
+分阶段流水线：source -> stage1 -> stage2 -> ... -> 调用方
+- 阶段之间是有界队列，下游处理不过来时上游阻塞（背压），在途元素数有上限
+- 每个阶段单独配置并行度：线程池，或传入进程池（CPU密集的阶段绕开GIL，此时 fn 和元素需要可 pickle）
+- 并行阶段的输出仍按输入顺序传给下游
+- 每个阶段统计处理条数/单位数、忙碌时间、等待上游和被下游阻塞的时间
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+_DONE = object()
+_POLL = 0.05  # 秒，阻塞操作检查停止信号的间隔
+
+
+class _Failure:
+    __slots__ = ('error',)
+
+    def __init__(self, error):
+        self.error = error
+
+
+class Stage:
+    """
+    name: 阶段名（统计用）
+    fn: 处理一个元素，返回传给下游的元素
+    workers: 并行度；>1 时使用线程池，或使用传入的 executor（如进程池，由调用方管理生命周期）
+    inline: 在调用方线程中执行（只能是最后一个阶段，如需要调用方数据库会话的写库阶段）
+    size: 计算元素包含的单位数（如一页的评论数），为空时每个元素算1
+    """
+
+    def __init__(self, name, fn, workers=1, executor=None, inline=False, size=None):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.executor = executor
+        self.inline = inline
+        self.size = size
+
+
+class StageStats:
+    def __init__(self, workers):
+        self.workers = workers
+        self.items = 0
+        self.units = 0
+        self.busy = 0.0  # 所有worker处理元素的总耗时
+        self.waiting = 0.0  # 等待上游的时间
+        self.blocked = 0.0  # 下游队列满、被阻塞的时间（背压）
+        self._lock = threading.Lock()
+
+    def record(self, units, busy):
+        with self._lock:
+            self.items += 1
+            self.units += units
+            self.busy += busy
+
+    def as_dict(self, elapsed):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'items': self.items,
+                'units': self.units,
+                'busy_seconds': round(self.busy, 3),
+                'waiting_seconds': round(self.waiting, 3),
+                'blocked_seconds': round(self.blocked, 3),
+                'units_per_second': round(self.units / elapsed, 1) if elapsed > 0 else 0.0,
+                'utilization': round(self.busy / (elapsed * self.workers), 3) if elapsed > 0 else 0.0
+            }
+
+
+def _call_timed(fn, item):
+    # 进程池中执行时耗时也在子进程里测量
+    start = time.perf_counter()
+    result = fn(item)
+    return result, time.perf_counter() - start
+
+
+class Pipeline:
+    """
+    用法：
+        pipeline = Pipeline([Stage('parse', parse), Stage('score', score, workers=4), Stage('save', save, inline=True)])
+        for result in pipeline.run(source):
+            ...
+    任一阶段抛出的异常在调用方重新抛出；调用方提前退出时各阶段停止，source 被关闭
+    stop_when: 返回 True 时提前结束（每个元素之前和等待期间每隔 _POLL 秒检查一次），在途元素被丢弃
+    on_stop: 结束时（包括出错）在等待各阶段线程退出之前调用，用来唤醒阻塞在 source 内部的调用
+    """
+
+    def __init__(self, stages, queue_size=4, source_name='source', source_size=None):
+        for stage in stages[:-1]:
+            if stage.inline:
+                raise ValueError('Only the last stage can run inline')
+        self.stages = stages
+        self.queue_size = queue_size
+        self.source_name = source_name
+        self.source_size = source_size
+        self._stats = {source_name: StageStats(1)}
+        self._stats.update((stage.name, StageStats(stage.workers)) for stage in stages)
+        self._started = None
+        self._finished = None
+
+    def stats(self):
+        """各阶段的计数（运行中也可调用）"""
+        if self._started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._finished or time.perf_counter()) - self._started
+        return {name: stats.as_dict(elapsed) for name, stats in self._stats.items()}
+
+    def run(self, source, stop_when=None, on_stop=None):
+        self._started = time.perf_counter()
+        stop = threading.Event()
+        threaded = [stage for stage in self.stages if not stage.inline]
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(threaded) + 1)]
+
+        threads = [threading.Thread(target=self._drive_source, args=(source, queues[0], stop),
+                                    name=f'pipeline-{self.source_name}', daemon=True)]
+        for i, stage in enumerate(threaded):
+            threads.append(threading.Thread(target=self._drive_stage, args=(stage, queues[i], queues[i + 1], stop),
+                                            name=f'pipeline-{stage.name}', daemon=True))
+        for thread in threads:
+            thread.start()
+
+        inline = self.stages[-1] if self.stages and self.stages[-1].inline else None
+        try:
+            while True:
+                item = self._next_output(queues[-1], stop_when)
+                if item is None or item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                if inline is not None:
+                    result, busy = _call_timed(inline.fn, item)
+                    self._stats[inline.name].record(self._units(inline, item), busy)
+                    item = result
+                yield item
+        finally:
+            stop.set()
+            if on_stop is not None:
+                on_stop()
+            for thread in threads:
+                thread.join()
+            self._finished = time.perf_counter()
+
+    @staticmethod
+    def _next_output(outbox, stop_when):
+        """从最后一个队列取结果；stop_when 返回 True 时返回 None"""
+        if stop_when is None:
+            return outbox.get()
+        while not stop_when():
+            try:
+                return outbox.get(timeout=_POLL)
+            except queue.Empty:
+                continue
+        return None
+
+    def _drive_source(self, source, outbox, stop):
+        stats = self._stats[self.source_name]
+        iterator = iter(source)
+        try:
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stats.record(self.source_size(item) if self.source_size else 1, time.perf_counter() - start)
+                if not self._put(outbox, item, stop, stats):
+                    return
+        except BaseException as e:
+            self._put(outbox, _Failure(e), stop, stats)
+            return
+        finally:
+            # 调用方提前退出时关闭生成器，释放其持有的资源
+            if hasattr(source, 'close'):
+                source.close()
+        self._put(outbox, _DONE, stop, stats)
+
+    def _drive_stage(self, stage, inbox, outbox, stop):
+        stats = self._stats[stage.name]
+        executor = stage.executor
+        own_executor = None
+        if executor is None and stage.workers > 1:
+            executor = own_executor = ThreadPoolExecutor(stage.workers, thread_name_prefix=f'pipeline-{stage.name}')
+        in_flight = deque()  # (item, future)，按输入顺序
+        try:
+            while True:
+                item = self._get(inbox, stop, stats, idle=executor is not None and bool(in_flight))
+                if item is None:
+                    if stop.is_set():
+                        return
+                    # 等待上游时先把已完成的结果按顺序交给下游
+                    if not self._emit(stage, in_flight, outbox, stop, stats, block=False):
+                        return
+                    continue
+                if item is _DONE or isinstance(item, _Failure):
+                    if not self._emit(stage, in_flight, outbox, stop, stats, block=True, drain=True):
+                        return
+                    self._put(outbox, item, stop, stats)
+                    return
+
+                if executor is None:
+                    result, busy = _call_timed(stage.fn, item)
+                    stats.record(self._units(stage, item), busy)
+                    if not self._put(outbox, result, stop, stats):
+                        return
+                    continue
+
+                in_flight.append((item, executor.submit(_call_timed, stage.fn, item)))
+                if not self._emit(stage, in_flight, outbox, stop, stats, block=len(in_flight) >= stage.workers):
+                    return
+        except BaseException as e:
+            self._put(outbox, _Failure(e), stop, stats)
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+            if own_executor is not None:
+                own_executor.shutdown(wait=True)
+
+    def _emit(self, stage, in_flight, outbox, stop, stats, block, drain=False):
+        """按顺序输出已完成的元素；block 时至少等第一个完成，drain 时等全部完成。下游已停止时返回 False"""
+        while in_flight and (block or drain or in_flight[0][1].done()):
+            item, future = in_flight.popleft()
+            result, busy = future.result()
+            stats.record(self._units(stage, item), busy)
+            if not self._put(outbox, result, stop, stats):
+                return False
+            block = False
+        return True
+
+    @staticmethod
+    def _units(stage, item):
+        if stage.size is not None:
+            return stage.size(item)
+        return 1
+
+    @staticmethod
+    def _get(inbox, stop, stats, idle=False):
+        """取下一个元素；idle 时只等一个检查间隔（有在途结果需要输出），停止或超时返回 None"""
+        start = time.perf_counter()
+        try:
+            while not stop.is_set():
+                try:
+                    return inbox.get(timeout=_POLL)
+                except queue.Empty:
+                    if idle:
+                        return None
+            return None
+        finally:
+            stats.waiting += time.perf_counter() - start
+
+    @staticmethod
+    def _put(outbox, item, stop, stats):
+        start = time.perf_counter()
+        try:
+            while not stop.is_set():
+                try:
+                    outbox.put(item, timeout=_POLL)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            stats.blocked += time.perf_counter() - start
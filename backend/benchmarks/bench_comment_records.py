@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+评论记录内存基准：旧流水线的 dict 表示 vs CommentRecord（__slots__）
+
+    python benchmarks/bench_comment_records.py [--comments 10000]
+
+评论内容来自 tools/youtube_standin.py 的合成数据；情感/标签结果使用固定值，
+只比较表示方式本身的内存（tracemalloc 统计的峰值，不含原始API响应）。
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+from app.services.youtube_scraper import YouTubeScraper  # noqa: E402
+from youtube_standin import SyntheticSource  # noqa: E402
+
+
+def raw_comments(n):
+    """生成 n 条 (comment_id, parent_id, snippet, reply_count) 原始数据"""
+    source = SyntheticSource(threads=n, replies=0, deep_every=0, deep_replies=0)
+    items, _ = source.threads_page('benchmark01', 0, n, include_replies=False)
+    return [(item['id'], None, item['snippet']['topLevelComment']['snippet'], 0) for item in items]
+
+
+def legacy_pipeline(raw):
+    """旧实现：每条评论一个7键字典，情感和标签结果各自再分配字典"""
+    from datetime import datetime
+    comments = []
+    for comment_id, parent_id, snippet, reply_count in raw:
+        comments.append({
+            'comment_id': comment_id,
+            'parent_id': parent_id,
+            'author': snippet.get('authorDisplayName'),
+            'text': snippet.get('textDisplay', ''),
+            'like_count': int(snippet.get('likeCount', 0)),
+            'reply_count': reply_count,
+            'published_at': datetime.fromisoformat(snippet['publishedAt'].replace('Z', '+00:00')),
+        })
+    results = []
+    for _ in comments:
+        results.append(({'sentiment': 'positive', 'score': 0.5}, {'labels': ['#people'], 'topics': []}))
+    return comments, results
+
+
+def record_pipeline(raw):
+    """新实现：CommentRecord，分析结果写回同一对象"""
+    records = [YouTubeScraper._parse_comment(*r) for r in raw]
+    for record in records:
+        record.sentiment = 'positive'
+        record.sentiment_score = 0.5
+        record.labels = ('#people',)
+        record.topics = ()
+    return records
+
+
+def measure(fn, raw):
+    tracemalloc.start()
+    result = fn(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--comments', type=int, default=10000)
+    args = parser.parse_args()
+
+    raw = raw_comments(args.comments)
+    legacy = measure(legacy_pipeline, raw)
+    records = measure(record_pipeline, raw)
+
+    per = 10000 / args.comments
+    print(f'{args.comments} comments')
+    print(f'  dict pipeline:          {legacy * per / 1024 / 1024:8.2f} MiB per 10k  ({legacy / args.comments:7.0f} B/comment)')
+    print(f'  CommentRecord pipeline: {records * per / 1024 / 1024:8.2f} MiB per 10k  ({records / args.comments:7.0f} B/comment)')
+    print(f'  reduction:              {(1 - records / legacy) * 100:8.1f} %')
+
+
+if __name__ == '__main__':
+    main()
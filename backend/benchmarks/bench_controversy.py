@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+争议度接口延迟基准：按视频加载全部评论后在Python中过滤/排序 vs 数据库中过滤/计数/排序/截取
+
+    python benchmarks/bench_controversy.py [--sizes 1000 10000 100000] [--repeat 5]
+
+每种规模各建一个视频（同一个临时 SQLite 数据库），约1%的评论回复数超过阈值。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def legacy_controversy(session, video_pk, threshold):
+    from app.models import Comment
+
+    comments = session.query(Comment).filter_by(video_id=video_pk).all()
+    high_reply_comments = [c for c in comments if c.reply_count >= threshold]
+    top = sorted(high_reply_comments, key=lambda x: x.reply_count, reverse=True)[:20]
+    return len(comments), len(high_reply_comments), [c.text[:200] for c in top]
+
+
+def populate(db, video_pk, n):
+    from sqlalchemy import insert
+    from app.models import Comment
+
+    rows = [{
+        'video_id': video_pk, 'comment_id': f'v{video_pk}c{i}', 'author': f'@user{i % 997}',
+        'text': f'comment text number {i}', 'like_count': i % 50,
+        'reply_count': 100 + i % 500 if i % 100 == 0 else i % 20,
+        'published_at': datetime(2024, 1, 1) - timedelta(minutes=i),
+        'sentiment': ('positive', 'negative', 'neutral')[i % 3], 'sentiment_score': 0.1,
+        'labels_json': '[]', 'topics_json': '[]'
+    } for i in range(n)]
+    for start in range(0, n, 5000):
+        db.session.execute(insert(Comment), rows[start:start + 5000])
+    db.session.commit()
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+
+    from app import create_app, db, read_session
+    from app.models import Video
+    from config import Config
+
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        for n in args.sizes:
+            video = Video(video_id=f'bench{n}')
+            db.session.add(video)
+            db.session.commit()
+            populate(db, video.id, n)
+
+            legacy = best_of(lambda: legacy_controversy(read_session, video.id, Config.CONTROVERSY_REPLY_THRESHOLD),
+                             args.repeat)
+            read_session.remove()
+            pushdown = best_of(lambda: client.get(f'/api/video/bench{n}/controversy'), args.repeat)
+            print(f'{n:8d} comments   python filter: {legacy * 1000:8.1f}ms   sql pushdown (endpoint): {pushdown * 1000:6.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+评论入库基准：逐条 filter_by().first() + session.add() vs CommentIngestor 批量入库
+
+    python benchmarks/bench_ingest.py [--comments 10000]
+
+使用临时 SQLite 文件数据库，评论已带有分析结果（不计情感分析耗时）。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def make_records(n, prefix):
+    from datetime import datetime, timedelta
+    from app.models import CommentRecord
+
+    records = []
+    for i in range(n):
+        record = CommentRecord(f'{prefix}{i}', None, f'@user{i % 997}', f'comment text number {i}',
+                               like_count=i % 50, published_at=datetime(2024, 1, 1) - timedelta(minutes=i))
+        record.sentiment = 'positive'
+        record.sentiment_score = 0.4
+        record.labels = ('#people',)
+        record.topics = ()
+        records.append(record)
+    return records
+
+
+def legacy_ingest(db, video, records):
+    import json
+    from app.models import Comment
+
+    for record in records:
+        if Comment.query.filter_by(comment_id=record.comment_id).first():
+            continue
+        db.session.add(Comment(
+            video_id=video.id, comment_id=record.comment_id, parent_id=record.parent_id, author=record.author,
+            text=record.text, like_count=record.like_count, reply_count=record.reply_count,
+            published_at=record.published_at, sentiment=record.sentiment, sentiment_score=record.sentiment_score,
+            labels_json=json.dumps(list(record.labels)), topics_json=json.dumps(list(record.topics))
+        ))
+    db.session.commit()
+
+
+def batch_ingest(db, video, records):
+    from app.services import CommentIngestor
+
+    ingestor = CommentIngestor(video.id)
+    for start in range(0, len(records), 100):  # 与爬取一致：每页100条
+        ingestor.add(ingestor.filter_new(records[start:start + 100]))
+    ingestor.flush()
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--comments', type=int, default=10000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+
+    from app import create_app, db
+    from app.models import Video
+
+    app = create_app()
+    with app.app_context():
+        for name, fn in (('row-by-row ORM', legacy_ingest), ('CommentIngestor', batch_ingest)):
+            video = Video(video_id=f'bench_{name[:3]}')
+            db.session.add(video)
+            db.session.commit()
+            records = make_records(args.comments, f'{name[:3]}_')
+
+            start = time.perf_counter()
+            fn(db, video, records)
+            elapsed = time.perf_counter() - start
+
+            # 再次写入相同评论：全部是已存在的行
+            start = time.perf_counter()
+            fn(db, video, records)
+            repeat = time.perf_counter() - start
+            print(f'{name:16s} {args.comments} new: {elapsed:6.3f}s   {args.comments} existing: {repeat:6.3f}s')
+
+
+if __name__ == '__main__':
+    main()
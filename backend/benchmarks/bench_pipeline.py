@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+分析流水线基准：逐页顺序执行 过滤→情感→标签→写库 vs 分阶段流水线（fetch/normalize/sentiment/label/persist 重叠）
+
+    python benchmarks/bench_pipeline.py [--pages 40] [--page-size 100] [--latency-ms 80]
+                                        [--sentiment-workers 2] [--executor thread|process]
+
+页由生成器按 --latency-ms 模拟 API 延迟产生，评论文本各不相同（每条都要做情感分析）。
+使用临时 SQLite 文件数据库，两种方式各写入一个视频。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+WORDS = ['great', 'terrible', 'love', 'boring', 'food', 'people', 'work', 'election', 'funny', 'sad', 'video']
+
+
+def make_pages(prefix, pages, page_size, latency):
+    from datetime import datetime, timedelta
+    from app.models import CommentRecord
+    from app.services import CommentPage
+
+    for p in range(pages):
+        time.sleep(latency)
+        items = []
+        for i in range(page_size):
+            n = p * page_size + i
+            text = ' '.join(WORDS[(n * k) % len(WORDS)] for k in range(1, 8)) + f' {prefix}{n}'
+            items.append(CommentRecord(f'{prefix}{n}', None, f'@user{n % 997}', text,
+                                       published_at=datetime(2024, 1, 1) - timedelta(minutes=n)))
+        yield CommentPage(items, next_page_token=f'p{p + 1}' if p + 1 < pages else None)
+
+
+def run(app, video, pages, pipelined):
+    from app import db
+    from app.services import AIAnalyzer, CommentIngestor, SentimentAnalyzer, TextAnalysisCache
+    from app.services.analysis_pipeline import KnownTopics, build_analysis_pipeline, score_page
+
+    ingestor = CommentIngestor(video.id)
+    text_cache = TextAnalysisCache(SentimentAnalyzer(), AIAnalyzer())
+    known_topics = KnownTopics(text_cache.ai_analyzer)
+    known_topics.topics = []  # 不调用 OpenAI
+
+    def normalize(work):
+        with app.app_context():
+            work.records = ingestor.filter_new(work.page.items)
+            work.pending = text_cache.prepare(work.records)
+        return work
+
+    def label(work):
+        work.new_rows = text_cache.complete(work.records, work.scores, known_topics.get(work.page.items))
+        return work
+
+    def persist(work):
+        text_cache.save(work.new_rows)
+        ingestor.add(work.records)
+        if ingestor.uncommitted >= 1000:
+            ingestor.commit()
+        return work
+
+    pipeline = build_analysis_pipeline(normalize, label, persist)
+    start = time.perf_counter()
+    if pipelined:
+        for _ in pipeline.run(pages):
+            pass
+    else:
+        from app.services.analysis_pipeline import PageWork
+        for page in pages:
+            persist(label(score_page(normalize(PageWork(page)))))
+    ingestor.commit()
+    elapsed = time.perf_counter() - start
+    db.session.remove()
+    return elapsed, ingestor.inserted, pipeline.stats() if pipelined else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--sentiment-workers', type=int, default=2)
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.environ['ANALYSIS_SENTIMENT_WORKERS'] = str(args.sentiment_workers)
+    os.environ['ANALYSIS_SENTIMENT_EXECUTOR'] = args.executor
+
+    from app import create_app, db
+    from app.models import Video
+
+    app = create_app()
+    latency = args.latency_ms / 1000
+    with app.app_context():
+        results = {}
+        for name, pipelined in (('sequential', False), ('pipelined', True)):
+            video = Video(video_id=f'bench-{name}')
+            db.session.add(video)
+            db.session.commit()
+            pages = make_pages(f'{name}-', args.pages, args.page_size, latency)
+            results[name] = run(app, video, pages, pipelined)
+
+    total = args.pages * args.page_size
+    for name, (elapsed, inserted, _) in results.items():
+        print(f'{name:12s} {elapsed:7.2f}s   {total / elapsed:8.0f} comments/s   ({inserted} inserted)')
+    print(f'{"stage":12s} {"workers":>7s} {"busy":>8s} {"waiting":>8s} {"blocked":>8s} {"util":>6s}')
+    for stage, stats in results['pipelined'][2].items():
+        print(f'{stage:12s} {stats["workers"]:7d} {stats["busy_seconds"]:7.2f}s {stats["waiting_seconds"]:7.2f}s '
+              f'{stats["blocked_seconds"]:7.2f}s {stats["utilization"]:6.2f}')
+
+
+if __name__ == '__main__':
+    main()
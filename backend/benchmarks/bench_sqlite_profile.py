@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+SQLite 并发读写基准：默认参数 vs Config.SQLITE_PRAGMAS（WAL + 只读报表引擎）
+
+    python benchmarks/bench_sqlite_profile.py [--comments 20000] [--readers 4]
+
+一个线程按 INGEST_COMMIT_CHUNK 分块写入评论，同时若干线程反复执行报表式的聚合查询，
+统计写入耗时、读查询次数和读查询的最大延迟。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def run(label, pragmas, args):
+    from sqlalchemy import create_engine, func, insert, select
+    from app import db
+    from app.models import Video, Comment
+    from app.models.engine import apply_sqlite_profile, create_read_engine
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    engine = create_engine(f'sqlite:///{path}')
+    apply_sqlite_profile(engine, pragmas)
+    db.metadata.create_all(engine)
+    read_engine = create_read_engine(engine, pragmas=pragmas) if pragmas else engine
+
+    with engine.begin() as conn:
+        video_pk = conn.execute(insert(Video).values(video_id='bench')).inserted_primary_key[0]
+
+    done = threading.Event()
+    reads = []
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    query = (select(Comment.sentiment, func.count(), func.avg(Comment.sentiment_score))
+             .where(Comment.video_id == video_pk).group_by(Comment.sentiment))
+
+    def reader():
+        count = 0
+        worst = 0.0
+        while not done.is_set():
+            start = time.perf_counter()
+            try:
+                with read_engine.connect() as conn:
+                    conn.execute(query).all()
+            except Exception as e:
+                with lock:
+                    errors.append(type(e).__name__)
+                continue
+            worst = max(worst, time.perf_counter() - start)
+            count += 1
+        with lock:
+            reads.append(count)
+            latencies.append(worst)
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    for t in threads:
+        t.start()
+
+    start = time.perf_counter()
+    for offset in range(0, args.comments, args.chunk):
+        rows = [{
+            'video_id': video_pk, 'comment_id': f'c{i}', 'author': f'@user{i % 997}',
+            'text': f'comment text number {i}', 'like_count': i % 50, 'reply_count': 0,
+            'published_at': datetime(2024, 1, 1), 'sentiment': ('positive', 'negative', 'neutral')[i % 3],
+            'sentiment_score': 0.1, 'labels_json': '[]', 'topics_json': '[]'
+        } for i in range(offset, min(offset + args.chunk, args.comments))]
+        with engine.begin() as conn:
+            conn.execute(insert(Comment), rows)
+    write_elapsed = time.perf_counter() - start
+
+    done.set()
+    for t in threads:
+        t.join()
+
+    print(f'{label:8s} write {args.comments} rows: {write_elapsed:6.2f}s ({args.comments / write_elapsed:8.0f} rows/s)   '
+          f'reads: {sum(reads):6d} ({sum(reads) / write_elapsed:7.0f}/s)   '
+          f'max read latency: {max(latencies) * 1000:7.1f}ms   errors: {len(errors)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--comments', type=int, default=20000)
+    parser.add_argument('--chunk', type=int, default=None, help='每次提交的行数（默认 INGEST_COMMIT_CHUNK）')
+    parser.add_argument('--readers', type=int, default=4)
+    args = parser.parse_args()
+
+    from config import Config
+    args.chunk = args.chunk or Config.INGEST_COMMIT_CHUNK
+
+    run('default', {}, args)
+    run('profile', Config.SQLITE_PRAGMAS, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,26 +3,132 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+
+def _database_url(url):
+    """Heroku 等平台提供的 postgres:// 地址 SQLAlchemy 1.4+ 不再接受，统一成 postgresql://"""
+    if url and url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def _engine_options(url):
+    """连接池参数；SQLite（尤其是内存库的 StaticPool）不接受 pool_size 等参数"""
+    if not url or url.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),  # 每个进程常驻的连接数
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),  # 高峰时额外允许的连接数
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),  # 秒
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),  # 秒，避免使用被服务端/代理断开的连接
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+    }
+
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     
     # YouTube API
     YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
+    YOUTUBE_API_BASE_URL = os.getenv('YOUTUBE_API_BASE_URL')  # 为空时使用官方API；可指向 tools/youtube_standin.py
     
     # OpenAI API (用于AI分析)
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     
     # Database
-    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///youtube_comments.db')
+    SQLALCHEMY_DATABASE_URI = _database_url(os.getenv('DATABASE_URL', 'sqlite:///youtube_comments.db'))
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_READ_DATABASE_URI = _database_url(os.getenv('READ_DATABASE_URL'))  # 报表只读库；为空时SQLite以只读模式打开同一文件
+    
+    # PostgreSQL 批量导入评论的方式：copy（COPY 到临时表再 INSERT ... ON CONFLICT）| values（多行 VALUES）
+    POSTGRES_BULK_LOAD = os.getenv('POSTGRES_BULK_LOAD', 'copy')
+    
+    # SQLite 连接参数（每个新连接执行；设为空字符串可跳过某一项）
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),  # 读写互不阻塞
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),  # WAL下NORMAL不会损坏数据库，只可能丢失最后的事务
+        'mmap_size': os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+        'cache_size': os.getenv('SQLITE_CACHE_SIZE', '-65536'),  # 负数单位为KiB，即64MB
+        'busy_timeout': os.getenv('SQLITE_BUSY_TIMEOUT', '5000'),  # 毫秒
+        'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY'),
+    }
     
     # Redis (用于任务队列)
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
     
+    # YouTube API 配额与限流（默认每日10000单位）
+    YOUTUBE_QUOTA_DAILY_UNITS = int(os.getenv('YOUTUBE_QUOTA_DAILY_UNITS', 10000))
+    YOUTUBE_QUOTA_PER_SECOND = float(os.getenv('YOUTUBE_QUOTA_PER_SECOND', 5))
+    YOUTUBE_QUOTA_BACKEND = os.getenv('YOUTUBE_QUOTA_BACKEND', 'memory')  # memory | file | redis
+    YOUTUBE_QUOTA_STATE_FILE = os.getenv('YOUTUBE_QUOTA_STATE_FILE', os.path.join(basedir, 'instance', 'youtube_quota.json'))
+    YOUTUBE_API_UNIT_COSTS = {
+        'videos.list': 1,
+        'commentThreads.list': 1,
+        'comments.list': 1,
+    }
+    YOUTUBE_API_TIMEOUT = int(os.getenv('YOUTUBE_API_TIMEOUT', 30))  # 秒
+    YOUTUBE_CLIENT_POOL_SIZE = int(os.getenv('YOUTUBE_CLIENT_POOL_SIZE', 16))  # 空闲客户端（长连接）上限
+    YOUTUBE_API_MAX_RETRIES = 5
+    YOUTUBE_API_BACKOFF_BASE = 1.0  # 秒
+    YOUTUBE_API_BACKOFF_MAX = 32.0
+    
+    # 视频元数据缓存
+    VIDEO_INFO_CACHE_TTL = int(os.getenv('VIDEO_INFO_CACHE_TTL', 600))  # 秒
+    VIDEO_INFO_CACHE_SIZE = int(os.getenv('VIDEO_INFO_CACHE_SIZE', 2000))
+    VIDEO_INFO_CACHE_BACKEND = os.getenv('VIDEO_INFO_CACHE_BACKEND', 'memory')  # memory | redis
+    
+    # Scraping
+    REPLY_FETCH_WORKERS = int(os.getenv('REPLY_FETCH_WORKERS', 8))  # 并发拉取完整回复的线程数
+    
     # Analysis settings
     MIN_TOPIC_THRESHOLD = 0.35  # 话题出现35%以上才显示
-    MAX_COMMENTS_PER_REQUEST = 10000
+    MAX_COMMENTS_PER_REQUEST = int(os.getenv('MAX_COMMENTS_PER_REQUEST', 10000))
     CONTROVERSY_REPLY_THRESHOLD = 100  # 超过100回复算争议
+    ANALYSIS_MAX_CONCURRENCY = int(os.getenv('ANALYSIS_MAX_CONCURRENCY', 4))  # 每个进程同时分析的视频数上限
+    MAX_VIDEOS_PER_BATCH = 500
+    INGEST_INSERT_BATCH_SIZE = int(os.getenv('INGEST_INSERT_BATCH_SIZE', 500))  # 每次 executemany 插入的评论数
+    TEXT_ANALYSIS_CACHE_SIZE = int(os.getenv('TEXT_ANALYSIS_CACHE_SIZE', 50000))  # 每次分析在内存中保留的去重文本结果数
+    INGEST_COMMIT_CHUNK = int(os.getenv('INGEST_COMMIT_CHUNK', 1000))  # 每入库多少条评论提交一次（在页边界与断点一起提交）
+    
+    # 分析流水线（fetch → normalize → sentiment → label → persist）
+    ANALYSIS_PIPELINE_QUEUE_SIZE = int(os.getenv('ANALYSIS_PIPELINE_QUEUE_SIZE', 4))  # 相邻阶段之间最多缓存的页数
+    ANALYSIS_SENTIMENT_WORKERS = int(os.getenv('ANALYSIS_SENTIMENT_WORKERS', 2))
+    ANALYSIS_SENTIMENT_EXECUTOR = os.getenv('ANALYSIS_SENTIMENT_EXECUTOR', 'thread')  # thread | process（多核时绕开GIL）
+    ANALYSIS_LABEL_WORKERS = int(os.getenv('ANALYSIS_LABEL_WORKERS', 1))
+    
+    # 后台分析任务队列：memory（进程内）| redis（独立 worker 进程：python worker.py）| fakeredis（进程内，测试用）
+    JOB_QUEUE_BACKEND = os.getenv('JOB_QUEUE_BACKEND', 'memory')
+    JOB_WORKER_THREADS = int(os.getenv('JOB_WORKER_THREADS', ANALYSIS_MAX_CONCURRENCY))  # 每个进程执行任务的线程数
+    JOB_TTL = int(os.getenv('JOB_TTL', 86400))  # redis 后端任务记录保留时间（秒）
+    JOB_HISTORY_SIZE = 1000  # memory 后端保留的已结束任务数
+    JOB_EVENT_BUFFER = 64  # 每个任务的 SSE 频道保留的最近事件数（慢订阅者只会跳过中间的计数更新）
+    JOB_EVENT_KEEPALIVE = int(os.getenv('JOB_EVENT_KEEPALIVE', 15))  # SSE 无事件时发送心跳的间隔（秒）
+    JOB_STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', 600))  # 运行中的任务超过这么久没有更新视为worker已退出（秒）
+    JOB_QUEUED_STALE_AFTER = int(os.getenv('JOB_QUEUED_STALE_AFTER', 3600))  # 排队超过这么久视为任务已丢失（秒）
+    JOB_DEFAULT_TIMEOUT = int(os.getenv('JOB_DEFAULT_TIMEOUT', 1800))  # 任务默认期限（秒，从提交时算起），0 为不限
+    JOB_MAX_TIMEOUT = int(os.getenv('JOB_MAX_TIMEOUT', 6 * 3600))  # 请求中 timeout_seconds 的上限
+    JOB_CANCEL_CHECK_INTERVAL = 1.0  # 运行中的任务检查取消标记的最短间隔（秒）
+    
+    # 关注列表定时重新分析（python worker.py --scheduler），见 app/services/refresh_scheduler.py
+    SCHEDULER_TICK_SECONDS = int(os.getenv('SCHEDULER_TICK_SECONDS', 30))
+    SCHEDULER_DEFAULT_INTERVAL = int(os.getenv('SCHEDULER_DEFAULT_INTERVAL', 6 * 3600))  # 秒
+    SCHEDULER_MIN_INTERVAL = int(os.getenv('SCHEDULER_MIN_INTERVAL', 600))
+    SCHEDULER_DEFAULT_MAX_COMMENTS = int(os.getenv('SCHEDULER_DEFAULT_MAX_COMMENTS', 500))
+    SCHEDULER_JITTER = float(os.getenv('SCHEDULER_JITTER', 0.1))  # 下次执行时间在间隔的 ±10% 内随机
+    SCHEDULER_QUOTA_SHARE = float(os.getenv('SCHEDULER_QUOTA_SHARE', 0.5))  # 调度器最多使用的剩余配额比例
+    SCHEDULER_BURST_TICKS = 4  # 空闲时最多攒几轮的配额预算
+    SCHEDULER_MAX_PER_TICK = int(os.getenv('SCHEDULER_MAX_PER_TICK', 50))  # 每轮最多提交的任务数
+    MAX_TRACKED_PER_REQUEST = 1000
+    
+    # 同一视频同时只允许一个分析（跨进程）：file（本机 flock）| redis（多台机器）
+    VIDEO_LOCK_BACKEND = os.getenv('VIDEO_LOCK_BACKEND', 'file')
+    VIDEO_LOCK_DIR = os.getenv('VIDEO_LOCK_DIR', os.path.join(basedir, 'instance', 'locks'))
+    VIDEO_LOCK_TTL = int(os.getenv('VIDEO_LOCK_TTL', 300))  # redis 锁过期时间（秒），持有期间自动续期
+    
+    # 每个视频分析完成后写入的 Parquet 快照（需要 pyarrow），供导出和报表使用
+    SNAPSHOTS_ENABLED = os.getenv('SNAPSHOTS_ENABLED', 'true').lower() == 'true'
+    SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join(basedir, 'instance', 'snapshots'))
     
     # CORS
     CORS_HEADERS = 'Content-Type'
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""
+测试环境，不需要API密钥和网络：
+- 单元测试用内存中的 YouTube API 替身（FakeYouTube）代替 googleapiclient，可以检查每次调用的参数
+- 端到端测试通过本地替身服务器（tools/youtube_standin.py）走完整的 HTTP 调用链
+Config 在导入时读取环境变量，所以替身服务器和环境变量要在导入 app 之前准备好
+"""
+import itertools
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'tools'))
+
+from youtube_standin import FaultInjector, SyntheticSource, create_server  # noqa: E402
+
+STANDIN_THREADS = 1000  # 替身服务器上每个视频的主评论数
+
+_tmp_dir = tempfile.mkdtemp(prefix='csa-tests-')
+_standin = create_server(port=0, threads=STANDIN_THREADS, replies=0)
+threading.Thread(target=_standin.serve_forever, daemon=True).start()
+
+os.environ.update({
+    'YOUTUBE_API_BASE_URL': f'http://127.0.0.1:{_standin.server_address[1]}/',
+    'YOUTUBE_API_KEY': 'test',
+    'OPENAI_API_KEY': '',  # 不调用外部AI服务，使用本地回退逻辑
+    'DATABASE_URL': 'sqlite:///' + os.path.join(_tmp_dir, 'test.db'),
+    'YOUTUBE_QUOTA_BACKEND': 'memory',
+    'YOUTUBE_QUOTA_PER_SECOND': '1000',
+    'JOB_QUEUE_BACKEND': 'memory',
+    'VIDEO_LOCK_DIR': os.path.join(_tmp_dir, 'locks'),
+    'SNAPSHOTS_ENABLED': 'false',  # 需要快照的测试自己开启
+    'SNAPSHOT_DIR': os.path.join(_tmp_dir, 'snapshots'),
+})
+
+from app import create_app, db  # noqa: E402
+from app.services import rate_limiter, video_cache, youtube_client  # noqa: E402
+
+INLINE_REPLIES = 5  # commentThreads.list 内联返回的回复数上限（与真实API一致）
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class _Request:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+class _Endpoint:
+    def __init__(self, fn):
+        self.list = lambda **params: _Request(lambda: fn(params))
+
+
+class FakeYouTube:
+    """
+    确定性的 YouTube API 替身：第 i 条主评论 id 为 t{i}，发布时间为 EPOCH - i 分钟（序号越小越新），
+    回复数由 replies(i) 决定；calls 记录每个接口收到的参数
+    """
+
+    def __init__(self, threads=10, replies=lambda i: 0):
+        self.threads = threads
+        self.replies = replies
+        self.calls = {'videos': [], 'commentThreads': [], 'comments': []}
+        self._lock = threading.Lock()
+
+    def videos(self):
+        return _Endpoint(self._videos)
+
+    def commentThreads(self):
+        return _Endpoint(self._comment_threads)
+
+    def comments(self):
+        return _Endpoint(self._comments)
+
+    def _record(self, endpoint, params):
+        with self._lock:
+            self.calls[endpoint].append(params)
+
+    def _videos(self, params):
+        self._record('videos', params)
+        return {'items': [{
+            'id': video_id,
+            'snippet': {'title': f'Video {video_id}', 'description': '', 'publishedAt': '2023-12-01T00:00:00Z'},
+            'contentDetails': {'duration': 'PT1M'},
+            'statistics': {'commentCount': str(self.threads), 'viewCount': '100', 'likeCount': '10'}
+        } for video_id in params['id'].split(',') if not video_id.startswith('missing')]}
+
+    def _comment_threads(self, params):
+        self._record('commentThreads', params)
+        start = int(params.get('pageToken') or 0)
+        end = min(self.threads, start + params.get('maxResults', 20))
+        items = []
+        for i in range(start, end):
+            thread_id = f't{i}'
+            item = {'id': thread_id, 'snippet': {
+                'totalReplyCount': self.replies(i),
+                'topLevelComment': {'id': thread_id, 'snippet': _snippet(f'comment {i}', EPOCH - timedelta(minutes=i))}
+            }}
+            if self.replies(i):
+                item['replies'] = {'comments': [
+                    _reply(thread_id, j) for j in range(min(INLINE_REPLIES, self.replies(i)))
+                ]}
+            items.append(item)
+        return _page(items, end if end < self.threads else None)
+
+    def _comments(self, params):
+        self._record('comments', params)
+        parent_id = params['parentId']
+        total = self.replies(int(parent_id[1:]))
+        start = int(params.get('pageToken') or 0)
+        end = min(total, start + params.get('maxResults', 20))
+        return _page([_reply(parent_id, j) for j in range(start, end)], end if end < total else None)
+
+
+def _snippet(text, published_at):
+    return {'authorDisplayName': 'author', 'textDisplay': text, 'likeCount': 0,
+            'publishedAt': published_at.strftime('%Y-%m-%dT%H:%M:%SZ')}
+
+
+def _reply(parent_id, index):
+    return {'id': f'{parent_id}.r{index}', 'snippet': _snippet(f'reply {index}', EPOCH)}
+
+
+def _page(items, next_offset):
+    page = {'items': items}
+    if next_offset is not None:
+        page['nextPageToken'] = str(next_offset)
+    return page
+
+
+_video_ids = itertools.count()
+
+
+@pytest.fixture(scope='session')
+def app():
+    return create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+        db.session.remove()
+
+
+@pytest.fixture
+def video_id():
+    """每个测试用不同的视频，数据库中的记录互不干扰"""
+    return f'vid{next(_video_ids):08d}'
+
+
+@pytest.fixture
+def fake_youtube(monkeypatch):
+    """让客户端池借出的所有客户端都是同一个 FakeYouTube"""
+    fake = FakeYouTube()
+    monkeypatch.setattr(youtube_client, '_pool', None)
+    monkeypatch.setattr(youtube_client.YouTubeClientPool, '_build', lambda self: fake)
+    monkeypatch.setattr(video_cache, '_cache', None)  # 缓存的视频信息来自其他测试的替身
+    return fake
+
+
+@pytest.fixture
+def standin():
+    """替身服务器；每个测试开始时恢复默认数据和故障设置"""
+    _standin.synthetic = SyntheticSource(STANDIN_THREADS, 0, 0, 0)
+    _standin.faults = FaultInjector(0, 0, 0.0, 0.0, None, 0)
+    with _standin.stats_lock:
+        _standin.stats.clear()
+    return _standin
+
+
+@pytest.fixture(autouse=True)
+def fresh_quota(monkeypatch):
+    """每个测试使用新的（进程内）配额状态，配额用尽的测试不影响其他测试"""
+    monkeypatch.setattr(rate_limiter, '_limiter', None)
@@ -0,0 +1,126 @@
+from datetime import datetime
+
+import pytest
+
+from app import db
+from app.models import Comment, CommentLabel, CommentTopic, Video
+from app.models.records import CommentRecord
+from app.services.comment_ingestor import CommentIngestor, _copy_value
+from app.services.video_stats import load_video_stats
+
+
+def _record(video, index):
+    record = CommentRecord(f'{video.video_id}c{index}', None, 'author', f'text {index}', reply_count=index,
+                           published_at=datetime(2024, 1, 1 + index % 28))
+    record.sentiment = 'positive'
+    record.sentiment_score = 0.5
+    record.labels = ('question',)
+    record.topics = ('camera', 'camera')
+    return record
+
+
+@pytest.fixture
+def video(app_context, video_id):
+    video = Video(video_id=video_id)
+    db.session.add(video)
+    db.session.commit()
+    return video
+
+
+@pytest.fixture(params=[True, False], ids=['returning', 'no-returning'])
+def returning(request, monkeypatch, app_context):
+    """分别测试支持和不支持 executemany RETURNING 的数据库"""
+    monkeypatch.setattr(db.engine.dialect, 'insert_executemany_returning', request.param)
+    return request.param
+
+
+def test_filter_new_skips_duplicates_within_and_across_batches(video):
+    def new_ids(*indexes):
+        return [r.comment_id[len(video.video_id):] for r in ingestor.filter_new([_record(video, i) for i in indexes])]
+
+    ingestor = CommentIngestor(video.id, batch_size=2)
+    assert new_ids(0, 1, 0) == ['c0', 'c1']
+
+    # 已接收但尚未提交的评论再次出现时同样跳过
+    assert new_ids(1) == []
+    ingestor.add([_record(video, 0), _record(video, 1)])
+    assert new_ids(1, 2) == ['c2']
+
+    # 提交后由数据库去重
+    ingestor.commit()
+    assert new_ids(0, 1, 2, 3) == ['c3']
+    assert ingestor.inserted == 2
+
+    # 已入库的评论由 IN 查询去重
+    ingestor = CommentIngestor(video.id)
+    assert new_ids(0, 1, 2, 3) == ['c2', 'c3']
+
+
+def test_existing_ids_are_queried_in_chunks(video, monkeypatch):
+    monkeypatch.setattr(CommentIngestor, 'IN_CLAUSE_SIZE', 3)
+    ingestor = CommentIngestor(video.id)
+    ingestor.add([_record(video, i) for i in range(7)])
+    ingestor.flush()
+
+    ids = [f'{video.video_id}c{i}' for i in range(10)]
+    assert ingestor.existing_ids(ids) == set(ids[:7])
+
+
+def test_rows_are_inserted_in_batches(video):
+    ingestor = CommentIngestor(video.id, batch_size=4)
+    ingestor.add([_record(video, i) for i in range(3)])
+    assert ingestor.inserted == 0  # 不足一批时只缓存
+
+    ingestor.add([_record(video, i) for i in range(3, 10)])
+    assert ingestor.inserted == 10
+    db.session.commit()
+
+    comment = Comment.query.filter_by(comment_id=f'{video.video_id}c1').one()
+    assert (comment.sentiment, comment.labels_json) == ('positive', '["question"]')
+    assert Comment.query.filter_by(video_id=video.id).count() == 10
+
+    # 标签/话题按行写入（同一评论的重复话题只写一行）
+    assert CommentLabel.query.filter_by(video_id=video.id, label='question').count() == 10
+    assert CommentTopic.query.filter_by(video_id=video.id, topic='camera').count() == 10
+
+
+def _ingest(video, records):
+    ingestor = CommentIngestor(video.id)
+    ingestor.add(ingestor.filter_new(records))
+    ingestor.commit()
+    return ingestor
+
+
+def test_counts_only_inserted_comments(video, returning):
+    ingestor = _ingest(video, [_record(video, i) for i in range(5)])
+    assert ingestor.inserted == 5
+
+    # c3/c4 已存在：不重复插入，也不重复计入统计
+    ingestor = _ingest(video, [_record(video, i) for i in range(3, 8)])
+    assert ingestor.inserted == 3
+
+    stats = load_video_stats(db.session, video.id)
+    assert stats['total'] == 8
+    assert stats['sentiments']['positive'] == 8
+    assert stats['label'] == {'question': 8}
+    assert Comment.query.filter_by(video_id=video.id).count() == 8
+
+
+def test_rows_skipped_on_conflict_are_not_counted(video, returning):
+    _ingest(video, [_record(video, 0), _record(video, 1)])
+
+    # 绕过 filter_new 直接插入已存在的评论（并发写入时的情况）：不会因唯一约束失败，统计只计入新插入的一条
+    ingestor = CommentIngestor(video.id)
+    ingestor.add([_record(video, 1), _record(video, 2)])
+    ingestor.commit()
+
+    assert ingestor.inserted == 1
+    assert load_video_stats(db.session, video.id)['total'] == 3
+    assert Comment.query.filter_by(video_id=video.id).count() == 3
+
+
+def test_copy_values_are_escaped_for_postgres_text_format():
+    assert _copy_value(None) == '\\N'
+    assert _copy_value('a\tb\nc\\d\r') == 'a\\tb\\nc\\\\d\\r'
+    assert _copy_value(datetime(2024, 1, 2, 3, 4, 5)) == '2024-01-02 03:04:05'
+    assert _copy_value(0.5) == '0.5'
@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import db, read_session
+from config import _database_url, _engine_options
+
+
+def test_sqlite_profile_is_applied_to_every_connection(app_context):
+    with db.engine.connect() as connection:
+        assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert connection.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+        assert connection.execute(text('PRAGMA temp_store')).scalar() == 2  # MEMORY
+
+
+def test_read_session_is_read_only(app_context):
+    assert read_session.get_bind() is not db.engine
+    assert read_session.execute(text('PRAGMA query_only')).scalar() == 1
+    with pytest.raises(OperationalError):
+        read_session.execute(text("INSERT INTO videos (video_id) VALUES ('read-only')"))
+
+
+def test_report_is_served_from_read_session(client, standin, video_id):
+    assert client.get(f'/api/video/{video_id}/report').status_code == 404
+
+    client.post('/api/analyze', json={'video_url': video_id, 'wait': True, 'max_comments': 100})
+    response = client.get(f'/api/video/{video_id}/report')
+
+    assert response.status_code == 200
+    assert response.json['video']['video_id'] == video_id
+
+
+def test_postgres_urls_get_pool_options():
+    assert _database_url('postgres://u:p@db/app') == 'postgresql://u:p@db/app'
+    assert _database_url('sqlite:///app.db') == 'sqlite:///app.db'
+
+    assert _engine_options('sqlite:///app.db') == {}
+    options = _engine_options('postgresql://u:p@db/app')
+    assert options['pool_pre_ping'] and options['pool_size'] == 10 and options['max_overflow'] == 20
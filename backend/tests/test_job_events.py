@@ -0,0 +1,70 @@
+import json
+import time
+
+import pytest
+
+from app.services.job_events import JobEventHub, RedisEventRelay
+
+
+def _job(job_id, **fields):
+    return {'job_id': job_id, 'state': 'running', 'stage': 'scraping', **fields}
+
+
+def test_hub_delivers_only_to_subscribed_jobs():
+    hub = JobEventHub(buffer_size=10)
+    hub.publish(_job('a', seq=0))  # 没有订阅者的事件不保留
+
+    with hub.subscribe('a') as subscription:
+        assert hub.subscriber_count() == 1
+        hub.publish(_job('a', seq=1))
+        hub.publish(_job('b', seq=1))
+        assert [e['seq'] for e in subscription.wait(timeout=1)] == [1]
+        assert subscription.wait(timeout=0.01) == []
+
+    assert hub.subscriber_count() == 0
+
+
+def test_slow_subscriber_skips_intermediate_events():
+    hub = JobEventHub(buffer_size=2)
+    with hub.subscribe('a') as subscription:
+        for seq in range(5):
+            hub.publish(_job('a', seq=seq))
+        # 每个事件都是完整的任务状态，只需要最新的几条
+        assert [e['seq'] for e in subscription.wait(timeout=1)] == [3, 4]
+
+
+def test_redis_relay_forwards_published_events():
+    fakeredis = pytest.importorskip('fakeredis')
+    client = fakeredis.FakeRedis()
+    hub = JobEventHub()
+    relay = RedisEventRelay(client, 'test:events', hub)
+
+    with hub.subscribe('a') as subscription:
+        relay.start()
+        # 订阅线程启动前发布的消息会丢失，重复发布直到收到
+        deadline = time.monotonic() + 5
+        events = []
+        while not events and time.monotonic() < deadline:
+            client.publish('test:events', json.dumps(_job('a', seq=1)))
+            events = subscription.wait(timeout=0.1)
+    assert events[0]['seq'] == 1
+
+
+def test_events_endpoint_streams_stages_until_end(client, standin, video_id):
+    standin.faults.latency_ms = 20
+    job = client.post('/api/analyze', json={'video_url': video_id, 'max_comments': 300}).json
+
+    response = client.get(f"/api/jobs/{job['job_id']}/events")
+    assert response.mimetype == 'text/event-stream'
+
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if 'event' in lines:
+            events.append((lines['event'], json.loads(lines['data'])))
+
+    assert events[-1][0] == 'end'
+    assert events[-1][1]['state'] == 'succeeded'
+    assert events[-1][1]['result']['total_comments'] == 300
+    assert {'stage', 'end'} <= {event_type for event_type, _ in events}
+    assert client.get('/api/jobs/unknown/events').status_code == 404
@@ -0,0 +1,179 @@
+import threading
+import time
+
+import pytest
+
+from app.services import get_job_queue
+from app.services.job_queue import (JOB_CANCELLED, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_TIMED_OUT,
+                                    JobClaimError, JobQueue, execute_job)
+from config import Config
+
+
+@pytest.fixture(params=['memory', 'fakeredis'])
+def job_queue(request):
+    if request.param == 'fakeredis':
+        pytest.importorskip('fakeredis')
+    return JobQueue(backend=request.param)
+
+
+def _pending(job_queue):
+    """取出所有待执行的任务ID（不执行）"""
+    job_ids = []
+    while True:
+        job_id = job_queue.next_job(timeout=0.01)
+        if job_id is None:
+            return job_ids
+        job_ids.append(job_id)
+
+
+def _drain(app, job_queue):
+    """在当前线程中依次执行排队的任务，返回执行过的任务ID"""
+    job_ids = []
+    while True:
+        job_id = job_queue.next_job(timeout=0.01)
+        if job_id is None:
+            return job_ids
+        execute_job(app, job_queue, job_id)
+        job_ids.append(job_id)
+
+
+def test_jobs_run_in_order_and_report_progress(app, job_queue, standin, video_id):
+    first, _ = job_queue.enqueue(video_id, {'max_comments': 300})
+    second, _ = job_queue.enqueue(video_id + 'x', {'max_comments': 100})
+    assert first['state'] == JOB_QUEUED
+
+    assert _drain(app, job_queue) == [first['job_id'], second['job_id']]
+
+    job = job_queue.get(first['job_id'])
+    assert (job['state'], job['stage']) == (JOB_SUCCEEDED, 'done')
+    assert job['counts']['pages_fetched'] == 3
+    assert job['counts']['rows_persisted'] == 300
+    assert job['result']['total_comments'] == 300
+    assert job['started_at'] and job['finished_at']
+
+
+def test_failed_job_records_error_type(app, job_queue, standin):
+    job, _ = job_queue.enqueue('missing0001', {})
+    _drain(app, job_queue)
+
+    job = job_queue.get(job['job_id'])
+    assert (job['state'], job['error_type']) == (JOB_FAILED, 'not_found')
+
+
+def test_enqueue_is_single_flight_per_video(job_queue, video_id):
+    job, created = job_queue.enqueue(video_id, {'max_comments': 100})
+    assert created
+    assert job['state'] == JOB_QUEUED
+
+    attached, created = job_queue.enqueue(video_id, {'max_comments': 500})
+    assert not created
+    assert attached['job_id'] == job['job_id']
+
+    other, created = job_queue.enqueue(video_id + 'x', {})
+    assert created
+    assert other['job_id'] != job['job_id']
+    assert _pending(job_queue) == [job['job_id'], other['job_id']]
+
+
+def test_finished_job_releases_video(app, job_queue, standin, video_id):
+    job, _ = job_queue.enqueue(video_id, {'max_comments': 100})
+    _drain(app, job_queue)
+
+    again, created = job_queue.enqueue(video_id, {})
+    assert created
+    assert again['job_id'] != job['job_id']
+
+
+def test_stale_running_job_does_not_block_video(job_queue, video_id, monkeypatch):
+    job, _ = job_queue.enqueue(video_id, {})
+    _pending(job_queue)
+    job_queue.update(job['job_id'], state=JOB_RUNNING)  # worker 开始执行后退出，任务不再更新
+
+    monkeypatch.setattr(Config, 'JOB_STALE_AFTER', 0)
+    again, created = job_queue.enqueue(video_id, {})
+    assert created
+    assert again['job_id'] != job['job_id']
+
+
+def test_lost_queued_job_does_not_block_video(job_queue, video_id, monkeypatch):
+    job, _ = job_queue.enqueue(video_id, {})
+    _pending(job_queue)  # worker 取出任务后崩溃，任务永远停在 queued
+
+    monkeypatch.setattr(Config, 'JOB_QUEUED_STALE_AFTER', 0)
+    again, created = job_queue.enqueue(video_id, {})
+    assert created
+    assert again['job_id'] != job['job_id']
+
+
+def test_queued_job_past_deadline_times_out(job_queue, video_id):
+    job, _ = job_queue.enqueue(video_id, {}, timeout=1)
+    job_queue.update(job['job_id'], deadline='2000-01-01T00:00:00')
+
+    started = job_queue.start(job['job_id'])
+    assert started['state'] == JOB_TIMED_OUT
+    assert started['error_type'] == 'deadline_exceeded'
+
+    # 过期的排队任务不再占用该视频
+    again, created = job_queue.enqueue(video_id, {})
+    assert created
+
+
+def test_claim_failure_does_not_push_job(job_queue, video_id, monkeypatch):
+    stale, _ = job_queue.enqueue(video_id, {})
+    job_queue.update(stale['job_id'], state=JOB_SUCCEEDED)
+    _pending(job_queue)
+    # 过期的登记始终清不掉（如被其他进程反复抢先登记）：重试用尽后放弃，不提交未登记的任务
+    monkeypatch.setattr(job_queue._backend, 'release', lambda video_id, job_id: None)
+
+    with pytest.raises(JobClaimError):
+        job_queue.enqueue(video_id, {})
+    assert _pending(job_queue) == []
+
+
+def test_cancel_queued_job_finishes_immediately(job_queue, video_id):
+    job, _ = job_queue.enqueue(video_id, {})
+
+    cancelled = job_queue.cancel(job['job_id'])
+    assert cancelled['state'] == JOB_CANCELLED
+
+    again, created = job_queue.enqueue(video_id, {})
+    assert created  # 取消后视频不再被占用
+
+
+def test_cancel_running_job_keeps_partial_results(app, job_queue, standin, video_id, monkeypatch):
+    monkeypatch.setattr(Config, 'JOB_CANCEL_CHECK_INTERVAL', 0)
+    standin.faults.latency_ms = 20
+    job, _ = job_queue.enqueue(video_id, {'max_comments': 1000})
+    job_id = job_queue.next_job(timeout=0.01)
+    worker = threading.Thread(target=execute_job, args=(app, job_queue, job_id))
+    worker.start()
+
+    deadline = time.monotonic() + 10
+    while job_queue.get(job_id)['counts'].get('rows_persisted', 0) < 100:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert job_queue.cancel(job_id)['state'] == JOB_RUNNING  # 运行中的任务由 worker 停止
+    worker.join(10)
+
+    job = job_queue.get(job_id)
+    assert job['state'] == JOB_CANCELLED
+    assert job['result']['partial'] and job['result']['stopped'] == 'cancelled'
+    assert 100 <= job['result']['total_comments'] < 1000
+
+
+def test_analyze_endpoint_attaches_to_job_in_flight(client, standin, video_id):
+    standin.faults.latency_ms = 50  # 让第一个任务在第二个请求到达时仍在进行
+    body = {'video_url': video_id, 'max_comments': 300}
+    first = client.post('/api/analyze', json=body)
+    second = client.post('/api/analyze', json=body)
+    assert first.status_code == 202 and second.status_code == 202
+    assert first.json['attached'] is False
+    assert second.json['attached'] is True
+    assert second.json['job_id'] == first.json['job_id']
+
+    job = client.get(first.json['status_url']).json
+    assert job['video_id'] == video_id
+
+    finished = get_job_queue().wait(first.json['job_id'])
+    assert finished['state'] == JOB_SUCCEEDED
+    assert finished['result']['total_comments'] == 300
@@ -0,0 +1,40 @@
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Comment, CommentLabel, CommentTopic, Video
+from app.models.migrations import MIGRATIONS, upgrade
+from app.services.video_stats import load_video_stats
+
+
+def test_upgrade_backfills_association_tables_and_stats(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "old.db"}')
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        video_pk = conn.execute(insert(Video).values(video_id='old')).inserted_primary_key[0]
+        conn.execute(insert(Comment), [
+            {'video_id': video_pk, 'comment_id': 'c1', 'labels_json': '["question", "question", "joke"]',
+             'topics_json': '["camera"]', 'sentiment': 'positive', 'sentiment_score': 0.8, 'reply_count': 150},
+            {'video_id': video_pk, 'comment_id': 'c2', 'labels_json': '[]', 'topics_json': 'not json',
+             'sentiment': 'negative', 'sentiment_score': -0.4, 'reply_count': 0},
+            {'video_id': video_pk, 'comment_id': 'c3', 'labels_json': None, 'topics_json': '["camera", "battery"]',
+             'sentiment': 'positive', 'sentiment_score': 0.2, 'reply_count': 3},
+        ])
+
+    upgrade(engine)
+    upgrade(engine)  # 已执行过的迁移不会重复回填
+
+    with engine.connect() as conn:
+        labels = conn.execute(select(CommentLabel.comment_id, CommentLabel.label)).all()
+        topics = conn.execute(select(CommentTopic.comment_id, CommentTopic.topic)).all()
+        versions = conn.execute(text('SELECT version FROM schema_migrations')).scalars().all()
+    assert sorted(labels) == [('c1', 'joke'), ('c1', 'question')]
+    assert sorted(topics) == [('c1', 'camera'), ('c3', 'battery'), ('c3', 'camera')]
+    assert sorted(versions) == [version for version, _, _ in MIGRATIONS]
+
+    with Session(engine) as session:
+        stats = load_video_stats(session, video_pk)
+    assert stats['total'] == 3
+    assert (stats['sentiments']['positive'], stats['sentiments']['negative']) == (2, 1)
+    assert stats['high_reply'] == 1
+    assert stats['label'] == {'question': 1, 'joke': 1}
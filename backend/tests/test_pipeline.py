@@ -0,0 +1,101 @@
+import random
+import threading
+import time
+
+import pytest
+
+from app.utils.pipeline import Pipeline, Stage
+
+
+def test_parallel_stages_keep_input_order():
+    def slow_square(x):
+        time.sleep(random.uniform(0, 0.005))
+        return x * x
+
+    caller = threading.current_thread()
+    inline_threads = set()
+
+    def save(x):
+        inline_threads.add(threading.current_thread())
+        return x
+
+    pipeline = Pipeline([Stage('square', slow_square, workers=4), Stage('save', save, inline=True)], queue_size=2)
+
+    assert list(pipeline.run(range(50))) == [x * x for x in range(50)]
+    assert inline_threads == {caller}
+    stats = pipeline.stats()
+    assert stats['source']['items'] == stats['square']['items'] == stats['save']['items'] == 50
+
+
+def test_bounded_queues_limit_items_in_flight():
+    produced = []
+
+    def source():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    pipeline = Pipeline([Stage('a', lambda x: x), Stage('b', lambda x: x)], queue_size=2)
+    for item in pipeline.run(source()):
+        time.sleep(0.002)  # 调用方处理慢，上游被背压阻塞
+        # 3 个队列各 2 个 + 每个线程手中 1 个
+        assert len(produced) - item <= 3 * 2 + 3 + 1
+
+
+def test_stage_error_is_raised_to_caller_and_source_is_closed():
+    closed = threading.Event()
+
+    def source():
+        try:
+            yield from range(100)
+        finally:
+            closed.set()
+
+    def fail_on_five(x):
+        if x == 5:
+            raise RuntimeError('boom')
+        return x
+
+    results = []
+    with pytest.raises(RuntimeError, match='boom'):
+        for item in Pipeline([Stage('check', fail_on_five, workers=2)]).run(source()):
+            results.append(item)
+
+    assert results == [0, 1, 2, 3, 4]
+    assert closed.is_set()
+
+
+def test_early_exit_stops_stages():
+    closed = threading.Event()
+
+    def source():
+        try:
+            yield from range(1000)
+        finally:
+            closed.set()
+
+    run = Pipeline([Stage('double', lambda x: 2 * x, workers=2)]).run(source())
+    assert [next(run) for _ in range(3)] == [0, 2, 4]
+    run.close()
+
+    assert closed.is_set()
+    assert not [t for t in threading.enumerate() if t.name in ('pipeline-source', 'pipeline-double')]
+
+
+def test_on_stop_wakes_a_blocked_source_before_joining():
+    wake = threading.Event()
+
+    def source():
+        yield 1
+        wake.wait(timeout=5)  # 如爬取线程在等待展开中的回复
+        yield 2
+
+    def fail_to_save(x):
+        raise RuntimeError('database went away')
+
+    start = time.monotonic()
+    with pytest.raises(RuntimeError, match='database went away'):
+        list(Pipeline([Stage('save', fail_to_save, inline=True)]).run(source(), on_stop=wake.set))
+
+    assert wake.is_set()
+    assert time.monotonic() - start < 2
@@ -0,0 +1,69 @@
+import json
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from app.services.rate_limiter import QuotaExceededError, QuotaRateLimiter
+from config import Config
+
+
+class _FailingRequest:
+    """先失败 failures 次（HTTP status / reason），之后成功"""
+
+    def __init__(self, status, reason, failures=1):
+        self.status, self.reason, self.failures = status, reason, failures
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            content = json.dumps({'error': {'errors': [{'reason': self.reason}]}}).encode()
+            raise HttpError(httplib2.Response({'status': self.status}), content)
+        return {'items': []}
+
+
+def test_daily_quota_is_enforced():
+    limiter = QuotaRateLimiter(daily_units=3, per_second=1000, backend='memory')
+    for _ in range(3):
+        limiter.acquire('commentThreads.list')
+    assert limiter.remaining() == 0
+    with pytest.raises(QuotaExceededError):
+        limiter.acquire('commentThreads.list')
+
+
+def test_quota_exceeded_response_exhausts_the_day():
+    limiter = QuotaRateLimiter(daily_units=100, per_second=1000, backend='memory')
+    with pytest.raises(QuotaExceededError):
+        limiter.execute(_FailingRequest(403, 'quotaExceeded'), 'videos.list')
+    assert limiter.remaining() == 0
+    with pytest.raises(QuotaExceededError):
+        limiter.acquire('videos.list')
+
+
+def test_rate_limited_requests_are_retried(monkeypatch):
+    monkeypatch.setattr(Config, 'YOUTUBE_API_BACKOFF_BASE', 0.001)
+    limiter = QuotaRateLimiter(daily_units=100, per_second=1000, backend='memory')
+    request = _FailingRequest(403, 'rateLimitExceeded', failures=2)
+
+    assert limiter.execute(request, 'comments.list') == {'items': []}
+    assert request.calls == 3
+    assert limiter.remaining() == 97
+
+
+def test_other_errors_are_not_retried():
+    limiter = QuotaRateLimiter(daily_units=100, per_second=1000, backend='memory')
+    request = _FailingRequest(404, 'videoNotFound')
+    with pytest.raises(HttpError):
+        limiter.execute(request, 'videos.list')
+    assert request.calls == 1
+
+
+def test_file_backend_shares_usage_between_limiters(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'YOUTUBE_QUOTA_STATE_FILE', str(tmp_path / 'quota.json'))
+    first = QuotaRateLimiter(daily_units=10, per_second=1000, backend='file')
+    second = QuotaRateLimiter(daily_units=10, per_second=1000, backend='file')
+
+    first.acquire('videos.list')
+    second.acquire('videos.list')
+    assert first.remaining() == second.remaining() == 8
@@ -0,0 +1,68 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import track_videos
+from app.services.job_queue import JOB_QUEUED, JobQueue
+from app.services.refresh_scheduler import RefreshScheduler
+from config import Config
+
+
+class _Limiter:
+    """固定的剩余配额和距重置时间"""
+
+    def __init__(self, remaining, seconds_until_reset):
+        self._remaining = remaining
+        self._seconds_until_reset = seconds_until_reset
+
+    def remaining(self):
+        return self._remaining
+
+    def seconds_until_reset(self):
+        return self._seconds_until_reset
+
+
+@pytest.fixture
+def scheduler(app, app_context):
+    # 每轮预算 1000 × 0.5 × 30 / 1500 = 10 个单位
+    return RefreshScheduler(app, job_queue=JobQueue(backend='memory'), limiter=_Limiter(1000, 1500))
+
+
+@pytest.fixture(autouse=True)
+def scheduler_config(monkeypatch):
+    monkeypatch.setattr(Config, 'SCHEDULER_TICK_SECONDS', 30)
+    monkeypatch.setattr(Config, 'SCHEDULER_QUOTA_SHARE', 0.5)
+
+
+def test_due_videos_run_by_priority_within_the_quota_budget(scheduler, video_id):
+    # 每个视频预计消耗 1 + 500 / 100 = 6 个单位
+    low, high, middle = (track_videos([video_id + suffix], {'priority': priority, 'max_comments': 500,
+                                                             'run_now': True})[0][0]
+                         for suffix, priority in (('a', 0), ('b', 5), ('c', 1)))
+
+    assert scheduler.budget() == pytest.approx(10)
+    assert scheduler.tick() == [high.video_id, middle.video_id]  # 10 - 6 > 0，再提交一个后额度为负
+    assert scheduler.credit == pytest.approx(-2)
+    assert high.last_status == JOB_QUEUED and high.next_run_at > datetime.utcnow()
+
+    assert scheduler.tick() == [low.video_id]  # 下一轮补回额度后顺延的视频才提交
+    assert scheduler.tick() == []
+
+
+def test_exhausted_quota_submits_nothing(app, app_context, video_id):
+    tracked = track_videos([video_id], {'run_now': True})[0][0]
+    scheduler = RefreshScheduler(app, job_queue=JobQueue(backend='memory'), limiter=_Limiter(0, 1500))
+
+    assert scheduler.tick() == []
+    assert tracked.next_run_at <= datetime.utcnow()
+    track_videos([video_id], {'enabled': False})  # 不留给其他测试的调度器
+
+
+def test_due_video_is_claimed_once(scheduler, video_id):
+    tracked = track_videos([video_id], {'run_now': True})[0][0]
+    # 另一个调度器在本调度器认领之前读到的同一行
+    stale = SimpleNamespace(id=tracked.id, next_run_at=tracked.next_run_at, interval_seconds=tracked.interval_seconds)
+
+    assert scheduler.tick() == [video_id]
+    assert not scheduler._claim(stale, datetime.utcnow())
@@ -0,0 +1,51 @@
+import csv
+import io
+
+import pytest
+
+from app import db
+from app.models import Comment, Video
+from app.services import open_snapshot, write_video_snapshot
+from app.services.video_stats import load_video_stats
+from config import Config
+from youtube_standin import SyntheticSource
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def analyzed_video(app, client, standin, video_id):
+    standin.synthetic = SyntheticSource(250, 0, 50, 120)  # 5 条主评论各有 120 条回复（内联返回 5 条）
+    client.post('/api/analyze', json={'video_url': video_id, 'wait': True, 'max_comments': 1000})
+    return video_id
+
+
+def test_snapshot_round_trip_matches_database(app, analyzed_video):
+    with app.app_context():
+        video = Video.query.filter_by(video_id=analyzed_video).one()
+        write_video_snapshot(video, chunk_size=100)
+        stats = load_video_stats(db.session, video.id)
+        first_comment = Comment.query.filter_by(video_id=video.id).order_by(Comment.id).first().to_dict()
+
+    snapshot = open_snapshot(analyzed_video)
+    assert snapshot.num_rows == 250 + 5 * 5
+    summary = snapshot.summary()
+    assert summary.pop('score_sum') == pytest.approx(stats.pop('score_sum'))
+    assert summary == stats
+
+    sampled = snapshot.sample(1)[0]
+    assert sampled == {name: first_comment[name] for name in sampled}
+
+
+def test_report_and_csv_export_read_the_snapshot(client, analyzed_video):
+    report = client.get(f'/api/video/{analyzed_video}/report?source=snapshot')
+    assert report.status_code == 404  # 快照未开启时分析不会生成
+
+    export = client.get(f'/api/video/{analyzed_video}/export?format=csv')  # 导出时按需生成
+    rows = list(csv.DictReader(io.StringIO(export.get_data(as_text=True))))
+    assert len(rows) == 275
+    assert sum(int(row['reply_count']) >= Config.CONTROVERSY_REPLY_THRESHOLD for row in rows) == 5
+
+    report = client.get(f'/api/video/{analyzed_video}/report?source=snapshot')
+    assert report.status_code == 200
+    assert report.json['video']['video_id'] == analyzed_video
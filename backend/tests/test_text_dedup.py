@@ -0,0 +1,54 @@
+from app import db
+from app.models import TextAnalysis
+from app.models.records import CommentRecord
+from app.services.text_dedup import TextAnalysisCache, normalize_text
+
+
+class _CountingSentiment:
+    def __init__(self):
+        self.texts = []
+
+    def analyze_sentiment(self, text):
+        self.texts.append(text)
+        return {'sentiment': 'positive', 'score': 0.9}
+
+
+class _CountingLabeler:
+    def __init__(self):
+        self.texts = []
+
+    def label_single_comment(self, text, known_topics):
+        self.texts.append(text)
+        return {'labels': ['praise'], 'topics': [t for t in known_topics if t in normalize_text(text)]}
+
+
+def _records(*texts):
+    return [CommentRecord(f'c{i}', None, 'author', text) for i, text in enumerate(texts)]
+
+
+def test_normalized_duplicates_are_analyzed_once(app_context, video_id):
+    sentiment, labeler = _CountingSentiment(), _CountingLabeler()
+    cache = TextAnalysisCache(sentiment, labeler)
+
+    records = cache.analyze(_records(f'{video_id} camera rocks', f'  {video_id.upper()}   CAMERA rocks ',
+                                     f'{video_id} battery'), ['camera'])
+
+    analyzed = sorted(normalize_text(text) for text in sentiment.texts)
+    assert analyzed == [f'{video_id} battery', f'{video_id} camera rocks']
+    assert records[0].text_hash == records[1].text_hash
+    assert [(r.sentiment, r.labels, r.topics) for r in records[:2]] == [('positive', ('praise',), ('camera',))] * 2
+    assert cache.stats() == {'comments': 3, 'analyzed': 2, 'reused': 1, 'dedup_ratio': 0.3333}
+
+
+def test_texts_analysed_for_other_videos_are_reused(app_context, video_id):
+    TextAnalysisCache(_CountingSentiment(), _CountingLabeler()).analyze(
+        _records(f'{video_id} camera and battery'), ['camera'])
+    db.session.commit()
+    assert TextAnalysis.query.count() >= 1
+
+    # 新的缓存（另一个视频、另一个进程）从 text_analysis 表读取；已知话题不同时只重新匹配话题
+    sentiment, labeler = _CountingSentiment(), _CountingLabeler()
+    record, = TextAnalysisCache(sentiment, labeler).analyze(_records(f'{video_id} Camera and Battery'), ['battery'])
+
+    assert sentiment.texts == []
+    assert (record.sentiment, record.labels, record.topics) == ('positive', ('praise',), ('battery',))
@@ -0,0 +1,214 @@
+import itertools
+import time
+
+from sqlalchemy import text
+
+from app import db
+from app.models import Comment, ScrapeCheckpoint, Video
+from app.services import get_job_queue, rate_limiter
+from app.services.comment_ingestor import CommentIngestor
+from app.services.youtube_scraper import YouTubeScraper
+from config import Config
+from youtube_standin import EPOCH, FaultInjector, SyntheticSource
+
+
+def _video_state(app, video_id):
+    with app.app_context():
+        video = Video.query.filter_by(video_id=video_id).one()
+        checkpoints = [c.fetched_count for c in ScrapeCheckpoint.query.filter_by(video_id=video_id)]
+        return {
+            'comments': Comment.query.filter_by(video_id=video.id).count(),
+            'watermark': video.newest_comment_published_at,
+            'complete': video.analysis_complete,
+            'partial': video.analysis_partial,
+            'checkpoints': checkpoints
+        }
+
+
+def test_analyze_stores_comments(app, client, standin, video_id):
+    standin.synthetic = SyntheticSource(20, 0, 4, 2)  # 第 0/4/8/12/16 条主评论各有 2 条回复
+
+    response = client.post('/api/analyze', json={'video_url': video_id, 'wait': True, 'max_comments': 100})
+
+    assert response.status_code == 200
+    with app.app_context():
+        video = Video.query.filter_by(video_id=video_id).one()
+        assert Comment.query.filter_by(video_id=video.id).count() == 30
+
+
+def test_expanded_analysis_stays_within_max_comments(client, standin, video_id):
+    standin.synthetic = SyntheticSource(1000, 2, 10, 300)  # 每 10 条主评论有一条带 300 条回复
+
+    response = client.post('/api/analyze', json={'video_url': video_id, 'wait': True, 'max_comments': 500,
+                                                 'expand_replies': True})
+
+    assert response.status_code == 200
+    assert response.json['total_comments'] == 500
+
+
+def test_quota_exceeded_returns_429(client, standin, video_id):
+    standin.faults = FaultInjector(0, 0, 0.0, 0.0, 0, 0)
+
+    response = client.post('/api/analyze', json={'video_url': video_id, 'wait': True, 'max_comments': 100})
+
+    assert response.status_code == 429
+    assert standin.stats == {403: 1}  # quotaExceeded 不重试
+
+
+def test_quota_exhausted_mid_crawl_keeps_partial_results(app, client, standin, video_id, monkeypatch):
+    monkeypatch.setattr(Config, 'INGEST_COMMIT_CHUNK', 100)
+    body = {'video_url': video_id, 'wait': True, 'max_comments': 1000}
+    # videos.list + 4 页评论后配额用尽
+    standin.faults = FaultInjector(0, 0, 0.0, 0.0, 5, 0)
+    response = client.post('/api/analyze', json=body)
+    assert response.status_code == 429
+    assert 'quota' in response.json['error']
+
+    state = _video_state(app, video_id)
+    assert state['comments'] == 400
+    assert state['complete'] is False
+    assert state['partial'] is True
+    assert state['checkpoints'] == [400]
+    assert state['watermark'] is None
+
+    # 限流器已把当日配额标记为用尽，之后的请求不再发出
+    before = dict(standin.stats)
+    assert client.post('/api/analyze', json={**body, 'mode': 'resume'}).status_code == 429
+    assert standin.stats == before
+
+    # 配额重置后从断点续爬完成，部分分析标记清除
+    standin.faults = FaultInjector(0, 0, 0.0, 0.0, None, 0)
+    monkeypatch.setattr(rate_limiter, '_limiter', None)
+    response = client.post('/api/analyze', json={**body, 'mode': 'resume'})
+    assert response.status_code == 200
+    state = _video_state(app, video_id)
+    assert state['comments'] == 1000
+    assert state['partial'] is False
+    assert state['checkpoints'] == []
+
+
+def test_batch_queues_one_job_per_video(client, fake_youtube, video_id):
+    fake_youtube.threads = 10
+    video_urls = [video_id, f'https://www.youtube.com/watch?v={video_id}', 'missing0001', 'not-a-video-url']
+
+    response = client.post('/api/analyze/batch', json={'video_urls': video_urls, 'max_comments': 50})
+
+    assert response.status_code == 202
+    results = response.json['results']
+    assert [r['status'] for r in results] == ['queued', 'queued', 'not_found', 'invalid']
+    assert results[0]['job_id'] == results[1]['job_id']  # 重复的视频只提交一个任务
+    # 视频信息一次 videos.list 批量获取，任务执行时命中视频信息缓存
+    assert get_job_queue().wait(results[0]['job_id'])['state'] == 'succeeded'
+    assert len(fake_youtube.calls['videos']) == 1
+
+
+def test_failed_crawl_keeps_committed_chunks(app, client, standin, video_id, monkeypatch):
+    monkeypatch.setattr(Config, 'INGEST_COMMIT_CHUNK', 100)
+    add = CommentIngestor.add
+    pages = itertools.count()
+
+    def failing_add(self, records):
+        if any(video_id in r.comment_id for r in records) and next(pages) == 3:
+            raise RuntimeError('database went away')
+        return add(self, records)
+
+    monkeypatch.setattr(CommentIngestor, 'add', failing_add)
+    response = client.post('/api/analyze', json={'video_url': video_id, 'wait': True, 'max_comments': 1000})
+
+    assert response.status_code == 500
+    with app.app_context():
+        video = Video.query.filter_by(video_id=video_id).one()
+        assert Comment.query.filter_by(video_id=video.id).count() == 300
+        checkpoint = ScrapeCheckpoint.query.filter_by(video_id=video_id).one()
+        assert checkpoint.fetched_count == 300 and checkpoint.page_token
+
+    # 从断点继续，已提交的块不会重新爬取
+    monkeypatch.setattr(CommentIngestor, 'add', add)
+    response = client.post('/api/analyze', json={'video_url': video_id, 'wait': True, 'max_comments': 700,
+                                                 'mode': 'resume'})
+
+    assert response.status_code == 200
+    assert response.json['total_comments'] == 1000
+    assert not response.json['resumable']
+
+
+def test_failed_persist_stops_the_reply_crawl(client, standin, video_id, monkeypatch):
+    standin.synthetic = SyntheticSource(1000, 0, 150, 10)  # 第一页的 t0 和第二页的 t150 需要展开回复
+    fetches = itertools.count()
+    crawl_stopped = []
+
+    def blocking_fetch_replies(self, parent_id, limit=None, stop_event=None):
+        if next(fetches) > 0:
+            # 第二页的回复拉取一直进行，直到爬取被通知停止
+            crawl_stopped.append(stop_event.wait(timeout=5))
+        return []
+
+    def failing_add(self, records):
+        if any(video_id in r.comment_id for r in records):
+            raise RuntimeError('database went away')
+        return add(self, records)
+
+    add = CommentIngestor.add
+    monkeypatch.setattr(YouTubeScraper, '_fetch_replies', blocking_fetch_replies)
+    monkeypatch.setattr(CommentIngestor, 'add', failing_add)
+    start = time.monotonic()
+    response = client.post('/api/analyze', json={'video_url': video_id, 'wait': True, 'max_comments': 1000,
+                                                 'expand_replies': True})
+
+    assert response.status_code == 500
+    assert time.monotonic() - start < 3
+    assert all(crawl_stopped)
+
+
+def test_watermark_resume_delta_sequence(app, client, standin, video_id):
+    body = {'video_url': video_id, 'wait': True, 'max_comments': 300}
+
+    # 第一页开始但没爬完：保留断点，不推进水位线
+    response = client.post('/api/analyze', json={**body, 'mode': 'full'})
+    assert response.status_code == 200
+    assert response.json['resumable'] is True
+    state = _video_state(app, video_id)
+    assert state['comments'] == 300
+    assert state['watermark'] is None
+
+    # 续爬到最后一页：没看到第一页，同样不推进水位线
+    for expected in (600, 900, 1000):
+        response = client.post('/api/analyze', json={**body, 'mode': 'resume'})
+        assert response.status_code == 200
+        assert _video_state(app, video_id)['comments'] == expected
+    assert response.json['resumable'] is False
+    state = _video_state(app, video_id)
+    assert state['watermark'] is None
+    assert state['checkpoints'] == []
+
+    # 首次 delta（没有水位线）按时间倒序从第一页爬，评论已全部入库，水位线推进到最新的主评论
+    response = client.post('/api/analyze', json={**body, 'mode': 'delta'})
+    assert response.status_code == 200
+    assert _video_state(app, video_id)['watermark'] == EPOCH.replace(tzinfo=None)
+
+    # 之后的 delta 碰到水位线即停止，只请求一页
+    before = dict(standin.stats)
+    response = client.post('/api/analyze', json={**body, 'mode': 'delta'})
+    assert response.status_code == 200
+    assert response.json['message'] == 'No new comments found'
+    assert standin.stats[200] - before[200] <= 2  # commentThreads.list（+ 未命中缓存时的 videos.list）
+    state = _video_state(app, video_id)
+    assert state['comments'] == 1000
+    assert state['watermark'] == EPOCH.replace(tzinfo=None)
+
+
+def test_controversy_stats_are_computed_in_the_database(app, client, standin, video_id):
+    standin.synthetic = SyntheticSource(300, 0, 50, 120)  # 第 0/50/.../250 条主评论各有 120 条回复
+
+    client.post('/api/analyze', json={'video_url': video_id, 'wait': True, 'max_comments': 1000})
+    response = client.get(f'/api/video/{video_id}/controversy')
+
+    assert response.json['total_comments'] == 300 + 6 * 5  # 主评论 + 内联回复
+    assert response.json['high_reply_comments_count'] == 6
+    assert [c['reply_count'] for c in response.json['high_reply_comments']] == [120] * 6
+
+    with app.app_context():
+        plan = db.session.execute(text(
+            'EXPLAIN QUERY PLAN SELECT count(*) FROM comments WHERE video_id = 1 AND reply_count >= 100'
+        )).all()
+    assert 'ix_comments_video_reply_count' in ' '.join(row[-1] for row in plan)
@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import video_cache
+from app.services.video_cache import VideoInfoCache
+from app.services.youtube_scraper import YouTubeScraper
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(video_cache, 'time', SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = VideoInfoCache(max_entries=10, ttl=60, backend='memory')
+    cache.set_many({'a': {'video_id': 'a'}})
+
+    clock.value += 59
+    assert cache.get_many(['a']) == {'a': {'video_id': 'a'}}
+    clock.value += 2
+    assert cache.get_many(['a']) == {}
+    assert cache.stats()['entries'] == 0
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = VideoInfoCache(max_entries=2, ttl=60, backend='memory')
+    cache.set_many({'a': {}, 'b': {}})
+    cache.get_many(['a'])  # a 变为最近使用
+    cache.set_many({'c': {}})
+
+    assert set(cache.get_many(['a', 'b', 'c'])) == {'a', 'c'}
+    assert cache.stats()['evictions'] == 1
+
+
+def test_video_info_is_fetched_in_batches_of_50(fake_youtube):
+    video_ids = [f'video{i:06d}' for i in range(120)] + ['video000001', 'missing0001']
+    scraper = YouTubeScraper()
+
+    infos = scraper.get_videos_info(video_ids)
+
+    assert len(infos) == 120
+    assert 'missing0001' not in infos
+    assert [len(call['id'].split(',')) for call in fake_youtube.calls['videos']] == [50, 50, 21]
+
+    # 之后的查询全部命中缓存（不存在的视频不缓存）
+    assert scraper.get_video_info('video000007')['title'] == 'Video video000007'
+    assert len(fake_youtube.calls['videos']) == 3
@@ -0,0 +1,33 @@
+import threading
+
+import pytest
+
+from app.services.video_lock import VideoLocks
+
+
+def test_hold_serializes_the_same_video_across_threads(video_id):
+    locks = VideoLocks(backend='file')
+    entered = threading.Event()
+
+    def _other(lock_id):
+        with locks.hold(lock_id):
+            entered.set()
+
+    with locks.hold(video_id):
+        other_video = threading.Thread(target=_other, args=(video_id + 'x',))
+        other_video.start()
+        assert entered.wait(timeout=5)  # 其他视频不受影响
+
+        entered.clear()
+        same_video = threading.Thread(target=_other, args=(video_id,))
+        same_video.start()
+        assert not entered.wait(timeout=0.2)
+    assert entered.wait(timeout=5)
+    same_video.join()
+    other_video.join()
+
+
+def test_invalid_video_ids_are_rejected():
+    with pytest.raises(ValueError):
+        with VideoLocks(backend='file').hold('../escape'):
+            pass
@@ -0,0 +1,19 @@
+from app.services.youtube_client import YouTubeClientPool
+
+
+def test_clients_are_reused_but_never_shared():
+    pool = YouTubeClientPool(max_idle=1)
+
+    with pool.client() as first:
+        with pool.client() as second:
+            # 同时借出的客户端各自独占一个连接
+            assert second is not first
+    # 先归还的 second 进入空闲队列，超过 max_idle 的 first 归还时直接丢弃
+    assert pool._idle.qsize() == 1
+    with pool.client() as again:
+        assert again is second
+
+
+def test_discovery_document_is_loaded_once():
+    pool = YouTubeClientPool()
+    assert pool._discovery_document() is pool._discovery_document()
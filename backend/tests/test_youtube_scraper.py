@@ -0,0 +1,112 @@
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from app.services.youtube_scraper import YouTubeScraper
+from conftest import EPOCH
+
+
+def test_inline_replies_are_kept_without_expansion(fake_youtube):
+    fake_youtube.threads, fake_youtube.replies = 3, lambda i: 12 if i == 0 else 0
+
+    comments = YouTubeScraper().get_comments_batch('video', max_results=100)
+
+    ids = [c.comment_id for c in comments]
+    assert ids == ['t0'] + [f't0.r{j}' for j in range(5)] + ['t1', 't2']
+    assert fake_youtube.calls['comments'] == []
+
+
+def test_expanded_replies_are_deduplicated_against_inline_ones(fake_youtube):
+    fake_youtube.threads, fake_youtube.replies = 4, lambda i: {0: 12, 2: 150}.get(i, 0)
+
+    comments = YouTubeScraper().get_comments_batch('video', max_results=1000, expand_replies=True)
+
+    counts = Counter(c.comment_id for c in comments)
+    assert all(n == 1 for n in counts.values())
+    assert len(comments) == 4 + 12 + 150
+    replies = [c for c in comments if c.parent_id == 't2']
+    assert {c.comment_id for c in replies} == {f't2.r{j}' for j in range(150)}
+    # 只展开内联回复不完整的主评论；超过100条回复时分页拉取
+    assert sorted(call['parentId'] for call in fake_youtube.calls['comments']) == ['t0', 't2', 't2']
+
+
+def test_paging_stops_once_max_results_is_reached(fake_youtube):
+    fake_youtube.threads, fake_youtube.replies = 250, lambda i: 40
+
+    comments = YouTubeScraper().get_comments_batch('video', max_results=120, expand_replies=True)
+
+    # 页面不截断（断点总是完整的一页），但达到 max_results 后不再请求下一页
+    assert len(fake_youtube.calls['commentThreads']) == 1
+    assert len(comments) >= 120
+    assert len({c.comment_id for c in comments}) == len(comments)
+
+
+def test_reply_expansion_is_capped_by_the_remaining_budget(fake_youtube):
+    fake_youtube.threads, fake_youtube.replies = 1, lambda i: 20000
+
+    comments = YouTubeScraper().get_comments_batch('video', max_results=200, expand_replies=True)
+
+    # 回复极多的一条评论只拉到 max_results 为止，不会翻完全部回复
+    assert len(comments) == 200
+    assert [call['maxResults'] for call in fake_youtube.calls['comments']] == [100, 99]
+
+
+def test_expansion_budget_counts_the_whole_page(fake_youtube):
+    fake_youtube.threads, fake_youtube.replies = 300, lambda i: 40 if i % 10 == 0 else 3
+
+    comments = YouTubeScraper().get_comments_batch('video', max_results=500, expand_replies=True)
+
+    # 整页 100 条主评论 + 320 条内联回复先计入，剩余的 80 条预算依次分给前几条回复不完整的主评论
+    assert len(comments) == 500
+    assert len(fake_youtube.calls['commentThreads']) == 1
+    assert [(call['parentId'], call['maxResults']) for call in fake_youtube.calls['comments']] == [
+        ('t0', 40), ('t10', 40), ('t20', 15)]
+
+
+def test_stop_event_ends_the_crawl(fake_youtube):
+    fake_youtube.threads, fake_youtube.replies = 250, lambda i: 0
+    stop = threading.Event()
+    pages = YouTubeScraper().iter_comment_pages('video', max_results=1000, stop_event=stop)
+
+    assert len(next(pages).items) == 100
+    stop.set()
+    assert list(pages) == []
+    assert len(fake_youtube.calls['commentThreads']) == 1
+
+    assert YouTubeScraper()._fetch_replies('t0', stop_event=stop) == []
+    assert fake_youtube.calls['comments'] == []
+
+
+def test_pages_are_streamed_with_their_tokens(fake_youtube):
+    fake_youtube.threads = 250
+
+    pages = list(YouTubeScraper().iter_comment_pages('video', max_results=1000))
+
+    assert [len(page.items) for page in pages] == [100, 100, 50]
+    assert pages[0].page_token is None
+    assert [page.page_token for page in pages[1:]] == [page.next_page_token for page in pages[:-1]]
+    assert pages[-1].next_page_token is None
+
+
+def test_crawl_resumes_from_page_token(fake_youtube):
+    fake_youtube.threads = 250
+    scraper = YouTubeScraper()
+
+    first = list(scraper.iter_comment_pages('video', max_results=100, order='time'))
+    resumed = list(scraper.iter_comment_pages('video', max_results=100, order='time',
+                                              page_token=first[-1].next_page_token))
+
+    assert [c.comment_id for c in resumed[0].items][:2] == ['t100', 't101']
+    assert {call['order'] for call in fake_youtube.calls['commentThreads']} == {'time'}
+
+
+def test_delta_crawl_stops_at_watermark(fake_youtube):
+    fake_youtube.threads = 250
+    watermark = ('t120', EPOCH - timedelta(minutes=120))
+
+    pages = list(YouTubeScraper().iter_comment_pages('video', order='time', watermark=watermark))
+
+    ids = [c.comment_id for page in pages for c in page.items]
+    assert ids == [f't{i}' for i in range(120)]
+    assert pages[-1].reached_watermark
+    assert len(fake_youtube.calls['commentThreads']) == 2
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+YouTube Data API 本地替身服务器（离线基准测试/开发用）
+
+实现 videos.list / commentThreads.list / comments.list 三个接口（含分页 nextPageToken），
+数据来源：
+- synthetic（默认）：按需确定性生成任意规模的评论（如100万条主评论、超深回复）
+- fixtures：从录制的JSON响应目录回放；配合 --record 可以把缺失的请求转发到真实API并录制下来
+并可注入延迟、错误和配额耗尽。
+
+让后端指向它：
+    python tools/youtube_standin.py --port 8765 --threads 1000000 --replies 20
+    YOUTUBE_API_BASE_URL=http://localhost:8765/ YOUTUBE_API_KEY=test python run.py
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+API_PREFIX = '/youtube/v3/'
+INLINE_REPLIES = 5  # commentThreads.list 内联返回的回复数上限（与真实API一致）
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+PHRASES = [
+    'I love this video, great work!',
+    'This is terrible, worst take ever.',
+    'first',
+    '❤️❤️',
+    "who's here in 2024",
+    'The president and the election are all people talk about',
+    'Cooking this recipe tonight, the food looks amazing',
+    'My job has the same problem, salary never goes up',
+    'Interesting point but I am not sure I agree',
+    'People really need to calm down in these comments',
+]
+
+
+def _token(offset):
+    return base64.urlsafe_b64encode(f'o:{offset}'.encode()).decode().rstrip('=')
+
+
+def _offset(token):
+    if not token:
+        return 0
+    padded = token + '=' * (-len(token) % 4)
+    try:
+        return int(base64.urlsafe_b64decode(padded).decode().split(':', 1)[1])
+    except Exception:
+        raise ApiError(400, 'invalidPageToken', 'The request specifies an invalid page token.')
+
+
+def _timestamp(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class ApiError(Exception):
+    def __init__(self, status, reason, message, domain='youtube.api'):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.domain = domain
+
+    def body(self):
+        return {'error': {
+            'code': self.status,
+            'message': str(self),
+            'errors': [{'message': str(self), 'domain': self.domain, 'reason': self.reason}]
+        }}
+
+
+class SyntheticSource:
+    """按 (video_id, 序号) 确定性生成数据，不占用与规模相关的内存"""
+
+    def __init__(self, threads, replies, deep_every, deep_replies):
+        self.threads = threads
+        self.replies = replies
+        self.deep_every = deep_every
+        self.deep_replies = deep_replies
+
+    def video(self, video_id):
+        if video_id.startswith('missing'):
+            return None
+        total = sum(1 + self._reply_count(i) for i in range(min(self.threads, 1000)))
+        total = total * self.threads // max(1, min(self.threads, 1000))
+        return {
+            'kind': 'youtube#video',
+            'id': video_id,
+            'snippet': {
+                'publishedAt': _timestamp(EPOCH - timedelta(days=30)),
+                'title': f'Synthetic video {video_id}',
+                'description': 'Generated by tools/youtube_standin.py',
+            },
+            'contentDetails': {'duration': 'PT12M34S'},
+            'statistics': {'viewCount': str(total * 40), 'likeCount': str(total * 2), 'commentCount': str(total)},
+        }
+
+    def threads_page(self, video_id, offset, limit, include_replies):
+        if self.video(video_id) is None:
+            raise ApiError(404, 'videoNotFound', 'The video identified by the videoId parameter could not be found.')
+        end = min(self.threads, offset + limit)
+        items = []
+        for i in range(offset, end):
+            thread_id = f'Ug{video_id}t{i}'
+            total_replies = self._reply_count(i)
+            item = {
+                'kind': 'youtube#commentThread',
+                'id': thread_id,
+                'snippet': {
+                    'videoId': video_id,
+                    'totalReplyCount': total_replies,
+                    # 序号越小越新，order=time 与 order=relevance 返回相同顺序
+                    'topLevelComment': self._comment(thread_id, f'{video_id}:{i}', EPOCH - timedelta(minutes=i)),
+                },
+            }
+            if include_replies and total_replies:
+                item['replies'] = {'comments': [
+                    self._reply(thread_id, j) for j in range(min(INLINE_REPLIES, total_replies))
+                ]}
+            items.append(item)
+        return items, (end if end < self.threads else None)
+
+    def replies_page(self, parent_id, offset, limit):
+        try:
+            index = int(parent_id.rsplit('t', 1)[1])
+        except (IndexError, ValueError):
+            raise ApiError(404, 'commentNotFound', 'The comment identified by the parentId parameter could not be found.')
+        total = self._reply_count(index)
+        end = min(total, offset + limit)
+        items = [self._reply(parent_id, j) for j in range(offset, end)]
+        return items, (end if end < total else None)
+
+    def _reply_count(self, index):
+        if self.deep_every and index % self.deep_every == 0:
+            return self.deep_replies
+        return self.replies
+
+    def _reply(self, parent_id, j):
+        comment = self._comment(f'{parent_id}.r{j}', f'{parent_id}:{j}', EPOCH - timedelta(seconds=j))
+        comment['snippet']['parentId'] = parent_id
+        return comment
+
+    @staticmethod
+    def _comment(comment_id, seed, published):
+        rng = random.Random(seed)
+        return {
+            'kind': 'youtube#comment',
+            'id': comment_id,
+            'snippet': {
+                'authorDisplayName': f'@user{rng.randrange(100000)}',
+                'textDisplay': rng.choice(PHRASES),
+                'textOriginal': '',
+                'likeCount': int(rng.paretovariate(1.2)) - 1,
+                'publishedAt': _timestamp(published),
+                'updatedAt': _timestamp(published),
+            },
+        }
+
+
+class FixtureSource:
+    """
+    回放录制的原始响应：<dir>/<接口名>/<sha1(规范化查询参数)>.json
+    record_upstream 不为空时，缺失的请求会转发到真实API并保存
+    """
+
+    def __init__(self, directory, record_upstream=None, api_key=None):
+        self.directory = directory
+        self.record_upstream = record_upstream
+        self.api_key = api_key
+
+    def fetch(self, endpoint, params):
+        key_params = {k: v for k, v in sorted(params.items()) if k != 'key'}
+        digest = hashlib.sha1(json.dumps([endpoint, key_params]).encode()).hexdigest()
+        path = os.path.join(self.directory, endpoint, f'{digest}.json')
+
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        if not self.record_upstream:
+            raise ApiError(404, 'fixtureNotFound', f'No recorded response for {endpoint} {key_params}')
+
+        query = urlencode({**key_params, 'key': self.api_key})
+        url = f'{self.record_upstream.rstrip("/")}{API_PREFIX}{endpoint}?{query}'
+        try:
+            with urllib.request.urlopen(url, timeout=30) as resp:
+                data = json.load(resp)
+        except urllib.error.HTTPError as e:
+            body = json.load(e)
+            error = body.get('error', {})
+            reason = (error.get('errors') or [{}])[0].get('reason', 'upstreamError')
+            raise ApiError(e.code, reason, error.get('message', 'Upstream error'))
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        return data
+
+
+class FaultInjector:
+    """延迟、随机错误和配额耗尽"""
+
+    UNIT_COSTS = {'videos': 1, 'commentThreads': 1, 'comments': 1}
+
+    def __init__(self, latency_ms, jitter_ms, error_rate, rate_limit_rate, quota_units, seed):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.quota_units = quota_units
+        self.used_units = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def before(self, endpoint):
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            roll = self._rng.random()
+            if self.quota_units is not None:
+                if self.used_units + self.UNIT_COSTS.get(endpoint, 1) > self.quota_units:
+                    raise ApiError(403, 'quotaExceeded', 'The request cannot be completed because you have '
+                                   'exceeded your quota.', domain='youtube.quota')
+                self.used_units += self.UNIT_COSTS.get(endpoint, 1)
+        time.sleep(delay)
+
+        if roll < self.rate_limit_rate:
+            raise ApiError(403, 'rateLimitExceeded', 'Rate limit exceeded.', domain='usageLimits')
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise ApiError(500, 'backendError', 'Backend Error', domain='global')
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server_version = 'YouTubeStandIn/1.0'
+    protocol_version = 'HTTP/1.1'  # 支持 keep-alive
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        stats = self.server.stats
+
+        try:
+            if not url.path.startswith(API_PREFIX):
+                raise ApiError(404, 'notFound', f'Unknown path {url.path}')
+            endpoint = url.path[len(API_PREFIX):].strip('/')
+            if endpoint not in ('videos', 'commentThreads', 'comments'):
+                raise ApiError(404, 'notFound', f'Unknown endpoint {endpoint}')
+
+            self.server.faults.before(endpoint)
+            if self.server.fixtures:
+                body = self.server.fixtures.fetch(endpoint, params)
+            else:
+                body = getattr(self, f'_{endpoint}')(params)
+            status = 200
+        except ApiError as e:
+            status, body = e.status, e.body()
+
+        with self.server.stats_lock:
+            stats[status] = stats.get(status, 0) + 1
+        self._send(status, body)
+
+    def _videos(self, params):
+        ids = [v for v in params.get('id', '').split(',') if v]
+        items = [v for v in (self.server.synthetic.video(video_id) for video_id in ids[:50]) if v]
+        return {'kind': 'youtube#videoListResponse', 'items': items,
+                'pageInfo': {'totalResults': len(items), 'resultsPerPage': len(items)}}
+
+    def _commentThreads(self, params):
+        if 'videoId' not in params:
+            raise ApiError(400, 'missingRequiredParameter', 'No filter selected. Expected videoId.')
+        limit = self._max_results(params, default=20)
+        items, next_offset = self.server.synthetic.threads_page(
+            params['videoId'], _offset(params.get('pageToken')), limit, 'replies' in params.get('part', '')
+        )
+        return self._list('youtube#commentThreadListResponse', items, next_offset)
+
+    def _comments(self, params):
+        if 'parentId' not in params:
+            raise ApiError(400, 'missingRequiredParameter', 'No filter selected. Expected parentId.')
+        limit = self._max_results(params, default=20)
+        items, next_offset = self.server.synthetic.replies_page(
+            params['parentId'], _offset(params.get('pageToken')), limit
+        )
+        return self._list('youtube#commentListResponse', items, next_offset)
+
+    @staticmethod
+    def _max_results(params, default):
+        try:
+            value = int(params.get('maxResults', default))
+        except ValueError:
+            raise ApiError(400, 'invalidParameter', 'Invalid value for maxResults.')
+        if not 1 <= value <= 100:
+            raise ApiError(400, 'invalidParameter', 'maxResults must be between 1 and 100.')
+        return value
+
+    @staticmethod
+    def _list(kind, items, next_offset):
+        body = {'kind': kind, 'items': items, 'pageInfo': {'resultsPerPage': len(items)}}
+        if next_offset is not None:
+            body['nextPageToken'] = _token(next_offset)
+        return body
+
+    def _send(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+
+def create_server(host='127.0.0.1', port=8765, threads=10000, replies=3, deep_every=0, deep_replies=0,
+                  fixtures_dir=None, record_upstream=None, api_key=None, latency_ms=0, jitter_ms=0,
+                  error_rate=0.0, rate_limit_rate=0.0, quota_units=None, seed=0, verbose=False):
+    """创建替身服务器（port=0 时自动分配端口，便于在基准脚本中内嵌启动）"""
+    server = ThreadingHTTPServer((host, port), StandInHandler)
+    server.daemon_threads = True
+    server.synthetic = SyntheticSource(threads, replies, deep_every, deep_replies)
+    server.fixtures = FixtureSource(fixtures_dir, record_upstream, api_key) if fixtures_dir else None
+    server.faults = FaultInjector(latency_ms, jitter_ms, error_rate, rate_limit_rate, quota_units, seed)
+    server.stats = {}
+    server.stats_lock = threading.Lock()
+    server.verbose = verbose
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline stand-in for the YouTube Data API v3')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--threads', type=int, default=10000, help='top-level comment threads per video')
+    parser.add_argument('--replies', type=int, default=3, help='replies per thread')
+    parser.add_argument('--deep-every', type=int, default=0, help='every Nth thread gets --deep-replies replies')
+    parser.add_argument('--deep-replies', type=int, default=1000)
+    parser.add_argument('--fixtures', help='serve recorded responses from this directory')
+    parser.add_argument('--record', metavar='UPSTREAM', help='record missing fixtures from this API root '
+                        '(e.g. https://youtube.googleapis.com/), needs --api-key')
+    parser.add_argument('--api-key', default=os.getenv('YOUTUBE_API_KEY'))
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests failing with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction failing with 403 rateLimitExceeded')
+    parser.add_argument('--quota', type=int, default=None, help='units before 403 quotaExceeded')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = create_server(
+        args.host, args.port, args.threads, args.replies, args.deep_every, args.deep_replies,
+        args.fixtures, args.record, args.api_key, args.latency_ms, args.jitter_ms,
+        args.error_rate, args.rate_limit_rate, args.quota, args.seed, args.verbose
+    )
+    print(f'YouTube API stand-in listening on http://{args.host}:{server.server_port}/')
+    print(f'Point the backend at it with YOUTUBE_API_BASE_URL=http://{args.host}:{server.server_port}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f'Responses by status: {server.stats}')
+
+
+if __name__ == '__main__':
+    main()
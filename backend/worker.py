@@ -0,0 +1,50 @@
+"""
+后台分析 worker（JOB_QUEUE_BACKEND=redis 时与 API 进程分开运行，可以在多台机器上启动多个）
+
+    python worker.py [--threads N] [--scheduler]
+
+--scheduler 同时运行关注列表调度器（定时提交 delta 分析），整个部署只在一个 worker 上开启
+"""
+import argparse
+import logging
+import threading
+
+from app import create_app
+from app.services import RefreshScheduler, get_job_queue
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+app = create_app()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run background analysis workers')
+    parser.add_argument('--threads', type=int, default=Config.JOB_WORKER_THREADS,
+                        help='number of jobs this process runs concurrently')
+    parser.add_argument('--scheduler', action='store_true',
+                        help='also run the scheduler that re-analyzes tracked videos (run it on one worker only)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    job_queue = get_job_queue()
+    if job_queue.in_process:
+        logger.warning('JOB_QUEUE_BACKEND=%s keeps jobs inside a single process; '
+                       'use redis to run workers separately from the API', job_queue.backend)
+
+    stop_event = threading.Event()
+    threads = job_queue.start_workers(app, args.threads, stop_event)
+    logger.info('👷 Worker started with %d threads (%s backend)', len(threads), job_queue.backend)
+    if args.scheduler:
+        scheduler = threading.Thread(target=RefreshScheduler(app, job_queue).run, args=(stop_event,),
+                                     name='refresh-scheduler', daemon=True)
+        scheduler.start()
+        threads.append(scheduler)
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+    except KeyboardInterrupt:
+        logger.info('Stopping after the current jobs finish...')
+        stop_event.set()
+        for thread in threads:
+            thread.join()